@@ -1,12 +1,29 @@
 # backend/app/api/v1/endpoints/etapa2_routes.py
 
+import os
+import time
 from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional
 from backend.app.services.etapa_2 import (
     read_excel_to_sale_note,
-    get_available_excel_files,
-    validate_excel_structure
+    parsed_workbook_cache
 )
+from backend.app.services.etapa_2.excel_reader_clean import validate_excel_structure
+from backend.app.services.etapa_2.workbook_catalog import list_catalog_entries
+from backend.app.services.etapa_2.spool_index import read_spool_from_excel
+from backend.app.services.etapa_2.batch_converter import convert_excel_files
+from backend.app.services.etapa_2 import sqlite_repository
+from backend.app.services.etapa_2.json_converter import (
+    load_json_as_sale_note,
+    load_sale_note_stats,
+    list_available_nvs
+)
+from backend.app.services.etapa_2.bulk_exporter import iter_bulk_export_zip, generate_bulk_export_filename
+from backend.app.services.etapa_2.excel_exporter import generate_excel_filename, iter_file_chunks
+from backend.app.services.etapa_2.export_cache import excel_export_cache
+from backend.app.services.etapa_2.flat_tables import items_to_records
+from backend.app.core.config import OUTPUT_DIR_ETAPA_1_SALIDA, SALE_NOTE_STORAGE_BACKEND
 from backend.app.api.v1.schemas.nv_schemas import SaleNote
 from pydantic import BaseModel
 
@@ -15,6 +32,28 @@ class ExcelFileResponse(BaseModel):
     available_files: List[str]
 
 
+class CatalogEntry(BaseModel):
+    filename: str
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    nv: Optional[str] = None
+    total_materials: Optional[int] = None
+    total_joints: Optional[int] = None
+    unique_nvs: Optional[int] = None
+    unique_plans: Optional[int] = None
+    unique_spools: Optional[int] = None
+    valid: bool
+    errors: List[str]
+    warnings: List[str]
+    scanned_at: str
+
+
+class CatalogResponse(BaseModel):
+    workbooks: List[CatalogEntry]
+
+
 class ValidationResponse(BaseModel):
     filename: str
     valid: bool
@@ -28,6 +67,79 @@ class SaleNoteResponse(BaseModel):
     sale_note: SaleNote
 
 
+class BatchConversionRequest(BaseModel):
+    filenames: Optional[List[str]] = None
+    max_workers: Optional[int] = None
+    force: bool = False
+
+
+class BatchConversionResult(BaseModel):
+    filename: str
+    status: str
+    json_paths: List[str]
+    seconds: float
+    error: Optional[str] = None
+
+
+class BatchConversionResponse(BaseModel):
+    results: List[BatchConversionResult]
+    total_seconds: float
+
+
+class CacheStatsResponse(BaseModel):
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    files: List[str]
+
+
+class CacheInvalidationResponse(BaseModel):
+    removed_entries: int
+
+
+class ExportCacheStatsResponse(BaseModel):
+    entries: int
+    total_bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class BulkExportRequest(BaseModel):
+    nvs: Optional[List[str]] = None
+    max_workers: Optional[int] = None
+
+
+class SaleNoteStatsResponse(BaseModel):
+    nv: str
+    total_spools: int
+    total_materials: int
+    total_joints: int
+    material_qty_by_dn: Dict[str, int]
+    joints_by_tipo: Dict[str, int]
+    joints_by_welder: Dict[str, int]
+    joints_without_remate: int
+
+
+class WelderJointsResponse(BaseModel):
+    welder: str
+    joints: List[Dict[str, Any]]
+
+
+class PlanoSpoolsResponse(BaseModel):
+    plano: str
+    spools: List[Dict[str, Any]]
+
+
+# Campos del resumen de materiales y uniones de cada spool en /spools (clave → campo del modelo)
+SPOOL_MATERIALS_SUMMARY = {"descripcion": "mat_descripcion", "dn": "mat_dn", "qty": "mat_qty"}
+SPOOL_JOINTS_SUMMARY = {"numero": "union_numero", "tipo": "union_tipo", "dn": "union_dn"}
+
+
 router = APIRouter(prefix="/etapa2", tags=["Etapa 2"])
 
 
@@ -35,24 +147,39 @@ router = APIRouter(prefix="/etapa2", tags=["Etapa 2"])
 def list_available_excel_files():
     """
     Obtiene la lista de archivos Excel disponibles en el directorio de etapa 1.
+    La respuesta sale del catálogo, que solo revisa los archivos modificados.
     """
     try:
-        available_files = get_available_excel_files()
+        available_files = [entry["filename"] for entry in list_catalog_entries()]
         return ExcelFileResponse(available_files=available_files)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al listar archivos: {str(e)}")
 
 
+@router.get("/excel-catalog", response_model=CatalogResponse)
+def list_excel_catalog():
+    """
+    Obtiene el catálogo de archivos Excel con tamaño, hash, NV, conteos y
+    estado de validación de cada uno, sin reabrir los libros que no cambiaron.
+    """
+    try:
+        entries = list_catalog_entries()
+        return CatalogResponse(workbooks=[CatalogEntry(**entry) for entry in entries])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al leer el catálogo: {str(e)}")
+
+
 @router.get("/validate/{filename}", response_model=ValidationResponse)
-def validate_excel_file(filename: str):
+def validate_excel_file(filename: str, deep: bool = False):
     """
     Valida la estructura de un archivo Excel específico.
     
     Args:
         filename: Nombre del archivo Excel a validar (ej: "nv_data_ejemplo.xlsx")
+        deep: Si se deben cargar las hojas completas (por defecto solo encabezados y columnas clave)
     """
     try:
-        validation = validate_excel_structure(filename)  # type: ignore
+        validation = validate_excel_structure(filename, deep=deep)
         return ValidationResponse(
             filename=filename,
             valid=validation["valid"],  # type: ignore
@@ -103,20 +230,9 @@ def get_spools_from_excel(filename: str) -> Dict[str, Any]:
                 "spool": plan.spool_data.spool,
                 "total_materials": len(plan.spool_data.materials),
                 "total_joints": len(plan.spool_data.joints),
-                "materials_summary": [
-                    {
-                        "descripcion": mat.mat_descripcion,
-                        "dn": mat.mat_dn,
-                        "qty": mat.mat_qty
-                    } for mat in plan.spool_data.materials[:3]  # Solo los primeros 3
-                ],
-                "joints_summary": [
-                    {
-                        "numero": joint.union_numero,
-                        "tipo": joint.union_tipo,
-                        "dn": joint.union_dn
-                    } for joint in plan.spool_data.joints[:3]  # Solo los primeros 3
-                ]
+                # Solo los primeros 3
+                "materials_summary": items_to_records(plan.spool_data.materials[:3], SPOOL_MATERIALS_SUMMARY),
+                "joints_summary": items_to_records(plan.spool_data.joints[:3], SPOOL_JOINTS_SUMMARY)
             }
             spools_info.append(spool_info)
         
@@ -136,35 +252,197 @@ def get_spools_from_excel(filename: str) -> Dict[str, Any]:
 
 
 @router.get("/spool-details/{filename}/{spool_name}")
-def get_spool_details(filename: str, spool_name: str) -> Dict[str, Any]:
+def get_spool_details(filename: str, spool_name: str, plano: Optional[str] = None) -> Dict[str, Any]:
     """
-    Obtiene los detalles completos de un spool específico.
+    Obtiene los detalles completos de un spool específico. Solo se leen las filas
+    del spool, ubicadas con el índice (plano, spool) del libro.
     
     Args:
         filename: Nombre del archivo Excel
         spool_name: Nombre del spool a consultar
+        plano: Plano del spool, para distinguir spools con el mismo nombre en distintos planos
     """
     try:
-        sale_note = read_excel_to_sale_note(filename)
+        located = read_spool_from_excel(filename, spool_name, plano=plano)
         
-        # Buscar el spool específico
-        for plan in sale_note.plans:
-            if plan.spool_data.spool == spool_name:
-                return {
-                    "filename": filename,
-                    "nv": sale_note.nv,
-                    "plano": plan.plano,
-                    "spool_data": plan.spool_data
-                }
+        if located is None:
+            detail = f"Spool '{spool_name}' no encontrado en el archivo '{filename}'"
+            if plano is not None:
+                detail = f"Spool '{spool_name}' del plano '{plano}' no encontrado en el archivo '{filename}'"
+            raise HTTPException(status_code=404, detail=detail)
         
-        raise HTTPException(
-            status_code=404, 
-            detail=f"Spool '{spool_name}' no encontrado en el archivo '{filename}'"
-        )
+        nv, plan = located
+        return {
+            "filename": filename,
+            "nv": nv,
+            "plano": plan.plano,
+            "spool_data": plan.spool_data
+        }
         
+    except HTTPException:
+        raise
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"Archivo no encontrado: {filename}")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+
+@router.post("/convert-batch", response_model=BatchConversionResponse)
+def convert_excel_batch(request: BatchConversionRequest):
+    """
+    Convierte varios archivos Excel a JSON en paralelo usando un pool de procesos.
+    Los archivos cuya conversión sigue vigente se omiten salvo que se indique `force`.
+    
+    Args:
+        request: Archivos a convertir (todos si no se indican), cantidad de procesos y force
+    """
+    try:
+        start = time.perf_counter()
+        results = convert_excel_files(request.filenames, max_workers=request.max_workers, force=request.force)
+        return BatchConversionResponse(
+            results=[BatchConversionResult(**result) for result in results],
+            total_seconds=time.perf_counter() - start
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en la conversión masiva: {str(e)}")
+
+
+@router.get("/cache", response_model=CacheStatsResponse)
+def get_workbook_cache_stats():
+    """
+    Obtiene los contadores del cache de libros Excel parseados
+    (aciertos, fallos, desalojos e invalidaciones).
+    """
+    return CacheStatsResponse(**parsed_workbook_cache.stats())
+
+
+@router.delete("/cache", response_model=CacheInvalidationResponse)
+def invalidate_workbook_cache(filename: Optional[str] = None):
+    """
+    Invalida el cache de libros Excel parseados.
+    
+    Args:
+        filename: Archivo Excel a invalidar. Si no se indica se vacía todo el cache.
+    """
+    file_path = os.path.join(OUTPUT_DIR_ETAPA_1_SALIDA, filename) if filename else None
+    removed_entries = parsed_workbook_cache.invalidate(file_path)
+    return CacheInvalidationResponse(removed_entries=removed_entries)
+
+
+def _require_sqlite_storage() -> None:
+    """Las consultas entre NVs solo están disponibles con el almacenamiento SQLite"""
+    if SALE_NOTE_STORAGE_BACKEND != "sqlite":
+        raise HTTPException(
+            status_code=400,
+            detail="Consulta disponible solo con SALE_NOTE_STORAGE_BACKEND=sqlite"
+        )
+
+
+@router.get("/welders/{welder}/joints", response_model=WelderJointsResponse)
+def get_joints_by_welder(welder: str):
+    """
+    Obtiene todas las uniones soldadas (raíz o remate) por un soldador en todas las NVs.
+    
+    Args:
+        welder: Nombre del soldador
+    """
+    _require_sqlite_storage()
+    try:
+        return WelderJointsResponse(welder=welder, joints=sqlite_repository.find_joints_by_welder(welder))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+
+@router.get("/planos/{plano}/spools", response_model=PlanoSpoolsResponse)
+def get_spools_by_plano(plano: str):
+    """
+    Obtiene los spools de un plano en todas las NVs, con sus cantidades.
+    
+    Args:
+        plano: Nombre del plano
+    """
+    _require_sqlite_storage()
+    try:
+        return PlanoSpoolsResponse(plano=plano, spools=sqlite_repository.find_spools_by_plano(plano))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+
+@router.get("/nvs/{nv}/excel")
+def download_sale_note_excel(nv: str):
+    """
+    Descarga el Excel actualizado de una NV (materiales y uniones con las variables editables).
+    Si la NV no cambió desde la última exportación se sirve el archivo ya generado.
+    
+    Args:
+        nv: Número de NV
+    """
+    try:
+        sale_note = load_json_as_sale_note(nv)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"NV no encontrada: {nv}")
+
+    try:
+        excel_file = excel_export_cache.open(sale_note)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al generar Excel: {str(e)}")
+
+    return StreamingResponse(
+        iter_file_chunks(excel_file),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f'attachment; filename="{generate_excel_filename(sale_note)}"'}
+    )
+
+
+@router.get("/nvs/{nv}/stats", response_model=SaleNoteStatsResponse)
+def get_sale_note_stats(nv: str):
+    """
+    Obtiene totales de una NV: cantidad de material por DN, uniones por tipo,
+    uniones por soldador (raíz o remate) y uniones sin soldador de remate.
+    
+    Args:
+        nv: Número de NV
+    """
+    try:
+        stats = load_sale_note_stats(nv)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"NV no encontrada: {nv}")
+
+    try:
+        return SaleNoteStatsResponse(**stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+
+@router.get("/export-cache", response_model=ExportCacheStatsResponse)
+def get_export_cache_stats():
+    """
+    Obtiene el tamaño y los contadores del cache en disco de Excel exportados.
+    """
+    return ExportCacheStatsResponse(**excel_export_cache.stats())
+
+
+@router.post("/bulk-export")
+def bulk_export_sale_notes(request: BulkExportRequest):
+    """
+    Exporta el Excel actualizado de varias NVs en paralelo y lo descarga como un
+    ZIP (un .xlsx por NV), que se envía a medida que cada NV termina.
+    
+    Args:
+        request: NVs a exportar (por defecto, todas) y cantidad de procesos
+    """
+    available = set(list_available_nvs())
+    nvs = sorted(available) if request.nvs is None else request.nvs
+    if not nvs:
+        raise HTTPException(status_code=400, detail="No hay NVs para exportar")
+    missing = [nv for nv in nvs if nv not in available]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"NV(s) no encontrada(s): {', '.join(missing)}")
+
+    return StreamingResponse(
+        iter_bulk_export_zip(nvs, max_workers=request.max_workers),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{generate_bulk_export_filename()}"'}
+    )
@@ -28,3 +28,15 @@ class Plan(BaseModel):
 class SaleNote(BaseModel):
     nv: str
     plans: List[Plan]
+
+class SpoolSummary(BaseModel):
+    plano: str
+    spool: str
+    total_materials: int
+    total_joints: int
+    version: int = 0
+
+class SaleNoteManifest(BaseModel):
+    nv: str
+    plans: List[SpoolSummary]
+    version: int = 0
@@ -11,3 +11,44 @@ OUTPUT_DIR = os.getenv("OUTPUT_DIR", "data/pdf_salidas/")
 
 # Carpeta para la etapa 1 de salida
 OUTPUT_DIR_ETAPA_1_SALIDA = os.getenv("OUTPUT_DIR_ETAPA_1", "data/etapa_1_salida/")
+
+# Cantidad máxima de libros Excel parseados que se mantienen en memoria
+PARSED_WORKBOOK_CACHE_MAX_ENTRIES = int(os.getenv("PARSED_WORKBOOK_CACHE_MAX_ENTRIES", "8"))
+
+# Cantidad máxima de NVs completas (ya validadas) que se mantienen en memoria
+SALE_NOTE_CACHE_MAX_ENTRIES = int(os.getenv("SALE_NOTE_CACHE_MAX_ENTRIES", "4"))
+
+# Catálogo persistente (SQLite) de los libros Excel de etapa 1
+WORKBOOK_CATALOG_PATH = os.getenv("WORKBOOK_CATALOG_PATH", "data/workbook_catalog.sqlite3")
+
+# Cantidad de procesos para la conversión masiva Excel → JSON (por defecto, todos los núcleos)
+BATCH_CONVERSION_MAX_WORKERS = int(os.getenv("BATCH_CONVERSION_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+# Cantidad de procesos para la exportación masiva de NVs a Excel (por defecto, todos los núcleos)
+BULK_EXPORT_MAX_WORKERS = int(os.getenv("BULK_EXPORT_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+# Sangría de los JSON de NV guardados en disco (0 = compacto; la exportación para usuarios siempre usa sangría)
+JSON_STORAGE_INDENT = int(os.getenv("JSON_STORAGE_INDENT", "0")) or None
+
+# Codificar con diccionario (códigos enteros por NV) los campos categóricos de los JSON guardados en disco.
+# Desactivado por defecto: los archivos de spool codificados solo se pueden leer junto con su manifiesto
+JSON_STORAGE_DICTIONARIES = os.getenv("JSON_STORAGE_DICTIONARIES", "0") == "1"
+
+# Umbrales del diario de ediciones de cada NV: al superarlos se integra al JSON en segundo plano
+JSON_JOURNAL_MAX_RECORDS = int(os.getenv("JSON_JOURNAL_MAX_RECORDS", "200"))
+JSON_JOURNAL_MAX_BYTES = int(os.getenv("JSON_JOURNAL_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Almacenamiento de las NVs convertidas: "json" (data/json_data) o "sqlite" (base normalizada con índices)
+SALE_NOTE_STORAGE_BACKEND = os.getenv("SALE_NOTE_STORAGE_BACKEND", "json").lower()
+SALE_NOTE_DB_PATH = os.getenv("SALE_NOTE_DB_PATH", "data/sale_notes.sqlite3")
+
+# Tamaño (bytes) hasta el que un Excel exportado se mantiene en memoria antes de pasar a un temporal en disco
+EXCEL_EXPORT_SPOOL_MAX_BYTES = int(os.getenv("EXCEL_EXPORT_SPOOL_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Ancho de columnas del Excel exportado: filas medidas por hoja (0 = todas) y ancho máximo en caracteres
+EXCEL_COLUMN_WIDTH_SAMPLE_ROWS = int(os.getenv("EXCEL_COLUMN_WIDTH_SAMPLE_ROWS", "0"))
+EXCEL_MAX_COLUMN_WIDTH = float(os.getenv("EXCEL_MAX_COLUMN_WIDTH", "255"))
+
+# Cache en disco de los Excel exportados (por hash del contenido de la NV) y su tamaño máximo en bytes
+EXCEL_EXPORT_CACHE_DIR = os.getenv("EXCEL_EXPORT_CACHE_DIR", "data/export_cache/")
+EXCEL_EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXCEL_EXPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
@@ -1,39 +1,39 @@
 import pandas as pd  # type: ignore
 import os
 
+# Columnas de cada hoja (orden correcto)
+MATERIALS_COLUMNS = [
+    "nv",
+    "plano",
+    "spool",
+    "mat_descripcion",
+    "mat_dn",
+    "mat_sch",
+    "mat_qty",
+    "mat_numero_interno"
+]
+
+JOINTS_COLUMNS = [
+    "nv",
+    "plano",
+    "spool",
+    "union_numero",
+    "union_dn",
+    "union_tipo",
+    "union_armador",
+    "union_soldador_raiz",
+    "union_soldador_remate"
+]
+
 def generate_empty_excel(output_dir: str, filename: str = "nv_data_empty.xlsx") -> str:
     """
     Genera un archivo Excel vacío con las hojas y columnas definidas,
     pero sin datos (solo los headers).
     """
 
-    # Definir columnas de cada hoja (orden correcto)
-    materials_columns = [
-        "nv",
-        "plano",
-        "spool",
-        "mat_descripcion",
-        "mat_dn",
-        "mat_sch",
-        "mat_qty",
-        "mat_numero_interno"
-    ]
-
-    joints_columns = [
-        "nv",
-        "plano",
-        "spool",
-        "union_numero",
-        "union_dn",
-        "union_tipo",
-        "union_armador",
-        "union_soldador_raiz",
-        "union_soldador_remate"
-    ]
-
     # Crear DataFrames vacíos
-    df_materials = pd.DataFrame(columns=materials_columns)
-    df_joints = pd.DataFrame(columns=joints_columns)
+    df_materials = pd.DataFrame(columns=MATERIALS_COLUMNS)
+    df_joints = pd.DataFrame(columns=JOINTS_COLUMNS)
 
     # Crear carpeta de salida si no existe
     os.makedirs(output_dir, exist_ok=True)
@@ -1,14 +1,22 @@
 # backend/app/services/etapa_2/__init__.py
 
 from .excel_reader import (
-    read_excel_to_sale_note,
     get_available_excel_files,
     validate_excel_structure
 )
+from .excel_reader_clean import (
+    read_excel_to_sale_note,
+    read_excel_to_sale_notes
+)
+from .excel_stream_reader import iter_plans_from_excel
+from .workbook_cache import parsed_workbook_cache
 from .json_converter import *
 
 __all__ = [
     "read_excel_to_sale_note",
+    "read_excel_to_sale_notes",
     "get_available_excel_files", 
-    "validate_excel_structure"
+    "validate_excel_structure",
+    "iter_plans_from_excel",
+    "parsed_workbook_cache"
 ]
\ No newline at end of file
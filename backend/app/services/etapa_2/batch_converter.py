@@ -0,0 +1,179 @@
+# backend/app/services/etapa_2/batch_converter.py
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+from backend.app.core.config import OUTPUT_DIR_ETAPA_1_SALIDA, BATCH_CONVERSION_MAX_WORKERS
+from backend.app.core.logger import setup_logger
+from .excel_reader_clean import get_available_excel_files
+from .json_converter import JSON_DIR, convert_excel_to_json
+
+logger = setup_logger()
+
+# Registro de las conversiones ya hechas: origen (tamaño, mtime) y JSON generados
+MANIFEST_PATH = os.path.join(JSON_DIR, ".conversion_manifest.json")
+
+
+def convert_excel_files(filenames: Optional[List[str]] = None,
+                        max_workers: Optional[int] = None,
+                        force: bool = False) -> List[Dict[str, Any]]:
+    """
+    Convierte varios archivos Excel a JSON en paralelo con un pool de procesos.
+
+    Se omiten los archivos cuya conversión anterior sigue vigente: el Excel no
+    cambió de tamaño ni de mtime y todos sus JSON generados siguen existiendo.
+
+    Args:
+        filenames: Archivos Excel a convertir. Si es None se usan todos los disponibles.
+        max_workers: Cantidad de procesos. Por defecto BATCH_CONVERSION_MAX_WORKERS.
+        force: Si se deben convertir también los archivos ya actualizados
+
+    Returns:
+        List[Dict[str, Any]]: Un resultado por archivo con filename, status
+        ("converted", "skipped" o "error"), json_paths, seconds y error
+    """
+    if filenames is None:
+        filenames = sorted(get_available_excel_files())
+    workers = max(1, max_workers or BATCH_CONVERSION_MAX_WORKERS)
+
+    manifest = _load_manifest()
+    results: Dict[str, Dict[str, Any]] = {}
+    pending: List[str] = []
+
+    for filename in filenames:
+        if not force and _is_up_to_date(filename, manifest):
+            results[filename] = {
+                "filename": filename,
+                "status": "skipped",
+                "json_paths": manifest[filename]["json_paths"],
+                "seconds": 0.0,
+                "error": None
+            }
+        else:
+            pending.append(filename)
+
+    logger.info(f"Conversión masiva: {len(pending)} archivo(s) a convertir, "
+                f"{len(results)} al día, {workers} proceso(s)")
+
+    if workers == 1 or len(pending) <= 1:
+        for filename in pending:
+            results[filename] = _convert_one(filename)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            futures = {executor.submit(_convert_one, filename): filename for filename in pending}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+    # Registrar las conversiones exitosas
+    for filename in pending:
+        result = results[filename]
+        if result["status"] == "converted" and result.get("source") is not None:
+            manifest[filename] = {**result.pop("source"), "json_paths": result["json_paths"]}
+        result.pop("source", None)
+    _save_manifest(manifest)
+
+    return [results[filename] for filename in filenames]
+
+
+def _convert_one(filename: str) -> Dict[str, Any]:
+    """
+    Convierte un archivo (se ejecuta dentro de un proceso del pool).
+
+    Args:
+        filename: Nombre del archivo Excel
+
+    Returns:
+        Dict[str, Any]: Resultado de la conversión con su tiempo y el estado del origen
+    """
+    start = time.perf_counter()
+    try:
+        source = _source_stat(filename)
+        json_paths = convert_excel_to_json(filename)
+        return {
+            "filename": filename,
+            "status": "converted",
+            "json_paths": json_paths,
+            "seconds": time.perf_counter() - start,
+            "error": None,
+            "source": source
+        }
+    except Exception as e:
+        return {
+            "filename": filename,
+            "status": "error",
+            "json_paths": [],
+            "seconds": time.perf_counter() - start,
+            "error": str(e)
+        }
+
+
+def _source_stat(filename: str) -> Dict[str, int]:
+    """Tamaño y mtime del archivo Excel de origen"""
+    stat = os.stat(os.path.join(OUTPUT_DIR_ETAPA_1_SALIDA, filename))
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _is_up_to_date(filename: str, manifest: Dict[str, Any]) -> bool:
+    """Indica si la última conversión registrada del archivo sigue vigente"""
+    entry = manifest.get(filename)
+    if entry is None:
+        return False
+    try:
+        source = _source_stat(filename)
+    except OSError:
+        return False
+    return (
+        entry.get("size") == source["size"]
+        and entry.get("mtime_ns") == source["mtime_ns"]
+        and bool(entry.get("json_paths"))
+        and all(os.path.exists(path) for path in entry["json_paths"])
+    )
+
+
+def _load_manifest() -> Dict[str, Any]:
+    """Carga el registro de conversiones (vacío si no existe o está dañado)"""
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest: Dict[str, Any]) -> None:
+    """Guarda el registro de conversiones de forma atómica"""
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Punto de entrada de línea de comandos:
+
+        python -m backend.app.services.etapa_2.batch_converter [archivos...] --workers 8 --force
+    """
+    parser = argparse.ArgumentParser(description="Convierte archivos Excel de etapa 1 a JSON en paralelo")
+    parser.add_argument("filenames", nargs="*", help="Archivos a convertir (por defecto, todos los disponibles)")
+    parser.add_argument("--workers", type=int, default=None, help="Cantidad de procesos")
+    parser.add_argument("--force", action="store_true", help="Convertir también los archivos ya actualizados")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = convert_excel_files(args.filenames or None, max_workers=args.workers, force=args.force)
+
+    for result in results:
+        detail = result["error"] or ", ".join(os.path.basename(path) for path in result["json_paths"])
+        print(f"{result['status']:<10} {result['seconds']:>8.2f}s  {result['filename']}  {detail}")
+
+    errors = sum(1 for result in results if result["status"] == "error")
+    print(f"\n{len(results)} archivo(s), {errors} error(es) en {time.perf_counter() - start:.2f}s")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# backend/app/services/etapa_2/bulk_exporter.py
+
+import os
+import time
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from backend.app.core.config import BULK_EXPORT_MAX_WORKERS
+from backend.app.core.logger import setup_logger
+from .excel_exporter import EXCEL_EXPORT_CHUNK_SIZE, generate_excel_filename
+from .export_cache import excel_export_cache
+from .json_converter import load_json_as_sale_note, list_available_nvs
+
+logger = setup_logger()
+
+# Entrada del ZIP con las NVs que no se pudieron exportar
+ERRORS_ENTRY = "errores.txt"
+
+
+class _ZipStream:
+    """
+    Destino de escritura (sin seek) para ZipFile: acumula lo escrito hasta que
+    se retira con drain(), así el ZIP se entrega en bloques sin mantener el
+    archivo completo en memoria.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        """Retorna y descarta lo escrito desde la última llamada"""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_bulk_export_zip(nvs: Optional[Sequence[str]] = None,
+                         max_workers: Optional[int] = None,
+                         on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[bytes]:
+    """
+    Exporta el Excel actualizado de varias NVs en paralelo y entrega un ZIP con
+    un .xlsx por NV, en bloques, a medida que cada NV termina.
+
+    Cada proceso del pool carga su NV y la exporta a través de excel_export_cache
+    (las NVs sin cambios no se vuelven a generar) a un directorio temporal; este
+    proceso solo copia cada archivo terminado al ZIP. Los .xlsx ya vienen
+    comprimidos, por lo que se guardan sin volver a comprimir. Las NVs que
+    fallan se listan en ERRORS_ENTRY al final del ZIP.
+
+    Args:
+        nvs: Números de NV a exportar. Si es None se exportan todas las disponibles.
+        max_workers: Cantidad de procesos. Por defecto BULK_EXPORT_MAX_WORKERS.
+        on_result: Función llamada con el resultado de cada NV (nv, status
+            "exported" o "error", filename, seconds y error), en orden de término
+
+    Yields:
+        bytes: Bloques consecutivos del archivo ZIP
+    """
+    nvs = list(list_available_nvs() if nvs is None else nvs)
+    workers = min(max(1, max_workers or BULK_EXPORT_MAX_WORKERS), max(1, len(nvs)))
+    logger.info(f"Exportación masiva: {len(nvs)} NV(s), {workers} proceso(s)")
+
+    work_dir = tempfile.mkdtemp(prefix="bulk_export_")
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    stream = _ZipStream()
+    errors: List[str] = []
+
+    try:
+        with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for result in _iter_results(nvs, work_dir, executor):
+                if on_result is not None:
+                    on_result({key: value for key, value in result.items() if key != "path"})
+
+                if result["status"] == "error":
+                    errors.append(f"NV {result['nv']}: {result['error']}")
+                    continue
+
+                with open(result["path"], "rb") as src, archive.open(result["filename"], mode="w") as dst:
+                    while True:
+                        chunk = src.read(EXCEL_EXPORT_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        data = stream.drain()
+                        if data:
+                            yield data
+                os.unlink(result["path"])
+
+                data = stream.drain()
+                if data:
+                    yield data
+
+            if errors:
+                archive.writestr(ERRORS_ENTRY, "\n".join(errors) + "\n")
+
+        # Directorio central del ZIP
+        data = stream.drain()
+        if data:
+            yield data
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _iter_results(nvs: List[str], work_dir: str,
+                  executor: Optional[ProcessPoolExecutor]) -> Iterator[Dict[str, Any]]:
+    """Resultados de exportar cada NV, en orden de término"""
+    if executor is None:
+        for nv in nvs:
+            yield _export_one(nv, work_dir)
+        return
+
+    futures = [executor.submit(_export_one, nv, work_dir) for nv in nvs]
+    for future in as_completed(futures):
+        yield future.result()
+
+
+def _export_one(nv: str, work_dir: str) -> Dict[str, Any]:
+    """
+    Exporta una NV a un .xlsx dentro de work_dir (se ejecuta dentro de un proceso del pool).
+
+    Args:
+        nv: Número de NV
+        work_dir: Directorio temporal de la exportación
+
+    Returns:
+        Dict[str, Any]: Resultado con la ruta del archivo generado y su tiempo
+    """
+    start = time.perf_counter()
+    try:
+        sale_note = load_json_as_sale_note(nv)
+        filename = generate_excel_filename(sale_note)
+        path = os.path.join(work_dir, filename)
+        with excel_export_cache.open(sale_note) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, EXCEL_EXPORT_CHUNK_SIZE)
+        return {
+            "nv": nv,
+            "status": "exported",
+            "filename": filename,
+            "path": path,
+            "seconds": time.perf_counter() - start,
+            "error": None
+        }
+    except Exception as e:
+        return {
+            "nv": nv,
+            "status": "error",
+            "filename": None,
+            "path": None,
+            "seconds": time.perf_counter() - start,
+            "error": str(e)
+        }
+
+
+def generate_bulk_export_filename() -> str:
+    """Nombre del ZIP de una exportación masiva"""
+    return f"nvs_actualizadas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
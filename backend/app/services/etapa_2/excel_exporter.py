@@ -1,113 +1,262 @@
 """
 Servicio para exportar objetos SaleNote a archivos Excel
 Mantiene la estructura original pero incluye las nuevas variables.
+
+Las filas se escriben directamente desde los Plans con xlsxwriter en modo
+constant_memory: cada fila se vuelca a disco apenas se completa, por lo que la
+memoria no crece con el tamaño de la NV.
 """
 
-import pandas as pd
 import io
-from backend.app.api.v1.schemas.nv_schemas import SaleNote
+import tempfile
+from functools import lru_cache
+from typing import Any, BinaryIO, Iterable, Iterator, Optional, Sequence, Union
+import xlsxwriter  # type: ignore
+from xlsxwriter.utility import xl_pixel_width  # type: ignore
+from backend.app.api.v1.schemas.nv_schemas import SaleNote, Plan
+from backend.app.core.config import (
+    EXCEL_EXPORT_SPOOL_MAX_BYTES,
+    EXCEL_COLUMN_WIDTH_SAMPLE_ROWS,
+    EXCEL_MAX_COLUMN_WIDTH
+)
 from backend.app.core.logger import setup_logger
+from backend.app.services.etapa_2.flat_tables import TABLE_COLUMNS, iter_plan_rows
 
 logger = setup_logger()
 
+# Hojas con nombres en español (como el formato original)
+MATERIALS_SHEET = "materiales"
+JOINTS_SHEET = "uniones"
+
+# Formato de encabezado de pandas.DataFrame.to_excel (negrita, borde fino, centrado arriba)
+HEADER_FORMAT = {"bold": True, "top": 1, "right": 1, "bottom": 1, "left": 1, "align": "center", "valign": "top"}
+
+# Margen en píxeles que worksheet.autofit() agrega al texto más ancho de cada columna
+_COLUMN_PADDING_PIXELS = 7
+
+# Textos distintos cuyo ancho se recuerda (nv, plano, spool, DN, tipos y soldadores se repiten mucho)
+_WIDTH_CACHE_SIZE = 4096
+
+# Versión del formato del Excel generado: incrementarla al cambiar hojas, columnas o estilos
+# (invalida los Excel ya exportados en el cache de export_cache)
+EXCEL_EXPORT_FORMAT_VERSION = 1
+
+# Tamaño de cada bloque entregado por iter_sale_note_excel
+EXCEL_EXPORT_CHUNK_SIZE = 1024 * 1024
+
+
+class _ColumnWidths:
+    """
+    Ancho máximo (en píxeles) del contenido de cada columna de una hoja, medido
+    mientras se escriben las filas con el mismo criterio que worksheet.autofit().
+
+    Con sample_rows solo se miden las primeras filas de datos de la hoja, y una
+    columna que ya alcanzó el ancho máximo deja de medirse.
+    """
+
+    def __init__(self, columns: Sequence[str], sample_rows: Optional[int], max_width: float):
+        self.pixels = [_text_width(column) for column in columns]
+        self._remaining = sample_rows if sample_rows else None
+        self._max_pixels = _width_to_pixels(max_width)
+        self._max_content = self._max_pixels - _COLUMN_PADDING_PIXELS
+
+    def measure(self, values: Sequence[Any]) -> None:
+        """Mide una fila completa de valores (si la hoja aún está dentro de la muestra)"""
+        if self._remaining is not None:
+            if self._remaining <= 0:
+                return
+            self._remaining -= 1
+
+        pixels = self.pixels
+        for col, value in enumerate(values):
+            if pixels[col] >= self._max_content:
+                continue
+            width = _value_width(value)
+            if width > pixels[col]:
+                pixels[col] = width
+
+    def apply(self, worksheet: Any) -> None:
+        """Fija el ancho de las columnas con contenido, con el margen y límite de autofit()"""
+        for col, pixels in enumerate(self.pixels):
+            if pixels > 0:
+                worksheet.set_column_pixels(col, col, min(pixels + _COLUMN_PADDING_PIXELS, self._max_pixels))
+
+
+def write_sale_note_excel(output: Union[str, BinaryIO], nv: str, plans: Iterable[Plan],
+                          width_sample_rows: Optional[int] = EXCEL_COLUMN_WIDTH_SAMPLE_ROWS,
+                          max_column_width: float = EXCEL_MAX_COLUMN_WIDTH) -> None:
+    """
+    Escribe el Excel de una NV con las hojas materiales y uniones, incluyendo
+    las columnas originales y las variables editables.
+
+    Los Plans se recorren una sola vez, así que pueden venir de un iterador
+    (por ejemplo iter_sale_note_plans) sin cargar la NV completa. El ancho de
+    las columnas se calcula mientras se escriben las filas, con el mismo
+    criterio que worksheet.autofit() (que no funciona en modo constant_memory),
+    y se fija una sola vez al final.
+
+    Args:
+        output: Ruta del archivo o archivo binario abierto (con seek) donde escribir
+        nv: Número de NV
+        plans: Plans de la NV, en orden
+        width_sample_rows: Filas de datos medidas por hoja para el ancho (0 o None = todas)
+        max_column_width: Ancho máximo de columna, en caracteres (255 es el máximo de Excel)
+    """
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    try:
+        header_format = workbook.add_format(HEADER_FORMAT)
+        materials_sheet = workbook.add_worksheet(MATERIALS_SHEET)
+        joints_sheet = workbook.add_worksheet(JOINTS_SHEET)
+        _write_header(materials_sheet, TABLE_COLUMNS["materials"], header_format)
+        _write_header(joints_sheet, TABLE_COLUMNS["joints"], header_format)
+        materials_widths = _ColumnWidths(TABLE_COLUMNS["materials"], width_sample_rows, max_column_width)
+        joints_widths = _ColumnWidths(TABLE_COLUMNS["joints"], width_sample_rows, max_column_width)
+
+        materials_row = joints_row = 1
+
+        for material_rows, joint_rows in iter_plan_rows(nv, plans):
+            for values in material_rows:
+                _write_row(materials_sheet, materials_row, materials_widths, values)
+                materials_row += 1
+
+            for values in joint_rows:
+                _write_row(joints_sheet, joints_row, joints_widths, values)
+                joints_row += 1
+
+        materials_widths.apply(materials_sheet)
+        joints_widths.apply(joints_sheet)
+    finally:
+        workbook.close()
+
+    logger.info(f"Excel generado exitosamente para NV {nv} "
+                f"({materials_row - 1} materiales, {joints_row - 1} uniones)")
+
+
 def sale_note_to_excel(sale_note: SaleNote) -> io.BytesIO:
     """
     Convierte un objeto SaleNote a un archivo Excel con las hojas Materials y Joints.
     Incluye tanto las columnas originales como las nuevas variables editables.
-    
+
     Args:
         sale_note: Objeto SaleNote con todos los datos
-        
+
     Returns:
         io.BytesIO: Archivo Excel en memoria listo para descarga
     """
-    # Extraer materiales y juntas con las nuevas variables
-    materials = []
-    joints = []
-    
-    for plan in sale_note.plans:
-        spool = plan.spool_data
-        
-        # Procesar materiales
-        for mat in spool.materials:
-            materials.append({
-                "nv": sale_note.nv,
-                "plano": plan.plano,
-                "spool": spool.spool,
-                "mat_descripcion": mat.mat_descripcion,
-                "mat_dn": mat.mat_dn,
-                "mat_sch": mat.mat_sch,
-                "mat_qty": mat.mat_qty,
-                "mat_numero_interno": mat.mat_numero_interno or "",
-            })
-        
-        # Procesar uniones
-        for joint in spool.joints:
-            joints.append({
-                "nv": sale_note.nv,
-                "plano": plan.plano,
-                "spool": spool.spool,
-                "union_numero": joint.union_numero,
-                "union_dn": joint.union_dn,
-                "union_tipo": joint.union_tipo,
-                "union_armador": joint.union_armador or "",
-                "union_soldador_raiz": joint.union_soldador_raiz or "",
-                "union_soldador_remate": joint.union_soldador_remate or "",
-            })
-
-    # Crear DataFrames con el orden de columnas correcto
-    df_materials = pd.DataFrame(materials, columns=[
-        "nv", "plano", "spool", "mat_descripcion", "mat_dn", "mat_sch", "mat_qty", "mat_numero_interno"
-    ])
-    
-    df_joints = pd.DataFrame(joints, columns=[
-        "nv", "plano", "spool", "union_numero", "union_dn", "union_tipo", 
-        "union_armador", "union_soldador_raiz", "union_soldador_remate"
-    ])
-
-    # Crear archivo Excel en memoria
     output = io.BytesIO()
-    
+
     try:
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            # Escribir hojas con nombres en español (como el formato original)
-            df_materials.to_excel(writer, sheet_name="materiales", index=False)
-            df_joints.to_excel(writer, sheet_name="uniones", index=False)
-            
-            # Obtener el workbook y las hojas para aplicar formato (opcional)
-            workbook = writer.book
-            materials_worksheet = writer.sheets["materiales"]
-            joints_worksheet = writer.sheets["uniones"]
-            
-            # Aplicar autofit a las columnas (opcional)
-            for worksheet in [materials_worksheet, joints_worksheet]:
-                worksheet.autofit()
-        
+        write_sale_note_excel(output, sale_note.nv, sale_note.plans)
         output.seek(0)
-        logger.info(f"Excel generado exitosamente para NV {sale_note.nv}")
         return output
-        
+
     except Exception as e:
         logger.error(f"Error al generar Excel: {str(e)}")
         raise
 
 
+def sale_note_to_excel_file(nv: str, plans: Iterable[Plan]) -> BinaryIO:
+    """
+    Genera el Excel de una NV en un archivo temporal que se mantiene en memoria
+    hasta EXCEL_EXPORT_SPOOL_MAX_BYTES y luego pasa a disco.
+
+    Args:
+        nv: Número de NV
+        plans: Plans de la NV, en orden
+
+    Returns:
+        BinaryIO: Archivo posicionado al comienzo; se elimina al cerrarlo
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=EXCEL_EXPORT_SPOOL_MAX_BYTES)
+    try:
+        write_sale_note_excel(output, nv, plans)
+    except Exception as e:
+        output.close()
+        logger.error(f"Error al generar Excel: {str(e)}")
+        raise
+    output.seek(0)
+    return output
+
+
+def iter_sale_note_excel(nv: str, plans: Iterable[Plan], chunk_size: int = EXCEL_EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Genera el Excel de una NV y lo entrega en bloques de bytes (para respuestas
+    en streaming). El archivo temporal se elimina al terminar de iterar.
+
+    Args:
+        nv: Número de NV
+        plans: Plans de la NV, en orden
+        chunk_size: Tamaño de cada bloque
+
+    Yields:
+        bytes: Bloques consecutivos del archivo .xlsx
+    """
+    yield from iter_file_chunks(sale_note_to_excel_file(nv, plans), chunk_size)
+
+
+def iter_file_chunks(file: BinaryIO, chunk_size: int = EXCEL_EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Entrega el contenido de un archivo abierto en bloques y lo cierra al terminar"""
+    with file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _write_header(worksheet: Any, columns: Sequence[str], header_format: Any) -> None:
+    """Escribe el encabezado de una hoja con el formato de pandas"""
+    for col, column in enumerate(columns):
+        worksheet.write(0, col, column, header_format)
+
+
+def _write_row(worksheet: Any, row: int, widths: _ColumnWidths, values: Sequence[Any]) -> None:
+    """Escribe una fila completa (los vacíos quedan en blanco) y la mide para el ancho"""
+    for col, value in enumerate(values):
+        worksheet.write(row, col, value)
+    widths.measure(values)
+
+
+def _value_width(value: Any) -> int:
+    """Ancho en píxeles de un valor de celda (vacío para None), como en worksheet.autofit()"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return _text_width(value)
+    return 7 * len(str(value))
+
+
+def _width_to_pixels(width: float) -> int:
+    """Convierte un ancho de columna en caracteres a píxeles (inversa de la conversión de xlsxwriter)"""
+    if width < 1:
+        return int(width * 12 + 0.5)
+    return int(width * 7 + 0.5) + 5
+
+
+@lru_cache(maxsize=_WIDTH_CACHE_SIZE)
+def _text_width(value: str) -> int:
+    """Ancho en píxeles de un texto (de su línea más larga), como en worksheet.autofit()"""
+    if "\n" not in value:
+        return xl_pixel_width(value)
+    return max(xl_pixel_width(line) for line in value.split("\n"))
+
+
 def generate_excel_filename(sale_note: SaleNote, include_timestamp: bool = False) -> str:
     """
     Genera un nombre de archivo apropiado para el Excel exportado.
-    
+
     Args:
         sale_note: Objeto SaleNote
         include_timestamp: Si incluir timestamp en el nombre
-        
+
     Returns:
         str: Nombre del archivo
     """
     base_name = f"nv_{sale_note.nv}_actualizado"
-    
+
     if include_timestamp:
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         return f"{base_name}_{timestamp}.xlsx"
-    
+
     return f"{base_name}.xlsx"
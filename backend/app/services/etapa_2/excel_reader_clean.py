@@ -3,17 +3,24 @@
 import pandas as pd
 import os
 from typing import List, Dict, Any
-from backend.app.api.v1.schemas.nv_schemas import SaleNote, Plan, Spool, Material, Joint
+from backend.app.api.v1.schemas.nv_schemas import SaleNote
 from backend.app.core.config import OUTPUT_DIR_ETAPA_1_SALIDA
+from .workbook_loader import load_workbook_sheets, scan_workbook_summary, MissingSheetError
+from .workbook_cache import parsed_workbook_cache
+from .flat_tables import frames_to_plans, frames_to_sale_notes
 
 
-def read_excel_to_sale_note(filename: str) -> SaleNote:
+def read_excel_to_sale_note(filename: str, use_cache: bool = True) -> SaleNote:
     """
     Lee un archivo Excel y convierte los datos a una instancia de SaleNote
     con toda la jerarquía de datos estructurada.
     
+    El resultado se cachea en memoria por (ruta, mtime, tamaño), por lo que el
+    SaleNote retornado puede estar compartido y no debe modificarse.
+    
     Args:
         filename: Nombre del archivo Excel (ej: "nv_data_ejemplo.xlsx")
+        use_cache: Si se puede reutilizar un resultado ya parseado del mismo archivo
         
     Returns:
         SaleNote: Objeto estructurado con toda la jerarquía de datos
@@ -28,29 +35,72 @@ def read_excel_to_sale_note(filename: str) -> SaleNote:
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Archivo no encontrado: {file_path}")
     
-    try:
-        # Detectar los nombres de las hojas (pueden estar en español o inglés)
-        xl = pd.ExcelFile(file_path)
-        sheet_names = xl.sheet_names
+    if not use_cache:
+        return _parse_excel_to_sale_note(file_path)
+    
+    # Reutilizar el SaleNote ya parseado si el archivo no cambió en disco
+    return parsed_workbook_cache.get_or_load(
+        file_path,
+        lambda: _parse_excel_to_sale_note(file_path),
+        namespace=__name__
+    )
+
+
+def read_excel_to_sale_notes(filename: str, use_cache: bool = True) -> List[SaleNote]:
+    """
+    Lee un archivo Excel que puede contener varias NVs y retorna un SaleNote
+    por cada NV, particionando ambas hojas por (nv, plano, spool) en una sola pasada.
+    
+    Igual que read_excel_to_sale_note, el resultado se cachea en memoria y los
+    objetos retornados no deben modificarse.
+    
+    Args:
+        filename: Nombre del archivo Excel (ej: "nv_data_consolidado.xlsx")
+        use_cache: Si se puede reutilizar un resultado ya parseado del mismo archivo
         
-        materials_sheet = None
-        joints_sheet = None
+    Returns:
+        List[SaleNote]: Una nota de venta por NV, en el orden de aparición en el archivo
         
-        # Buscar la hoja de materiales
-        for sheet in sheet_names:
-            if isinstance(sheet, str) and sheet.lower() in ['materials', 'materiales']:
-                materials_sheet = sheet
-            elif isinstance(sheet, str) and sheet.lower() in ['joints', 'uniones']:
-                joints_sheet = sheet
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+        ValueError: Si el formato del Excel no es válido
+    """
+    file_path = os.path.join(OUTPUT_DIR_ETAPA_1_SALIDA, filename)
+    
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Archivo no encontrado: {file_path}")
+    
+    if not use_cache:
+        return _parse_excel_to_sale_notes(file_path)
+    
+    return parsed_workbook_cache.get_or_load(
+        file_path,
+        lambda: _parse_excel_to_sale_notes(file_path),
+        namespace=f"{__name__}.sale_notes"
+    )
+
+
+def _parse_excel_to_sale_note(file_path: str) -> SaleNote:
+    """
+    Parsea un archivo Excel completo a SaleNote sin pasar por el cache.
+    
+    Args:
+        file_path: Ruta completa del archivo Excel
         
-        if not materials_sheet:
-            raise ValueError("No se encontró hoja de materiales (buscar: 'Materials' o 'materiales')")
-        if not joints_sheet:
-            raise ValueError("No se encontró hoja de uniones (buscar: 'Joints' o 'uniones')")
+    Returns:
+        SaleNote: Objeto estructurado con toda la jerarquía de datos
         
-        # Leer las hojas del Excel
-        df_materials: pd.DataFrame = pd.read_excel(file_path, sheet_name=materials_sheet)  # type: ignore
-        df_joints: pd.DataFrame = pd.read_excel(file_path, sheet_name=joints_sheet)  # type: ignore
+    Raises:
+        ValueError: Si el formato del Excel no es válido
+    """
+    try:
+        # Abrir el libro una sola vez y leer ambas hojas desde el mismo manejador
+        # (las hojas pueden llamarse en español o inglés)
+        workbook = load_workbook_sheets(file_path)
+        materials_sheet = workbook.materials_sheet
+        joints_sheet = workbook.joints_sheet
+        df_materials: pd.DataFrame = workbook.df_materials
+        df_joints: pd.DataFrame = workbook.df_joints  # type: ignore
         
         # Validar que las hojas no estén vacías
         if df_materials.empty:
@@ -62,7 +112,7 @@ def read_excel_to_sale_note(filename: str) -> SaleNote:
         nv = str(df_materials['nv'].iloc[0])  # type: ignore
         
         # Agrupar por plano para crear la estructura jerárquica
-        plans = _create_plans_from_dataframes(df_materials, df_joints)
+        plans = frames_to_plans(df_materials, df_joints)
         
         # Crear y retornar el objeto SaleNote
         return SaleNote(nv=nv, plans=plans)
@@ -71,101 +121,34 @@ def read_excel_to_sale_note(filename: str) -> SaleNote:
         raise ValueError(f"Error al procesar el archivo Excel: {str(e)}")
 
 
-def _create_plans_from_dataframes(df_materials: pd.DataFrame, df_joints: pd.DataFrame) -> List[Plan]:
+def _parse_excel_to_sale_notes(file_path: str) -> List[SaleNote]:
     """
-    Crea una lista de Plans a partir de los DataFrames de materiales y uniones.
+    Parsea un archivo Excel completo a un SaleNote por NV sin pasar por el cache.
     
     Args:
-        df_materials: DataFrame con los datos de materiales
-        df_joints: DataFrame con los datos de uniones
+        file_path: Ruta completa del archivo Excel
         
     Returns:
-        List[Plan]: Lista de planes estructurados
-    """
-    plans: List[Plan] = []
-    
-    # Obtener todos los planos únicos
-    unique_plans = df_materials['plano'].unique()  # type: ignore
-    
-    for plan_name in unique_plans:
-        # Filtrar datos por plano
-        plan_materials = df_materials[df_materials['plano'] == plan_name]  # type: ignore
-        plan_joints = df_joints[df_joints['plano'] == plan_name]  # type: ignore
-        
-        # Obtener todos los spools únicos para este plano
-        unique_spools = plan_materials['spool'].unique()  # type: ignore
-        
-        # Para cada spool en este plano, crear un Plan separado
-        # (basado en la estructura del modelo que sugiere un Plan por Spool)
-        for spool_name in unique_spools:
-            spool_materials = plan_materials[plan_materials['spool'] == spool_name]  # type: ignore
-            spool_joints = plan_joints[plan_joints['spool'] == spool_name]  # type: ignore
-            
-            # Crear el objeto Spool
-            spool = _create_spool_from_dataframes(str(spool_name), spool_materials, spool_joints)
-            
-            # Crear el Plan
-            plan = Plan(plano=str(plan_name), spool_data=spool)
-            plans.append(plan)
-    
-    return plans
-
-
-def _create_spool_from_dataframes(spool_name: str, df_materials: pd.DataFrame, df_joints: pd.DataFrame) -> Spool:
-    """
-    Crea un objeto Spool a partir de los DataFrames filtrados de materiales y uniones.
-    
-    Args:
-        spool_name: Nombre del spool
-        df_materials: DataFrame con los materiales del spool
-        df_joints: DataFrame con las uniones del spool
+        List[SaleNote]: Una nota de venta por NV
         
-    Returns:
-        Spool: Objeto spool estructurado
+    Raises:
+        ValueError: Si el formato del Excel no es válido
     """
-    # Crear lista de materiales
-    materials: List[Material] = []
-    for _, row in df_materials.iterrows():  # type: ignore
-        # Manejar la nueva columna mat_numero_interno si existe
-        mat_numero_interno = None
-        if 'mat_numero_interno' in df_materials.columns:
-            mat_numero_interno = str(row['mat_numero_interno']) if pd.notna(row['mat_numero_interno']) else None
+    try:
+        workbook = load_workbook_sheets(file_path)
+        df_materials: pd.DataFrame = workbook.df_materials
+        df_joints: pd.DataFrame = workbook.df_joints  # type: ignore
         
-        material = Material(
-            mat_descripcion=str(row['mat_descripcion']),  # type: ignore
-            mat_dn=str(row['mat_dn']),  # type: ignore
-            mat_sch=str(row['mat_sch']),  # type: ignore
-            mat_qty=int(row['mat_qty']),  # type: ignore
-            mat_numero_interno=mat_numero_interno
-        )
-        materials.append(material)
-    
-    # Crear lista de uniones
-    joints: List[Joint] = []
-    for _, row in df_joints.iterrows():  # type: ignore
-        # Manejar las nuevas columnas si existen
-        union_armador = None
-        union_soldador_raiz = None
-        union_soldador_remate = None
+        # Validar que las hojas no estén vacías
+        if df_materials.empty:
+            raise ValueError(f"La hoja '{workbook.materials_sheet}' está vacía")
+        if df_joints.empty:
+            raise ValueError(f"La hoja '{workbook.joints_sheet}' está vacía")
         
-        if 'union_armador' in df_joints.columns:
-            union_armador = str(row['union_armador']) if pd.notna(row['union_armador']) else None
-        if 'union_soldador_raiz' in df_joints.columns:
-            union_soldador_raiz = str(row['union_soldador_raiz']) if pd.notna(row['union_soldador_raiz']) else None
-        if 'union_soldador_remate' in df_joints.columns:
-            union_soldador_remate = str(row['union_soldador_remate']) if pd.notna(row['union_soldador_remate']) else None
+        return frames_to_sale_notes(df_materials, df_joints)
         
-        joint = Joint(
-            union_numero=str(row['union_numero']),  # type: ignore
-            union_dn=str(row['union_dn']),  # type: ignore
-            union_tipo=str(row['union_tipo']),  # type: ignore
-            union_armador=union_armador,
-            union_soldador_raiz=union_soldador_raiz,
-            union_soldador_remate=union_soldador_remate
-        )
-        joints.append(joint)
-    
-    return Spool(spool=spool_name, materials=materials, joints=joints)
+    except Exception as e:
+        raise ValueError(f"Error al procesar el archivo Excel: {str(e)}")
 
 
 def get_available_excel_files() -> List[str]:
@@ -186,12 +169,17 @@ def get_available_excel_files() -> List[str]:
     return excel_files
 
 
-def validate_excel_structure(filename: str) -> Dict[str, Any]:
+def validate_excel_structure(filename: str, deep: bool = False) -> Dict[str, Any]:
     """
     Valida que un archivo Excel tenga la estructura esperada.
     
+    Por defecto se hace una validación rápida que lee solo los encabezados y las
+    dimensiones de las hojas, y recorre únicamente las columnas nv/plano/spool
+    para los conteos. Con `deep=True` se cargan ambas hojas completas.
+    
     Args:
         filename: Nombre del archivo Excel a validar
+        deep: Si se deben cargar las hojas completas para validar
         
     Returns:
         Dict[str, Any]: Diccionario con información de validación
@@ -210,38 +198,30 @@ def validate_excel_structure(filename: str) -> Dict[str, Any]:
         return validation_result
     
     try:
-        # Verificar que existan las hojas requeridas
-        xl = pd.ExcelFile(file_path)
-        sheet_names = xl.sheet_names
-        
-        # Buscar las hojas de materiales y uniones (pueden estar en español o inglés)
-        materials_sheet = None
-        joints_sheet = None
-        
-        for sheet in sheet_names:
-            if isinstance(sheet, str) and sheet.lower() in ['materials', 'materiales']:
-                materials_sheet = sheet
-            elif isinstance(sheet, str) and sheet.lower() in ['joints', 'uniones']:
-                joints_sheet = sheet
-        
-        if not materials_sheet:
-            validation_result["errors"].append("No se encontró hoja de materiales (buscar: 'Materials' o 'materiales')")
+        # Verificar que existan las hojas requeridas y obtener sus columnas
+        try:
+            if deep:
+                # Leer ambas hojas completas con una sola apertura
+                workbook = load_workbook_sheets(file_path)
+                df_materials: pd.DataFrame = workbook.df_materials
+                df_joints: pd.DataFrame = workbook.df_joints  # type: ignore
+                materials_columns = list(df_materials.columns)
+                joints_columns = list(df_joints.columns)
+            else:
+                # Leer solo encabezados, dimensiones y columnas clave
+                summary = scan_workbook_summary(file_path)
+                materials_columns = summary.materials_columns
+                joints_columns = summary.joints_columns
+        except MissingSheetError as e:
+            validation_result["errors"].append(str(e))
             return validation_result
         
-        if not joints_sheet:
-            validation_result["errors"].append("No se encontró hoja de uniones (buscar: 'Joints' o 'uniones')")
-            return validation_result
-        
-        # Leer las hojas
-        df_materials: pd.DataFrame = pd.read_excel(file_path, sheet_name=materials_sheet)  # type: ignore
-        df_joints: pd.DataFrame = pd.read_excel(file_path, sheet_name=joints_sheet)  # type: ignore
-        
         # Verificar columnas requeridas
         required_material_columns = ['nv', 'plano', 'spool', 'mat_descripcion', 'mat_dn', 'mat_sch', 'mat_qty']
         required_joint_columns = ['nv', 'plano', 'spool', 'union_numero', 'union_dn', 'union_tipo']
         
-        missing_material_columns = [col for col in required_material_columns if col not in df_materials.columns]
-        missing_joint_columns = [col for col in required_joint_columns if col not in df_joints.columns]
+        missing_material_columns = [col for col in required_material_columns if col not in materials_columns]
+        missing_joint_columns = [col for col in required_joint_columns if col not in joints_columns]
         
         if missing_material_columns:
             validation_result["errors"].append(f"Columnas faltantes en Materials: {missing_material_columns}")
@@ -253,16 +233,27 @@ def validate_excel_structure(filename: str) -> Dict[str, Any]:
             return validation_result
         
         # Información adicional
-        validation_result["info"] = {
-            "total_materials": len(df_materials),
-            "total_joints": len(df_joints),
-            "unique_nvs": df_materials['nv'].nunique(),  # type: ignore
-            "unique_plans": df_materials['plano'].nunique(),  # type: ignore
-            "unique_spools": df_materials['spool'].nunique()  # type: ignore
-        }
+        if deep:
+            validation_result["info"] = {
+                "total_materials": len(df_materials),
+                "total_joints": len(df_joints),
+                "unique_nvs": df_materials['nv'].nunique(),  # type: ignore
+                "unique_plans": df_materials['plano'].nunique(),  # type: ignore
+                "unique_spools": df_materials['spool'].nunique(),  # type: ignore
+                "nvs": sorted(df_materials['nv'].dropna().astype(str).unique().tolist())  # type: ignore
+            }
+        else:
+            validation_result["info"] = {
+                "total_materials": summary.total_materials,
+                "total_joints": summary.total_joints,
+                "unique_nvs": len(summary.nvs),
+                "unique_plans": len(summary.plans),
+                "unique_spools": len(summary.spools),
+                "nvs": sorted({str(nv) for nv in summary.nvs})
+            }
         
         # Advertencias
-        if df_materials['nv'].nunique() > 1:  # type: ignore
+        if validation_result["info"]["unique_nvs"] > 1:
             validation_result["warnings"].append("Se encontraron múltiples NVs en el archivo")
         
         validation_result["valid"] = True
@@ -0,0 +1,269 @@
+# backend/app/services/etapa_2/excel_stream_reader.py
+
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from openpyxl import load_workbook  # type: ignore
+from backend.app.api.v1.schemas.nv_schemas import Plan, Spool
+from backend.app.core.config import OUTPUT_DIR_ETAPA_1_SALIDA
+from .workbook_loader import find_sheet_names, MissingSheetError, cell_to_int
+from .flat_tables import items_from_columns
+
+REQUIRED_MATERIAL_COLUMNS = ['nv', 'plano', 'spool', 'mat_descripcion', 'mat_dn', 'mat_sch', 'mat_qty']
+REQUIRED_JOINT_COLUMNS = ['nv', 'plano', 'spool', 'union_numero', 'union_dn', 'union_tipo']
+
+# Clave de agrupación de filas: (plano, spool)
+SpoolKey = Tuple[str, str]
+Row = Tuple[Any, ...]
+
+# Clave con el número de fila de Excel en cada fila leída (para los mensajes de error)
+ROW_NUMBER_KEY = "__row__"
+
+
+def iter_plans_from_excel(filename: str) -> Iterator[Plan]:
+    """
+    Lee un archivo Excel en modo streaming y entrega un Plan por cada spool,
+    sin cargar las hojas completas en memoria.
+
+    Las filas de ambas hojas deben venir agrupadas por (plano, spool), es decir,
+    todas las filas de un spool contiguas y los spools en el mismo orden en
+    materiales y uniones (el formato que genera etapa 1). Con esa condición la
+    memoria máxima queda acotada por el spool más grande. Los spools sin uniones
+    simplemente no aparecen en la hoja de uniones.
+
+    Args:
+        filename: Nombre del archivo Excel (ej: "nv_data_ejemplo.xlsx")
+
+    Yields:
+        Plan: Un plan por spool, en el orden de la hoja de materiales
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+        ValueError: Si faltan hojas o columnas, si las filas no están agrupadas, si
+            las uniones no siguen el orden de los spools de materiales o si una
+            cantidad está vacía o no es un número
+    """
+    file_path = os.path.join(OUTPUT_DIR_ETAPA_1_SALIDA, filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Archivo no encontrado: {file_path}")
+
+    for _nv, plan_name, spool_name, material_rows, joint_rows in _iter_spool_groups(file_path):
+        yield build_plan(plan_name, spool_name, material_rows, joint_rows)
+
+
+def _iter_spool_groups(file_path: str) -> Iterator[Tuple[str, str, str, List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Recorre ambas hojas en paralelo y entrega las filas de cada spool.
+
+    Args:
+        file_path: Ruta completa del archivo Excel
+
+    Yields:
+        Tuple: (nv, plano, spool, filas de materiales, filas de uniones)
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+
+    try:
+        materials_sheet, joints_sheet = find_sheet_names(workbook.sheetnames)
+
+        if not materials_sheet:
+            raise MissingSheetError("No se encontró hoja de materiales (buscar: 'Materials' o 'materiales')")
+        if not joints_sheet:
+            raise MissingSheetError("No se encontró hoja de uniones (buscar: 'Joints' o 'uniones')")
+
+        material_groups = _iter_sheet_groups(workbook[materials_sheet], materials_sheet, REQUIRED_MATERIAL_COLUMNS)
+        joint_groups = _iter_sheet_groups(workbook[joints_sheet], joints_sheet, REQUIRED_JOINT_COLUMNS)
+
+        # Ambas hojas siguen el mismo orden de spools: basta con leer por
+        # adelantado un único grupo de uniones. Si no es el del spool actual,
+        # ese spool no tiene uniones y el grupo queda para un spool posterior.
+        material_keys: Set[SpoolKey] = set()
+        lookahead = next(joint_groups, None)
+
+        for key, material_rows in material_groups:
+            material_keys.add(key)
+            joint_rows: List[Dict[str, Any]] = []
+            if lookahead is not None and lookahead[0] == key:
+                joint_rows = lookahead[1]
+                lookahead = next(joint_groups, None)
+            elif lookahead is not None and lookahead[0] in material_keys:
+                raise _joints_order_error(joints_sheet, lookahead[0])
+
+            nv = cell_to_str(material_rows[0].get('nv'))
+            yield nv, key[0], key[1], material_rows, joint_rows
+
+        # Las uniones restantes solo pueden ser de spools sin materiales (que no
+        # forman ningún Plan); si alguna es de un spool ya entregado, el orden no coincide
+        while lookahead is not None:
+            if lookahead[0] in material_keys:
+                raise _joints_order_error(joints_sheet, lookahead[0])
+            lookahead = next(joint_groups, None)
+    finally:
+        workbook.close()
+
+
+def _joints_order_error(sheet_name: str, key: SpoolKey) -> ValueError:
+    """Error para uniones que no siguen el orden de los spools de la hoja de materiales"""
+    return ValueError(
+        f"La hoja '{sheet_name}' no sigue el orden de spools de la hoja de materiales: "
+        f"las uniones del spool '{key[1]}' del plano '{key[0]}' aparecen después de otro spool"
+    )
+
+
+def _iter_sheet_groups(worksheet: Any, sheet_name: str,
+                       required_columns: Sequence[str]) -> Iterator[Tuple[SpoolKey, List[Dict[str, Any]]]]:
+    """
+    Agrupa las filas contiguas de una hoja por (plano, spool).
+
+    Args:
+        worksheet: Hoja de openpyxl abierta en modo read_only
+        sheet_name: Nombre de la hoja (para los mensajes de error)
+        required_columns: Columnas que deben existir en el encabezado
+
+    Yields:
+        Tuple[SpoolKey, List[Dict[str, Any]]]: Clave del spool y sus filas como
+        diccionarios (con el número de fila en ROW_NUMBER_KEY)
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+
+    if header is None:
+        raise ValueError(f"La hoja '{sheet_name}' está vacía")
+
+    columns = [str(column) if column is not None else "" for column in header]
+    missing_columns = [column for column in required_columns if column not in columns]
+    if missing_columns:
+        raise ValueError(f"Columnas faltantes en {sheet_name}: {missing_columns}")
+
+    plano_index = columns.index('plano')
+    spool_index = columns.index('spool')
+
+    seen_keys: Set[SpoolKey] = set()
+    current_key: Optional[SpoolKey] = None
+    current_rows: List[Dict[str, Any]] = []
+
+    for row_number, row in enumerate(rows, start=2):
+        if _is_empty_row(row):
+            continue
+
+        plano = cell_value(row, plano_index)
+        spool = cell_value(row, spool_index)
+        if plano is None or spool is None:
+            continue
+
+        key = (cell_to_str(plano), cell_to_str(spool))
+        if key != current_key:
+            if current_key is not None:
+                yield current_key, current_rows
+            if key in seen_keys:
+                raise ValueError(
+                    f"La hoja '{sheet_name}' no está agrupada por plano/spool: "
+                    f"el spool '{key[1]}' del plano '{key[0]}' aparece en filas no contiguas"
+                )
+            seen_keys.add(key)
+            current_key = key
+            current_rows = []
+
+        current_rows.append(row_dict(columns, row, row_number))
+
+    if current_key is not None:
+        yield current_key, current_rows
+
+
+def build_plan(plan_name: str, spool_name: str,
+               material_rows: List[Dict[str, Any]], joint_rows: List[Dict[str, Any]]) -> Plan:
+    """
+    Construye un Plan validando en bloque los materiales y uniones de un spool.
+    Las celdas se convierten por columna con el mismo criterio que la lectura
+    con pandas.
+
+    Args:
+        plan_name: Nombre del plano
+        spool_name: Nombre del spool
+        material_rows: Filas de materiales del spool
+        joint_rows: Filas de uniones del spool
+
+    Returns:
+        Plan: Plan con su Spool estructurado
+    """
+    return Plan(plano=plan_name, spool_data=Spool(
+        spool=spool_name,
+        materials=items_from_columns(_row_columns(material_rows, _MATERIAL_CONVERTERS), "materials"),
+        joints=items_from_columns(_row_columns(joint_rows, _JOINT_CONVERTERS), "joints")
+    ))
+
+
+def _row_columns(rows: List[Dict[str, Any]], converters: Dict[str, Callable[[Any], Any]]) -> Dict[str, List[Any]]:
+    """
+    Valores convertidos de cada campo de las filas de un spool, por columna.
+
+    Raises:
+        ValueError: Si una celda no se puede convertir, indicando su columna y fila
+    """
+    columns: Dict[str, List[Any]] = {}
+    for field, convert in converters.items():
+        values: List[Any] = []
+        for row in rows:
+            try:
+                values.append(convert(row.get(field)))
+            except ValueError as e:
+                raise ValueError(
+                    f"Valor inválido en la columna '{field}' (fila {row.get(ROW_NUMBER_KEY)}): {e}"
+                ) from None
+        columns[field] = values
+    return columns
+
+
+def row_dict(columns: Sequence[str], row: Row, row_number: int) -> Dict[str, Any]:
+    """Fila como diccionario por nombre de columna, con su número de fila de Excel"""
+    values = dict(zip(columns, row))
+    values[ROW_NUMBER_KEY] = row_number
+    return values
+
+
+def _is_empty_row(row: Row) -> bool:
+    """Indica si todas las celdas de la fila están vacías"""
+    return all(value is None for value in row)
+
+
+def cell_value(row: Row, index: int) -> Any:
+    """Retorna el valor de una celda, tolerando filas más cortas que el encabezado"""
+    return row[index] if index < len(row) else None
+
+
+def cell_to_str(value: Any) -> str:
+    """
+    Convierte el valor de una celda a texto igual que la lectura con pandas:
+    los números enteros guardados como float se muestran sin decimales y las
+    celdas vacías quedan como 'nan'.
+    """
+    if value is None:
+        return 'nan'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _optional_cell_to_str(value: Any) -> Optional[str]:
+    """Convierte una celda opcional a texto, usando None para celdas vacías"""
+    if value is None:
+        return None
+    return cell_to_str(value)
+
+
+# Conversión de las celdas de cada campo de materiales y uniones
+_MATERIAL_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "mat_descripcion": cell_to_str,
+    "mat_dn": cell_to_str,
+    "mat_sch": cell_to_str,
+    "mat_qty": cell_to_int,
+    "mat_numero_interno": _optional_cell_to_str
+}
+_JOINT_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "union_numero": cell_to_str,
+    "union_dn": cell_to_str,
+    "union_tipo": cell_to_str,
+    "union_armador": _optional_cell_to_str,
+    "union_soldador_raiz": _optional_cell_to_str,
+    "union_soldador_remate": _optional_cell_to_str
+}
@@ -0,0 +1,194 @@
+# backend/app/services/etapa_2/export_cache.py
+
+import os
+import hashlib
+import tempfile
+import threading
+import weakref
+from typing import Any, BinaryIO, Dict, List, Tuple
+from backend.app.api.v1.schemas.nv_schemas import SaleNote
+from backend.app.core.config import (
+    EXCEL_EXPORT_CACHE_DIR,
+    EXCEL_EXPORT_CACHE_MAX_BYTES,
+    EXCEL_COLUMN_WIDTH_SAMPLE_ROWS,
+    EXCEL_MAX_COLUMN_WIDTH
+)
+from backend.app.core.logger import setup_logger
+from .excel_exporter import EXCEL_EXPORT_FORMAT_VERSION, write_sale_note_excel
+
+logger = setup_logger()
+
+_EXPORT_SUFFIX = ".xlsx"
+
+
+def sale_note_content_hash(sale_note: SaleNote) -> str:
+    """
+    Hash estable (SHA-256) del contenido de una NV junto con la versión del
+    formato y las opciones de ancho del Excel: dos NVs con los mismos datos
+    producen el mismo hash sin importar cuándo o desde dónde se cargaron.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{EXCEL_EXPORT_FORMAT_VERSION}:{EXCEL_COLUMN_WIDTH_SAMPLE_ROWS}:{EXCEL_MAX_COLUMN_WIDTH}\n".encode("utf-8"))
+    digest.update(sale_note.model_dump_json().encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ExcelExportCache:
+    """
+    Cache en disco de Excel exportados, indexado por el hash del contenido de
+    la NV: volver a descargar una NV sin cambios solo lee el archivo.
+
+    Es un LRU acotado por tamaño total: cada acierto actualiza el mtime del
+    archivo y, al agregar uno nuevo, se eliminan los de mtime más antiguo hasta
+    quedar bajo max_bytes. Los archivos se escriben en un temporal y se
+    publican con os.replace, por lo que varios procesos pueden compartir el
+    directorio.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        # Hash ya calculado de cada SaleNote vivo (los SaleNote cacheados se comparten y no se modifican)
+        self._hashes: Dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, content_hash + _EXPORT_SUFFIX)
+
+    def content_hash(self, sale_note: SaleNote) -> str:
+        """Hash del contenido de la NV, calculado una sola vez por objeto"""
+        key = id(sale_note)
+        with self._lock:
+            content_hash = self._hashes.get(key)
+        if content_hash is None:
+            content_hash = sale_note_content_hash(sale_note)
+            with self._lock:
+                self._hashes[key] = content_hash
+            weakref.finalize(sale_note, self._hashes.pop, key, None)
+        return content_hash
+
+    def open(self, sale_note: SaleNote) -> BinaryIO:
+        """
+        Abre el Excel de la NV desde el cache, generándolo si no está.
+
+        Returns:
+            BinaryIO: Archivo abierto en modo binario. Sigue siendo legible aunque
+                otro proceso lo elimine del cache mientras se lee.
+        """
+        content_hash = self.content_hash(sale_note)
+        path = self._path(content_hash)
+
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            pass
+        else:
+            self._touch(path)
+            with self._lock:
+                self.hits += 1
+            return f
+
+        with self._lock:
+            self.misses += 1
+        f = self._render(sale_note, path)
+        self._evict(keep=path)
+        return f
+
+    def read(self, sale_note: SaleNote) -> bytes:
+        """Retorna los bytes del Excel de la NV (desde el cache o generándolo)"""
+        with self.open(sale_note) as f:
+            return f.read()
+
+    def _render(self, sale_note: SaleNote, path: str) -> BinaryIO:
+        """
+        Genera el Excel en un temporal del directorio del cache y lo publica.
+        El archivo se abre antes de publicarlo para que una limpieza de otro
+        proceso no lo elimine antes de leerlo.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_sale_note_excel(f, sale_note.nv, sale_note.plans)
+            rendered = open(tmp_path, "rb")
+            os.replace(tmp_path, path)
+            return rendered
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        """Marca el archivo como usado recientemente"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(mtime, tamaño, ruta) de cada Excel del cache"""
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(_EXPORT_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self, keep: str) -> None:
+        """Elimina los Excel usados hace más tiempo hasta quedar bajo max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+            logger.info(f"Excel eliminado del cache de exportación: {os.path.basename(path)}")
+
+    def clear(self) -> int:
+        """Elimina todos los Excel del cache y retorna cuántos se eliminaron"""
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna los contadores y el tamaño actual del cache en disco"""
+        entries = self._entries()
+        with self._lock:
+            return {
+                "entries": len(entries),
+                "total_bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+# Cache compartido por la descarga del editor y el endpoint de exportación
+excel_export_cache = ExcelExportCache(EXCEL_EXPORT_CACHE_DIR, EXCEL_EXPORT_CACHE_MAX_BYTES)
@@ -0,0 +1,295 @@
+# backend/app/services/etapa_2/flat_tables.py
+
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Type
+import pandas as pd
+from pydantic import BaseModel, TypeAdapter
+from backend.app.api.v1.schemas.nv_schemas import SaleNote, Plan, Spool, Material, Joint
+from backend.app.core.logger import setup_logger
+from backend.app.services.etapa_1.excel_generator import MATERIALS_COLUMNS, JOINTS_COLUMNS
+from .interning import CATEGORICAL_FIELDS, intern_values
+from .workbook_loader import cell_to_int
+
+logger = setup_logger()
+
+# Conversión única entre SaleNote y su forma plana: dos tablas con el formato
+# de las hojas de etapa 1, una fila por material y una por unión, con las
+# columnas clave nv, plano y spool seguidas de los campos del modelo.
+#
+# Modelos → filas: tuplas en el orden de las columnas (para escribir o armar
+# DataFrames). Filas → modelos: columnas completas convertidas de una vez y
+# validadas en bloque, agrupadas por spool con un único groupby por hoja.
+KEY_COLUMNS = ["nv", "plano", "spool"]
+
+TABLE_COLUMNS: Dict[str, List[str]] = {"materials": list(MATERIALS_COLUMNS), "joints": list(JOINTS_COLUMNS)}
+TABLE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    table: tuple(columns[len(KEY_COLUMNS):]) for table, columns in TABLE_COLUMNS.items()
+}
+MATERIAL_FIELDS = TABLE_FIELDS["materials"]
+JOINT_FIELDS = TABLE_FIELDS["joints"]
+
+_TABLE_MODELS: Dict[str, Type[BaseModel]] = {"materials": Material, "joints": Joint}
+
+# Validadores de listas completas (se construyen una sola vez por proceso)
+_ADAPTERS: Dict[str, TypeAdapter] = {
+    "materials": TypeAdapter(List[Material]),
+    "joints": TypeAdapter(List[Joint])
+}
+
+# Valores de los campos de cada modelo como tupla, en el orden de las columnas
+_ROW_GETTERS = {table: attrgetter(*fields) for table, fields in TABLE_FIELDS.items()}
+
+
+# ---------------------------------------------------------------------------
+# Modelos → filas
+# ---------------------------------------------------------------------------
+
+def item_rows(items: Sequence[BaseModel], table: str) -> List[Tuple[Any, ...]]:
+    """Valores de cada material o unión como tupla (sin las columnas clave)"""
+    return list(map(_ROW_GETTERS[table], items))
+
+
+def iter_plan_rows(nv: str, plans: Iterable[Plan]) -> Iterator[Tuple[List[Tuple[Any, ...]], List[Tuple[Any, ...]]]]:
+    """
+    Filas completas (nv, plano, spool y campos) de materiales y uniones de cada
+    Plan. Los Plans se recorren una sola vez, así que pueden venir de un iterador.
+
+    Yields:
+        Tuple[List[Tuple], List[Tuple]]: (filas de materiales, filas de uniones) de cada Plan
+    """
+    materials_getter = _ROW_GETTERS["materials"]
+    joints_getter = _ROW_GETTERS["joints"]
+    for plan in plans:
+        spool = plan.spool_data
+        key = (nv, plan.plano, spool.spool)
+        yield (
+            [key + values for values in map(materials_getter, spool.materials)],
+            [key + values for values in map(joints_getter, spool.joints)]
+        )
+
+
+def items_to_frame(items: Sequence[BaseModel], table: str) -> pd.DataFrame:
+    """DataFrame con los campos de los materiales o uniones de un spool (sin las columnas clave)"""
+    return pd.DataFrame.from_records(item_rows(items, table), columns=list(TABLE_FIELDS[table]))
+
+
+def items_to_records(items: Sequence[BaseModel], columns: Mapping[str, str]) -> List[Dict[str, Any]]:
+    """
+    Registros con algunos campos de los materiales o uniones.
+
+    Args:
+        items: Materiales o uniones
+        columns: Nombre de cada clave del registro → campo del modelo
+    """
+    getter = attrgetter(*columns.values())
+    names = tuple(columns)
+    if len(names) == 1:
+        return [{names[0]: getter(item)} for item in items]
+    return [dict(zip(names, getter(item))) for item in items]
+
+
+# ---------------------------------------------------------------------------
+# Filas → modelos
+# ---------------------------------------------------------------------------
+
+def frame_columns(df: pd.DataFrame, table: str) -> Dict[str, List[Any]]:
+    """
+    Convierte cada columna de campos de un DataFrame completo de una vez:
+    enteros como int() (los decimales se truncan), texto obligatorio con
+    astype(str) y texto opcional con None en celdas vacías o columnas ausentes.
+
+    Returns:
+        Dict[str, List[Any]]: Valores de cada campo del modelo, por fila
+
+    Raises:
+        ValueError: Si un entero está vacío o no es un número, indicando su fila
+    """
+    model = _TABLE_MODELS[table]
+    columns: Dict[str, List[Any]] = {}
+    for field in TABLE_FIELDS[table]:
+        info = model.model_fields[field]
+        if info.annotation is int:
+            columns[field] = _int_column(df, field)
+        elif info.is_required():
+            columns[field] = _required_str_column(df, field)
+        else:
+            columns[field] = _optional_str_column(df, field)
+    return columns
+
+
+def items_from_columns(columns: Mapping[str, Sequence[Any]], table: str) -> List[BaseModel]:
+    """
+    Construye los materiales o uniones a partir de columnas ya convertidas,
+    validando la lista de registros en una sola llamada. Los registros se
+    completan columna por columna; los textos de los campos categóricos quedan
+    compartidos entre filas y los campos opcionales ausentes quedan en None.
+    """
+    categorical = CATEGORICAL_FIELDS[table]
+    records: List[Dict[str, Any]] = [{} for _ in range(len(next(iter(columns.values()), ())))]
+    for field in TABLE_FIELDS[table]:
+        if field not in columns:
+            continue
+        values = intern_values(columns[field]) if field in categorical else columns[field]
+        for record, value in zip(records, values):
+            record[field] = value
+    return _ADAPTERS[table].validate_python(records)
+
+
+def items_from_frame(df: pd.DataFrame, table: str) -> List[BaseModel]:
+    """Materiales o uniones de un DataFrame completo (hoja entera o filas de un spool)"""
+    return items_from_columns(frame_columns(df, table), table)
+
+
+def frames_to_plans(df_materials: pd.DataFrame, df_joints: pd.DataFrame) -> List[Plan]:
+    """
+    Crea los Plans (uno por spool) de los DataFrames de una NV.
+
+    Args:
+        df_materials: DataFrame con los datos de materiales
+        df_joints: DataFrame con los datos de uniones
+
+    Returns:
+        List[Plan]: Planes en el orden de aparición en la hoja de materiales
+    """
+    return [plan for _, plan in group_plans(df_materials, df_joints, ['plano', 'spool'])]
+
+
+def frames_to_sale_notes(df_materials: pd.DataFrame, df_joints: pd.DataFrame) -> List[SaleNote]:
+    """
+    Crea un SaleNote por cada NV presente en los DataFrames, particionando
+    ambas hojas por (nv, plano, spool) en una sola pasada.
+
+    Si el archivo tiene una sola NV, las filas con la celda nv vacía se asignan
+    a esa NV. Con varias NVs no se puede saber a cuál pertenecen: se descartan
+    y se registra una advertencia con la cantidad de filas.
+
+    Returns:
+        List[SaleNote]: Notas de venta en el orden de aparición de cada NV
+    """
+    df_materials, df_joints = _fill_blank_nv(df_materials, df_joints)
+    plans_by_nv: Dict[str, List[Plan]] = {}
+    for (nv, _plan_name, _spool_name), plan in group_plans(df_materials, df_joints, ['nv', 'plano', 'spool']):
+        plans_by_nv.setdefault(str(nv), []).append(plan)
+    return [SaleNote(nv=nv, plans=plans) for nv, plans in plans_by_nv.items()]
+
+
+def _fill_blank_nv(df_materials: pd.DataFrame, df_joints: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Completa la columna nv vacía con la única NV del archivo, o advierte cuántas filas quedan sin NV"""
+    frames = (df_materials, df_joints)
+    blank = [df['nv'].isna() & df['plano'].notna() & df['spool'].notna() for df in frames]
+    blank_rows = sum(int(mask.sum()) for mask in blank)
+    if not blank_rows:
+        return df_materials, df_joints
+
+    nvs = pd.concat([df['nv'].dropna() for df in frames]).unique()  # type: ignore
+    if len(nvs) == 1:
+        return df_materials.fillna({'nv': nvs[0]}), df_joints.fillna({'nv': nvs[0]})  # type: ignore
+
+    logger.warning(
+        f"Se descartaron {blank_rows} filas sin NV: el archivo tiene {len(nvs)} NVs "
+        f"y no se puede saber a cuál pertenecen"
+    )
+    return df_materials, df_joints
+
+
+def group_plans(df_materials: pd.DataFrame, df_joints: pd.DataFrame,
+                key_columns: List[str]) -> List[Tuple[Tuple[Any, ...], Plan]]:
+    """
+    Particiona ambas hojas una sola vez por las columnas clave (que terminan en
+    plano y spool) y crea un Plan por cada grupo.
+
+    El orden es el de primera aparición en la hoja de materiales en cada nivel
+    de la clave: primero por el primer nivel (ej: nv), luego por el siguiente
+    (ej: plano) y finalmente por spool.
+
+    Args:
+        df_materials: DataFrame con los datos de materiales
+        df_joints: DataFrame con los datos de uniones
+        key_columns: Columnas de agrupación, terminando en ['plano', 'spool']
+
+    Returns:
+        List[Tuple[Tuple[Any, ...], Plan]]: Clave de cada grupo junto con su Plan
+    """
+    # Las filas sin valor en alguna columna clave no pertenecen a ningún Plan
+    df_materials = df_materials.dropna(subset=key_columns)  # type: ignore
+    df_joints = df_joints.dropna(subset=key_columns)  # type: ignore
+
+    # Construir y validar todos los materiales y uniones de la hoja de una vez
+    materials = items_from_frame(df_materials, "materials")
+    joints = items_from_frame(df_joints, "joints")
+
+    grouped_plans: List[Tuple[Tuple[Any, ...], Plan]] = []
+    for key, material_positions, joint_positions in ordered_groups(df_materials, df_joints, key_columns):
+        plan_name, spool_name = key[-2], key[-1]
+        spool = Spool(
+            spool=str(spool_name),
+            materials=[materials[i] for i in material_positions],
+            joints=[joints[i] for i in joint_positions]
+        )
+        grouped_plans.append((key, Plan(plano=str(plan_name), spool_data=spool)))
+    return grouped_plans
+
+
+def ordered_groups(df_materials: pd.DataFrame, df_joints: pd.DataFrame,
+                   key_columns: List[str]) -> List[Tuple[Tuple[Any, ...], Any, Any]]:
+    """
+    Particiona ambas hojas por las columnas clave y ordena los grupos como
+    group_plans (primera aparición en la hoja de materiales en cada nivel).
+
+    Returns:
+        List[Tuple[Tuple[Any, ...], Any, Any]]: (clave, posiciones en materiales,
+        posiciones en uniones) de cada grupo, en orden
+    """
+    # Particionar ambas hojas una sola vez en lugar de filtrar con máscaras
+    # booleanas por cada plano y cada spool
+    materials_positions = df_materials.groupby(key_columns, sort=False).indices  # type: ignore
+    joints_positions = df_joints.groupby(key_columns, sort=False).indices  # type: ignore
+
+    # Primera aparición de cada prefijo de la clave (ej: cada nv, cada (nv, plano))
+    prefix_order: Dict[Tuple[Any, ...], int] = {}
+    for key, positions in materials_positions.items():  # type: ignore
+        for level in range(1, len(key_columns)):
+            prefix = key[:level]
+            prefix_order[prefix] = min(prefix_order.get(prefix, positions[0]), positions[0])
+
+    group_keys = sorted(
+        materials_positions,
+        key=lambda key: tuple(prefix_order[key[:level]] for level in range(1, len(key_columns)))
+        + (materials_positions[key][0],)  # type: ignore
+    )
+
+    return [(key, materials_positions[key], joints_positions.get(key, [])) for key in group_keys]  # type: ignore
+
+
+def _int_column(df: pd.DataFrame, column: str) -> List[int]:
+    """
+    Convierte una columna entera completa con astype(int), que trunca igual que
+    int(). Si falla, se ubica la primera celda inválida para informar su fila
+    de Excel (índice del DataFrame + 2, por el encabezado).
+    """
+    values = df[column]
+    try:
+        return values.astype(int).tolist()  # type: ignore
+    except (TypeError, ValueError, OverflowError):
+        pass
+    for label, value in values.items():
+        try:
+            cell_to_int(value)
+        except ValueError as e:
+            row = label + 2 if isinstance(label, int) else label
+            raise ValueError(f"Valor inválido en la columna '{column}' (fila {row}): {e}") from None
+    return [cell_to_int(value) for value in values.tolist()]
+
+
+def _required_str_column(df: pd.DataFrame, column: str) -> List[str]:
+    """Convierte una columna obligatoria completa a texto"""
+    return df[column].astype(str).tolist()  # type: ignore
+
+
+def _optional_str_column(df: pd.DataFrame, column: str) -> List[Optional[str]]:
+    """Convierte una columna opcional completa a texto, usando None para vacíos o columnas ausentes"""
+    if column not in df.columns:
+        return [None] * len(df)
+    values = df[column]
+    text = values.astype(str)
+    return text.where(values.notna() & text.ne(""), None).tolist()  # type: ignore
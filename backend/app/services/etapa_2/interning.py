@@ -0,0 +1,116 @@
+# backend/app/services/etapa_2/interning.py
+
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Campos de texto que en una NV toman pocos valores distintos (medidas, tipos y
+# personas) y se repiten en miles de filas
+MATERIAL_CATEGORICAL_FIELDS = ("mat_descripcion", "mat_dn", "mat_sch")
+JOINT_CATEGORICAL_FIELDS = ("union_dn", "union_tipo", "union_armador",
+                            "union_soldador_raiz", "union_soldador_remate")
+CATEGORICAL_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "materials": MATERIAL_CATEGORICAL_FIELDS,
+    "joints": JOINT_CATEGORICAL_FIELDS
+}
+
+# Un campo se codifica con diccionario solo si cada valor distinto aparece en
+# promedio al menos esta cantidad de veces
+DICTIONARY_MIN_REPEATS = 2
+
+
+def intern_value(value: Any) -> Any:
+    """Retorna la instancia compartida (sys.intern) de un texto; otros valores quedan igual"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def intern_values(values: Iterable[Any]) -> List[Any]:
+    """Lista con cada texto reemplazado por su instancia compartida"""
+    return [sys.intern(value) if type(value) is str else value for value in values]
+
+
+def intern_raw_items(items: List[Dict[str, Any]], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """Comparte en el lugar los textos de los campos indicados de cada material o unión"""
+    intern = sys.intern
+    for item in items:
+        for field in fields:
+            value = item.get(field)
+            if type(value) is str:
+                item[field] = intern(value)
+    return items
+
+
+def intern_raw_plan(raw_plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Comparte en el lugar los textos de los campos categóricos de un Plan sin validar"""
+    spool_data = raw_plan["spool_data"]
+    for key, fields in CATEGORICAL_FIELDS.items():
+        intern_raw_items(spool_data[key], fields)
+    return raw_plan
+
+
+def build_dictionaries(raw_plans: Sequence[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Diccionario de valores distintos (en orden de aparición) de cada campo
+    categórico de la NV. Se omiten los campos con demasiados valores distintos
+    para que codificarlos valga la pena.
+
+    Args:
+        raw_plans: Plans de la NV como diccionarios (model_dump)
+
+    Returns:
+        Dict[str, List[str]]: Valores de cada campo; la posición de un valor es su código
+    """
+    dictionaries: Dict[str, List[str]] = {}
+    for key, fields in CATEGORICAL_FIELDS.items():
+        for field in fields:
+            codes: Dict[str, int] = {}
+            occurrences = 0
+            for raw_plan in raw_plans:
+                for item in raw_plan["spool_data"][key]:
+                    value = item[field]
+                    if value is not None:
+                        codes.setdefault(value, len(codes))
+                        occurrences += 1
+            if codes and len(codes) * DICTIONARY_MIN_REPEATS <= occurrences:
+                dictionaries[field] = list(codes)
+    return dictionaries
+
+
+def dictionary_codes(dictionaries: Dict[str, List[str]]) -> Dict[str, Dict[str, int]]:
+    """Código de cada valor de los diccionarios, por campo"""
+    return {field: {value: code for code, value in enumerate(values)} for field, values in dictionaries.items()}
+
+
+def encode_raw_plan(raw_plan: Dict[str, Any], codes: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """
+    Reemplaza en el lugar los valores categóricos de un Plan sin validar por su
+    código. Los valores que no están en el diccionario quedan como texto.
+    """
+    spool_data = raw_plan["spool_data"]
+    for key, fields in CATEGORICAL_FIELDS.items():
+        encoded = [(field, codes[field]) for field in fields if field in codes]
+        if not encoded:
+            continue
+        for item in spool_data[key]:
+            for field, field_codes in encoded:
+                code: Optional[int] = field_codes.get(item[field])
+                if code is not None:
+                    item[field] = code
+    return raw_plan
+
+
+def decode_raw_plan(raw_plan: Dict[str, Any], dictionaries: Dict[str, List[str]]) -> Dict[str, Any]:
+    """
+    Reemplaza en el lugar los códigos de un Plan sin validar por el valor del
+    diccionario, que queda compartido por todas las filas que lo usan.
+    """
+    spool_data = raw_plan["spool_data"]
+    for key, fields in CATEGORICAL_FIELDS.items():
+        decoded = [(field, dictionaries[field]) for field in fields if field in dictionaries]
+        if not decoded:
+            continue
+        for item in spool_data[key]:
+            for field, values in decoded:
+                value = item[field]
+                if type(value) is int:
+                    item[field] = values[value]
+    return raw_plan
@@ -1,7 +1,12 @@
 import os
-import json
-from backend.app.services.etapa_2.excel_reader_clean import read_excel_to_sale_note
-from backend.app.api.v1.schemas.nv_schemas import SaleNote
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Union
+from backend.app.services.etapa_2.excel_reader_clean import read_excel_to_sale_notes
+from backend.app.api.v1.schemas.nv_schemas import SaleNote, SaleNoteManifest, Plan, Material, Joint
+from backend.app.services.etapa_2 import sharded_store, sqlite_repository
+from backend.app.services.etapa_2.json_journal import pending_journal_paths, VersionConflictError
+from backend.app.services.etapa_2.workbook_cache import sale_note_cache
+from backend.app.core.config import JSON_STORAGE_INDENT, SALE_NOTE_STORAGE_BACKEND, SALE_NOTE_DB_PATH
 from backend.app.core.logger import setup_logger
 
 logger = setup_logger()
@@ -9,33 +14,260 @@ logger = setup_logger()
 JSON_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "data", "json_data")
 os.makedirs(JSON_DIR, exist_ok=True)
 
-def convert_excel_to_json(filename: str) -> str:
-    """Convierte Excel a JSON y lo guarda en data/json_data"""
+# Sangría de la exportación JSON pensada para lectura humana
+EXPORT_JSON_INDENT = 2
+
+def sale_note_to_json_bytes(sale_note: SaleNote, indent: Optional[int] = JSON_STORAGE_INDENT) -> bytes:
+    """
+    Serializa un SaleNote directamente a JSON (UTF-8) con el serializador nativo
+    de pydantic, sin construir el diccionario intermedio de model_dump().
+    
+    Args:
+        sale_note: Nota de venta a serializar
+        indent: Sangría del JSON. None genera JSON compacto (formato de almacenamiento)
+        
+    Returns:
+        bytes: JSON codificado en UTF-8
+    """
+    return sale_note.model_dump_json(indent=indent).encode("utf-8")
+
+def export_sale_note_json(sale_note: SaleNote) -> bytes:
+    """JSON con sangría para descargar o revisar a mano"""
+    return sale_note_to_json_bytes(sale_note, indent=EXPORT_JSON_INDENT)
+
+def _json_path(nv: Union[int, str]) -> str:
+    """Ruta del JSON (manifiesto) de una NV"""
+    return os.path.join(JSON_DIR, f"nv_{nv}.json")
+
+def _use_sqlite() -> bool:
+    """Indica si las NVs se guardan en la base SQLite en lugar de data/json_data"""
+    return SALE_NOTE_STORAGE_BACKEND == "sqlite"
+
+def _write_sale_note(sale_note: SaleNote, expected_version: Optional[int] = None) -> str:
+    """
+    Guarda un SaleNote completo en data/json_data con el formato de almacenamiento:
+    un manifiesto nv_X.json más un archivo por spool. Descarta el diario de ediciones.
+    Con el almacenamiento SQLite reemplaza la NV en la base y devuelve su ruta.
+    
+    Si se indica expected_version, la NV se reemplaza solo si sigue en esa
+    versión (VersionConflictError en caso contrario).
+    """
+    if _use_sqlite():
+        sqlite_repository.save_sale_note(sale_note, expected_version=expected_version)
+        return SALE_NOTE_DB_PATH
+    
+    json_path = _json_path(sale_note.nv)
+    sharded_store.write_sale_note(json_path, sale_note, expected_version=expected_version)
+    return json_path
+
+def convert_excel_to_json(filename: str) -> List[str]:
+    """
+    Convierte Excel a JSON y lo guarda en data/json_data.
+    Si el Excel contiene varias NVs se genera un JSON por cada una.
+    
+    Returns:
+        List[str]: Rutas de los JSON generados, uno por NV
+    """
     try:
         logger.info(f"Procesando Excel: {filename}")
-        sale_note = read_excel_to_sale_note(filename)
-        json_data = sale_note.model_dump()
-        nv = sale_note.nv
-        json_path = os.path.join(JSON_DIR, f"nv_{nv}.json")
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(json_data, f, indent=2, ensure_ascii=False)
-        logger.info(f"JSON generado: {json_path}")
-        return json_path
+        json_paths: List[str] = []
+        for sale_note in read_excel_to_sale_notes(filename):
+            json_path = _write_sale_note(sale_note)
+            logger.info(f"JSON generado: {json_path}")
+            json_paths.append(json_path)
+        return json_paths
     except Exception as e:
         logger.error(f"Error al convertir {filename}: {str(e)}")
         raise
 
 def load_json_as_sale_note(nv: int) -> SaleNote:
-    """Carga JSON y valida con Pydantic"""
-    json_path = os.path.join(JSON_DIR, f"nv_{nv}.json")
-    with open(json_path, "r", encoding="utf-8") as f:
-        json_data = json.load(f)
-    return SaleNote(**json_data)
-
-def save_sale_note_to_json(sale_note: SaleNote) -> str:
-    nv = sale_note.nv
-    json_path = os.path.join(JSON_DIR, f"nv_{nv}.json")
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(sale_note.model_dump(), f, indent=2, ensure_ascii=False)
+    """
+    Carga la NV completa (todos sus spools) y valida con Pydantic.
+    Las ediciones del diario que aún no se compactaron se aplican al cargar.
+    
+    El resultado se cachea en el proceso por versión del manifiesto y del
+    diario: mientras no cambien, las llamadas siguientes (cada interacción en
+    Streamlit) no vuelven a leer ni validar la NV. El SaleNote retornado se
+    comparte entre llamadas y no debe modificarse.
+    """
+    if _use_sqlite():
+        return sqlite_repository.load_sale_note(str(nv))
+    
+    json_path = _json_path(nv)
+    return sale_note_cache.get_or_load(
+        json_path,
+        lambda: sharded_store.load_sale_note(json_path),
+        namespace="sale_note",
+        companions=pending_journal_paths(json_path)
+    )
+
+def load_nv_manifest(nv: Union[int, str]) -> SaleNoteManifest:
+    """
+    Carga solo la lista de planos/spools de una NV con sus cantidades, sin leer
+    los datos de cada spool.
+    """
+    if _use_sqlite():
+        return sqlite_repository.load_manifest(str(nv))
+    return sharded_store.load_manifest(_json_path(nv))
+
+def load_spool(nv: Union[int, str], index: int) -> Plan:
+    """
+    Carga un único Plan (spool) de una NV.
+    
+    Args:
+        nv: Número de NV
+        index: Posición del Plan en el manifiesto de la NV
+        
+    Returns:
+        Plan: Plan con sus materiales y uniones
+    """
+    if _use_sqlite():
+        return sqlite_repository.load_plan(str(nv), index)
+    return sharded_store.load_plan(_json_path(nv), index)
+
+def iter_sale_note_plans(nv: Union[int, str]) -> Iterator[Plan]:
+    """
+    Recorre los Plans de una NV en orden, cargando uno por vez (con las
+    ediciones del diario aplicadas). Para resúmenes y exportaciones de NVs
+    grandes sin tener la NV completa en memoria; se puede dejar de iterar en
+    cualquier momento.
+    """
+    if _use_sqlite():
+        return sqlite_repository.iter_plans(str(nv))
+    return sharded_store.iter_plans(_json_path(nv))
+
+def load_sale_note_stats(nv: Union[int, str]) -> Dict[str, Any]:
+    """
+    Calcula los totales de una NV recorriendo sus Plans de a uno, sin construir
+    el SaleNote completo: cantidad de material por DN, uniones por tipo, uniones
+    por soldador (una unión con el mismo soldador en raíz y remate se cuenta una
+    vez) y uniones sin soldador de remate.
+    
+    Igual que load_json_as_sale_note, se cachea por versión del manifiesto y
+    del diario, y el resultado no debe modificarse.
+    """
+    def loader() -> Dict[str, Any]:
+        total_spools = total_materials = total_joints = joints_without_remate = 0
+        material_qty_by_dn: Counter = Counter()
+        joints_by_tipo: Counter = Counter()
+        joints_by_welder: Counter = Counter()
+        
+        for plan in iter_sale_note_plans(nv):
+            spool = plan.spool_data
+            total_spools += 1
+            total_materials += len(spool.materials)
+            total_joints += len(spool.joints)
+            for material in spool.materials:
+                material_qty_by_dn[material.mat_dn] += material.mat_qty
+            for joint in spool.joints:
+                joints_by_tipo[joint.union_tipo] += 1
+                joints_by_welder.update({joint.union_soldador_raiz, joint.union_soldador_remate} - {None})
+                if joint.union_soldador_remate is None:
+                    joints_without_remate += 1
+        
+        return {
+            "nv": load_nv_manifest(nv).nv,
+            "total_spools": total_spools,
+            "total_materials": total_materials,
+            "total_joints": total_joints,
+            "material_qty_by_dn": dict(material_qty_by_dn),
+            "joints_by_tipo": dict(joints_by_tipo),
+            "joints_by_welder": dict(joints_by_welder),
+            "joints_without_remate": joints_without_remate
+        }
+    
+    if _use_sqlite():
+        return loader()
+    
+    json_path = _json_path(nv)
+    return sale_note_cache.get_or_load(
+        json_path,
+        loader,
+        namespace="sale_note_stats",
+        companions=pending_journal_paths(json_path)
+    )
+
+def save_sale_note_to_json(sale_note: SaleNote, expected_version: Optional[int] = None) -> str:
+    """
+    Reemplaza la NV completa.
+    
+    Args:
+        sale_note: Nota de venta a guardar
+        expected_version: Versión de la NV (SaleNoteManifest.version) sobre la que
+            se hicieron los cambios. Si es None se reemplaza sin verificar.
+        
+    Returns:
+        str: Ruta del JSON de la NV (o de la base SQLite)
+        
+    Raises:
+        VersionConflictError: Si otro usuario guardó cambios en la NV desde expected_version
+    """
+    json_path = _write_sale_note(sale_note, expected_version=expected_version)
     logger.info(f"JSON actualizado: {json_path}")
     return json_path
+
+def save_spool_edit(nv: Union[int, str], plano: str, spool: str,
+                    materials: Optional[List[Material]] = None,
+                    joints: Optional[List[Joint]] = None,
+                    expected_version: Optional[int] = None) -> Optional[int]:
+    """
+    Guarda la edición de los materiales y/o uniones de un spool como registro
+    del diario de la NV, sin reescribir el JSON completo. El diario se integra
+    en segundo plano al superar sus umbrales, reescribiendo solo los archivos
+    de los spools editados.
+    
+    La edición se acepta solo si el spool sigue en expected_version: las
+    ediciones de otros usuarios sobre otros spools de la misma NV no generan
+    conflicto y se conservan.
+    
+    Args:
+        nv: Número de NV
+        plano: Plano del spool editado
+        spool: Nombre del spool editado
+        materials: Lista completa de materiales del spool (None si no cambió)
+        joints: Lista completa de uniones del spool (None si no cambió)
+        expected_version: Versión del spool (SpoolSummary.version) que vio quien
+            edita. Si es None se guarda sin verificar.
+        
+    Returns:
+        Optional[int]: Versión nueva del spool (None si no se guardó nada)
+        
+    Raises:
+        VersionConflictError: Si otro usuario guardó cambios en el spool desde expected_version
+    """
+    json_path = _json_path(nv)
+    if not _use_sqlite() and not os.path.exists(json_path):
+        raise FileNotFoundError(f"JSON no encontrado: {json_path}")
+    
+    new_version = None
+    for field, items in (("materials", materials), ("joints", joints)):
+        if items is None:
+            continue
+        if _use_sqlite():
+            new_version = sqlite_repository.save_spool(str(nv), plano, spool, field, items,
+                                                       expected_version=expected_version)
+        else:
+            new_version = sharded_store.save_spool(json_path, plano, spool, field, items,
+                                                   expected_version=expected_version)
+        # El segundo campo se verifica contra la versión que dejó el primero
+        if expected_version is not None:
+            expected_version = new_version
+    logger.info(f"Edición guardada: NV {nv}, plano {plano}, spool {spool} (versión {new_version})")
+    return new_version
+
+def delete_sale_note_json(nv: Union[int, str]) -> None:
+    """Elimina el JSON de una NV junto con sus archivos por spool y su diario de ediciones"""
+    if _use_sqlite():
+        sqlite_repository.delete_sale_note(str(nv))
+        return
+    sharded_store.delete_sale_note(_json_path(nv))
+    sale_note_cache.invalidate(_json_path(nv))
+
+def list_available_nvs() -> List[str]:
+    """Lista las NVs convertidas disponibles en el almacenamiento configurado"""
+    if _use_sqlite():
+        return sqlite_repository.list_nvs()
+    return sorted(
+        name[len("nv_"):-len(".json")] for name in os.listdir(JSON_DIR)
+        if name.startswith("nv_") and name.endswith(".json")
+    )
@@ -0,0 +1,305 @@
+# backend/app/services/etapa_2/json_journal.py
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from pydantic import BaseModel, TypeAdapter
+from backend.app.api.v1.schemas.nv_schemas import Plan, Material, Joint
+from backend.app.core.config import JSON_JOURNAL_MAX_RECORDS, JSON_JOURNAL_MAX_BYTES
+from backend.app.core.logger import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: el bloqueo de escritura solo excluye a los hilos del proceso
+    fcntl = None  # type: ignore
+
+logger = setup_logger()
+
+# Validadores de la lista que reemplaza cada campo editable de un spool
+SPOOL_FIELD_ADAPTERS: Dict[str, TypeAdapter] = {
+    "materials": TypeAdapter(List[Material]),
+    "joints": TypeAdapter(List[Joint])
+}
+
+# Función que integra una lista de registros al almacenamiento de la NV
+FoldRecords = Callable[[List[Dict[str, Any]]], None]
+
+# Diarios en compactación dentro de este proceso y cantidad de registros de cada diario
+_lock = threading.Lock()
+_compacting: Set[str] = set()
+_record_counts: Dict[str, int] = {}
+
+# Bloqueos de escritura de cada NV y profundidad de anidamiento en el hilo que lo tiene
+_write_locks: Dict[str, threading.RLock] = {}
+_write_lock_depth: Dict[str, int] = {}
+
+
+class VersionConflictError(ValueError):
+    """La NV o el spool cambió desde la versión sobre la que se hizo la edición"""
+
+
+def journal_path(snapshot_path: str) -> str:
+    """Ruta del diario de ediciones de un snapshot (nv_X.json -> nv_X.journal)"""
+    return os.path.splitext(snapshot_path)[0] + ".journal"
+
+
+def _compacting_path(snapshot_path: str) -> str:
+    """Ruta del diario que se está integrando al snapshot"""
+    return journal_path(snapshot_path) + ".compacting"
+
+
+def lock_path(snapshot_path: str) -> str:
+    """Ruta del archivo de bloqueo de escritura de una NV (nv_X.json -> nv_X.lock)"""
+    return os.path.splitext(snapshot_path)[0] + ".lock"
+
+
+@contextmanager
+def write_lock(snapshot_path: str) -> Iterator[None]:
+    """
+    Bloqueo exclusivo de escritura de una NV, entre hilos y entre procesos.
+    Solo se mantiene mientras se verifica la versión y se escribe, por lo que
+    las ediciones de NVs distintas nunca se esperan entre sí. Es reentrante
+    dentro del mismo hilo.
+
+    Args:
+        snapshot_path: Ruta del JSON de la NV
+    """
+    with _lock:
+        lock = _write_locks.setdefault(snapshot_path, threading.RLock())
+
+    with lock:
+        depth = _write_lock_depth.get(snapshot_path, 0)
+        fd = None
+        if depth == 0 and fcntl is not None:
+            fd = os.open(lock_path(snapshot_path), os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        _write_lock_depth[snapshot_path] = depth + 1
+        try:
+            yield
+        finally:
+            _write_lock_depth[snapshot_path] = depth
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+
+def pending_journal_paths(snapshot_path: str) -> List[str]:
+    """Archivos de diario (en compactación y actual) cuyos registros se aplican al cargar"""
+    return [_compacting_path(snapshot_path), journal_path(snapshot_path)]
+
+
+def write_file_atomic(path: str, data: bytes) -> None:
+    """
+    Escribe un archivo completo de forma atómica: se escribe en un temporal,
+    se fuerza a disco y recién entonces reemplaza al archivo anterior.
+
+    Args:
+        path: Ruta final del archivo
+        data: Contenido completo
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(os.path.dirname(path))
+
+
+def fsync_directory(directory: str) -> None:
+    """Fuerza a disco la entrada de directorio de un rename (no disponible en Windows)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def append_spool_delta(snapshot_path: str, plano: str, spool: str, field: str,
+                       items: List[BaseModel], generation: Optional[str], fold: FoldRecords,
+                       version: Optional[int] = None) -> int:
+    """
+    Agrega al diario el reemplazo completo de los materiales o uniones de un
+    spool. El registro es idempotente (fija el valor del campo), por lo que
+    volver a aplicarlo después de una compactación interrumpida no cambia el
+    resultado.
+
+    Cuando el diario supera JSON_JOURNAL_MAX_RECORDS registros o
+    JSON_JOURNAL_MAX_BYTES bytes se lanza una compactación en segundo plano.
+
+    Args:
+        snapshot_path: Ruta del JSON de la NV
+        plano: Plano del spool editado
+        spool: Nombre del spool editado
+        field: "materials" o "joints"
+        items: Lista completa de materiales o uniones del spool
+        generation: Generación del almacenamiento a la que aplica el registro;
+            al reescribirse la NV completa los registros anteriores se ignoran
+        fold: Función que integra los registros al almacenamiento al compactar
+        version: Versión de la NV que crea esta edición
+
+    Returns:
+        int: Cantidad de registros del diario después de agregar este
+    """
+    if field not in SPOOL_FIELD_ADAPTERS:
+        raise ValueError(f"Campo de spool no editable: {field}")
+
+    path = journal_path(snapshot_path)
+    record = {
+        "generation": generation,
+        "version": version,
+        "plano": plano,
+        "spool": spool,
+        "field": field,
+        "items": SPOOL_FIELD_ADAPTERS[field].dump_python(items, mode="json")
+    }
+    line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+    with _lock:
+        if path not in _record_counts:
+            _record_counts[path] = sum(1 for _ in _read_records(path))
+        with open(path, "ab") as f:
+            # Si la última escritura quedó incompleta, el registro nuevo empieza en otra línea
+            if f.tell() > 0 and not _ends_with_newline(path):
+                line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        _record_counts[path] += 1
+        records = _record_counts[path]
+
+    if records >= JSON_JOURNAL_MAX_RECORDS or os.path.getsize(path) >= JSON_JOURNAL_MAX_BYTES:
+        schedule_compaction(snapshot_path, fold)
+
+    return records
+
+
+def read_journal(snapshot_path: str) -> List[Dict[str, Any]]:
+    """
+    Lee, en orden, los registros pendientes de integrar: primero los de una
+    compactación en curso o interrumpida y luego los del diario actual.
+
+    Los registros deben leerse antes que el almacenamiento de la NV: si una
+    compactación termina entre ambas lecturas, el almacenamiento ya contiene
+    esos registros y volver a aplicarlos no tiene efecto.
+
+    Args:
+        snapshot_path: Ruta del JSON de la NV
+
+    Returns:
+        List[Dict[str, Any]]: Registros del diario
+    """
+    records = list(_read_records(_compacting_path(snapshot_path)))
+    records.extend(_read_records(journal_path(snapshot_path)))
+    return records
+
+
+def compact_journal(snapshot_path: str, fold: FoldRecords) -> bool:
+    """
+    Integra el diario al almacenamiento de la NV y lo elimina.
+
+    El diario se renombra primero a `.compacting`, así las ediciones que llegan
+    durante la compactación van a un diario nuevo. Si el proceso se interrumpe,
+    el archivo `.compacting` se sigue aplicando al cargar y se integra en la
+    próxima compactación.
+
+    Todo ocurre con el bloqueo de escritura de la NV: ningún proceso puede
+    tener abierto el diario renombrado para agregar un registro que después se
+    pierda al eliminar `.compacting`.
+
+    Args:
+        snapshot_path: Ruta del JSON de la NV
+        fold: Función que integra los registros al almacenamiento
+
+    Returns:
+        bool: Si se integró algún registro
+    """
+    path = journal_path(snapshot_path)
+    compacting_path = _compacting_path(snapshot_path)
+
+    with _lock:
+        if snapshot_path in _compacting:
+            return False
+        _compacting.add(snapshot_path)
+
+    try:
+        with write_lock(snapshot_path):
+            with _lock:
+                if not os.path.exists(compacting_path) and os.path.exists(path):
+                    os.replace(path, compacting_path)
+                    _record_counts[path] = 0
+
+            if not os.path.exists(compacting_path):
+                return False
+
+            records = list(_read_records(compacting_path))
+            fold(records)
+            # La integración puede haber reescrito la NV completa y descartado el diario
+            if os.path.exists(compacting_path):
+                os.remove(compacting_path)
+        logger.info(f"Diario compactado: {snapshot_path} ({len(records)} registros)")
+        return bool(records)
+    finally:
+        with _lock:
+            _compacting.discard(snapshot_path)
+
+
+def schedule_compaction(snapshot_path: str, fold: FoldRecords) -> None:
+    """Lanza la compactación del diario en un hilo en segundo plano"""
+    with _lock:
+        if snapshot_path in _compacting:
+            return
+
+    def run() -> None:
+        try:
+            compact_journal(snapshot_path, fold)
+        except Exception as e:
+            logger.error(f"Error al compactar el diario de {snapshot_path}: {str(e)}")
+
+    threading.Thread(target=run, name="json-journal-compaction", daemon=True).start()
+
+
+def discard_journal(snapshot_path: str) -> None:
+    """Elimina el diario de un snapshot que se reescribió completo"""
+    with _lock:
+        for path in (journal_path(snapshot_path), _compacting_path(snapshot_path)):
+            if os.path.exists(path):
+                os.remove(path)
+        _record_counts.pop(journal_path(snapshot_path), None)
+
+
+def _ends_with_newline(path: str) -> bool:
+    """Indica si el último byte del archivo es un salto de línea"""
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lee los registros de un diario. Las líneas incompletas (escrituras
+    interrumpidas antes del fsync) se descartan.
+    """
+    if not os.path.exists(path):
+        return
+
+    with open(path, "rb") as f:
+        lines = f.read().split(b"\n")
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            logger.warning(f"Se descartó un registro incompleto del diario {path} (línea {line_number})")
+
+
+def apply_spool_delta(plan: Plan, record: Dict[str, Any]) -> None:
+    """Reemplaza en el Plan los materiales o uniones indicados en el registro"""
+    items = SPOOL_FIELD_ADAPTERS[record["field"]].validate_python(record["items"])
+    setattr(plan.spool_data, record["field"], items)
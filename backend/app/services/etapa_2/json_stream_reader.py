@@ -0,0 +1,176 @@
+# backend/app/services/etapa_2/json_stream_reader.py
+
+import re
+import json
+from typing import Any, Dict, Iterator, Optional, TextIO, Tuple
+from backend.app.api.v1.schemas.nv_schemas import Plan
+from .interning import intern_raw_plan
+
+# Caracteres leídos del archivo en cada lectura
+JSON_STREAM_CHUNK_SIZE = 1 << 16
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _JsonStream:
+    """
+    Lector incremental de un documento JSON: mantiene en memoria solo la parte
+    del archivo que aún no se consumió y decodifica un valor por vez con el
+    decodificador nativo (raw_decode).
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, min_size: int = 0) -> bool:
+        """Descarta lo consumido y lee más del archivo; False si el archivo terminó"""
+        if self._eof:
+            return False
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        data = self._f.read(max(self._chunk_size, min_size))
+        if not data:
+            self._eof = True
+            return False
+        self._buffer += data
+        return True
+
+    def peek(self) -> str:
+        """Siguiente carácter sin espacios, sin consumirlo ("" al final del archivo)"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected: str) -> str:
+        """Consume el siguiente carácter, que debe ser uno de `expected`"""
+        char = self.peek()
+        if not char or char not in expected:
+            found = repr(char) if char else "fin del archivo"
+            raise ValueError(f"JSON inválido: se esperaba uno de {list(expected)} y se encontró {found}")
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decodifica el siguiente valor completo, leyendo más del archivo si hace falta"""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                # Valor incompleto: leer al menos lo mismo que ya hay en el buffer
+                if not self._fill(len(self._buffer)):
+                    raise ValueError(f"JSON inválido: {e}") from e
+                continue
+            # Un número que termina justo al final del buffer puede estar cortado
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+
+def _iter_members(f: TextIO, chunk_size: int) -> Iterator[Tuple[str, Any]]:
+    """
+    Recorre el objeto raíz de un SaleNote entregando (clave, valor) por cada
+    miembro, salvo "plans", que se entrega como ("plans", plan) por cada
+    elemento del arreglo a medida que se decodifica.
+    """
+    stream = _JsonStream(f, chunk_size)
+    stream.take("{")
+    if stream.peek() == "}":
+        return
+
+    while True:
+        key = stream.value()
+        stream.take(":")
+        if key == "plans":
+            stream.take("[")
+            if stream.peek() == "]":
+                stream.take("]")
+            else:
+                while True:
+                    yield key, stream.value()
+                    if stream.take(",]") == "]":
+                        break
+        else:
+            yield key, stream.value()
+
+        if stream.take(",}") == "}":
+            return
+
+
+def iter_raw_plans_from_json(file_path: str, chunk_size: int = JSON_STREAM_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Lee un JSON de NV completo (un único documento SaleNote, con o sin sangría)
+    y entrega cada Plan como diccionario sin validar, a medida que se lee.
+
+    Args:
+        file_path: Ruta del JSON
+        chunk_size: Caracteres leídos del archivo en cada lectura
+
+    Yields:
+        Dict[str, Any]: Plan tal como está en el archivo, con los textos de los
+        campos categóricos compartidos entre filas
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        for key, value in _iter_members(f, chunk_size):
+            if key == "plans":
+                yield intern_raw_plan(value)
+
+
+def iter_plans_from_json(file_path: str, chunk_size: int = JSON_STREAM_CHUNK_SIZE) -> Iterator[Plan]:
+    """
+    Lee un JSON de NV completo en modo streaming y entrega un Plan validado por
+    vez, sin materializar el documento entero. La memoria queda acotada por el
+    Plan más grande y el archivo se cierra apenas se deja de iterar, por lo que
+    leer los primeros N planes solo lee el comienzo del archivo:
+
+        first_plans = list(itertools.islice(iter_plans_from_json(path), 10))
+
+    Args:
+        file_path: Ruta del JSON
+        chunk_size: Caracteres leídos del archivo en cada lectura
+
+    Yields:
+        Plan: Un Plan por elemento de "plans", en orden
+
+    Raises:
+        ValueError: Si el archivo no es un JSON válido o un Plan no valida
+    """
+    for raw_plan in iter_raw_plans_from_json(file_path, chunk_size):
+        yield Plan.model_validate(raw_plan)
+
+
+def find_spool_in_json(file_path: str, spool_name: str, plano: Optional[str] = None) -> Optional[Plan]:
+    """
+    Busca un spool en un JSON de NV completo y deja de leer al encontrarlo.
+    Solo se valida el Plan encontrado.
+
+    Args:
+        file_path: Ruta del JSON
+        spool_name: Nombre del spool
+        plano: Plano del spool. Si es None se devuelve el primer plano que lo contiene.
+
+    Returns:
+        Optional[Plan]: Plan del spool o None si no existe
+    """
+    for raw_plan in iter_raw_plans_from_json(file_path):
+        if raw_plan["spool_data"]["spool"] == spool_name and plano in (None, raw_plan["plano"]):
+            return Plan.model_validate(raw_plan)
+    return None
+
+
+def read_nv_from_json(file_path: str) -> Optional[str]:
+    """Lee el número de NV de un JSON completo (se detiene apenas lo encuentra)"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for key, value in _iter_members(f, JSON_STREAM_CHUNK_SIZE):
+            if key == "nv":
+                return value
+    return None
@@ -0,0 +1,559 @@
+# backend/app/services/etapa_2/sharded_store.py
+
+import os
+import re
+import json
+import time
+import shutil
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, TypeAdapter
+from backend.app.api.v1.schemas.nv_schemas import SaleNote, Plan, SaleNoteManifest
+from backend.app.core.config import JSON_STORAGE_INDENT, JSON_STORAGE_DICTIONARIES
+from backend.app.core.logger import setup_logger
+from .json_journal import (
+    VersionConflictError,
+    append_spool_delta,
+    apply_spool_delta,
+    discard_journal,
+    fsync_directory,
+    read_journal,
+    write_file_atomic,
+    write_lock
+)
+from .json_stream_reader import iter_raw_plans_from_json, read_nv_from_json
+from .interning import (
+    build_dictionaries,
+    decode_raw_plan,
+    dictionary_codes,
+    encode_raw_plan,
+    intern_values
+)
+
+logger = setup_logger()
+
+# Cada NV se guarda como un manifiesto pequeño (nv_X.json) con la lista de
+# planos/spools y sus cantidades, más un archivo por spool dentro de un
+# directorio de generación (nv_X.spools.<generación>/00000.json, ...).
+# Reescribir la NV completa crea una generación nueva y el manifiesto pasa a
+# apuntar a ella en un único reemplazo atómico.
+#
+# Cada NV lleva un contador de versión que aumenta con cada escritura, y cada
+# spool guarda la versión de la NV en la que cambió por última vez. Las
+# ediciones de un spool se aceptan solo si el spool no cambió desde la versión
+# que vio quien edita; las de spools distintos no entran en conflicto.
+#
+# Con JSON_STORAGE_DICTIONARIES, el manifiesto puede incluir una sección
+# "dictionaries" con los valores distintos de cada campo categórico (DN, SCH,
+# tipo de unión, armador, soldadores...) y los archivos de spool guardan en esos
+# campos la posición del valor en lugar del texto. La sección es opcional y un
+# campo puede seguir teniendo texto (por ejemplo, un valor nuevo de una edición).
+MANIFEST_LAYOUT = "sharded"
+
+_PLANS_ADAPTER = TypeAdapter(List[Plan])
+
+# Los manifiestos empiezan con "layout"; los JSON monolíticos anteriores no
+_MANIFEST_PREFIX = re.compile(rb'^\s*\{\s*"layout"\s*:\s*"sharded"')
+
+# Manifiestos ya parseados (junto con la posición de cada (plano, spool)),
+# por ruta y (mtime, tamaño) del archivo
+_manifest_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any], Dict[Tuple[str, str], int]]] = {}
+_manifest_lock = threading.Lock()
+
+
+def write_sale_note(manifest_path: str, sale_note: SaleNote, expected_version: Optional[int] = None) -> int:
+    """
+    Guarda una NV completa en una generación nueva de archivos por spool y
+    reemplaza el manifiesto de forma atómica. La generación anterior y el
+    diario de ediciones se eliminan después.
+
+    Args:
+        manifest_path: Ruta del manifiesto de la NV (nv_X.json)
+        sale_note: Nota de venta a guardar
+        expected_version: Versión de la NV sobre la que se hicieron los cambios.
+            Si es None la NV se reemplaza sin verificar (por ejemplo, al convertir desde Excel).
+
+    Returns:
+        int: Versión nueva de la NV
+
+    Raises:
+        VersionConflictError: Si la NV cambió desde expected_version
+    """
+    with write_lock(manifest_path):
+        current_version = 0
+        previous = None
+        if os.path.exists(manifest_path):
+            records = read_journal(manifest_path)
+            previous = _read_raw_manifest(manifest_path)
+            current_version = _nv_version(previous, _current_records(previous, records))
+
+        if expected_version is not None and expected_version != current_version:
+            raise VersionConflictError(
+                f"La NV {sale_note.nv} cambió desde la versión {expected_version} (versión actual: {current_version})"
+            )
+
+        version = current_version + 1
+        _write_generation(manifest_path, sale_note, version, previous)
+        return version
+
+
+def _write_generation(manifest_path: str, sale_note: SaleNote, version: int,
+                      previous: Optional[Dict[str, Any]]) -> None:
+    """Escribe una generación nueva de la NV, con todos sus spools en la versión indicada"""
+    base_name = os.path.splitext(os.path.basename(manifest_path))[0]
+    generation = f"{base_name}.spools.{time.time_ns():x}"
+    shard_dir = os.path.join(os.path.dirname(manifest_path), generation)
+    os.makedirs(shard_dir)
+
+    if JSON_STORAGE_DICTIONARIES:
+        raw_plans = [plan.model_dump() for plan in sale_note.plans]
+        dictionaries = build_dictionaries(raw_plans)
+        codes = dictionary_codes(dictionaries)
+        shards = (_dump_json(encode_raw_plan(raw_plan, codes)) for raw_plan in raw_plans)
+    else:
+        dictionaries = {}
+        shards = (plan.model_dump_json(indent=JSON_STORAGE_INDENT).encode("utf-8") for plan in sale_note.plans)
+
+    # Los archivos de spool (y el directorio de la generación) deben quedar en
+    # disco antes de que el manifiesto apunte a ellos y se descarte el diario
+    for index, data in enumerate(shards):
+        with open(os.path.join(shard_dir, _shard_name(index)), "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    fsync_directory(shard_dir)
+    fsync_directory(os.path.dirname(manifest_path))
+
+    entries = [_summary_entry(plan, version) for plan in sale_note.plans]
+
+    raw: Dict[str, Any] = {
+        "layout": MANIFEST_LAYOUT,
+        "nv": sale_note.nv,
+        "version": version,
+        "generation": generation
+    }
+    if dictionaries:
+        raw["dictionaries"] = dictionaries
+    raw["plans"] = entries
+    _write_manifest(manifest_path, raw)
+    discard_journal(manifest_path)
+
+    if previous is not None:
+        shutil.rmtree(os.path.join(os.path.dirname(manifest_path), previous["generation"]), ignore_errors=True)
+
+
+def load_manifest(manifest_path: str) -> SaleNoteManifest:
+    """
+    Carga la lista de planos/spools de una NV con sus cantidades, sin leer los
+    archivos de cada spool. Las cantidades y versiones reflejan las ediciones
+    del diario.
+
+    Args:
+        manifest_path: Ruta del manifiesto de la NV
+
+    Returns:
+        SaleNoteManifest: NV con el resumen de cada Plan, en orden
+    """
+    records = read_journal(manifest_path)
+    raw = _read_raw_manifest(manifest_path)
+    current = _current_records(raw, records)
+
+    if raw is None:
+        # JSON monolítico: resumir cada Plan a medida que se lee, sin validarlo ni retenerlo
+        entries = [
+            {
+                "plano": raw_plan["plano"],
+                "spool": raw_plan["spool_data"]["spool"],
+                "total_materials": len(raw_plan["spool_data"]["materials"]),
+                "total_joints": len(raw_plan["spool_data"]["joints"])
+            }
+            for raw_plan in iter_raw_plans_from_json(manifest_path)
+        ]
+        manifest = SaleNoteManifest.model_validate({
+            "nv": read_nv_from_json(manifest_path), "version": _nv_version(None, current), "plans": entries
+        })
+        positions = _index_positions({"plans": entries})
+    else:
+        manifest = SaleNoteManifest.model_validate({
+            "nv": raw["nv"], "version": _nv_version(raw, current), "plans": raw["plans"]
+        })
+        positions = _positions(manifest_path, raw)
+
+    for record in current:
+        index = positions.get((record["plano"], record["spool"]))
+        if index is not None:
+            entry = manifest.plans[index]
+            setattr(entry, f"total_{record['field']}", len(record["items"]))
+            entry.version = max(entry.version, _record_version(record))
+
+    return manifest
+
+
+def load_plan(manifest_path: str, index: int) -> Plan:
+    """
+    Carga un único Plan de la NV leyendo solo su archivo y sus ediciones.
+
+    Args:
+        manifest_path: Ruta del manifiesto de la NV
+        index: Posición del Plan en el manifiesto
+
+    Returns:
+        Plan: Plan con las ediciones del diario aplicadas
+    """
+    records = read_journal(manifest_path)
+    raw = _read_raw_manifest(manifest_path)
+
+    if raw is None:
+        return _read_monolithic_plan(manifest_path, index, _current_records(None, records))
+
+    entry = raw["plans"][index]
+    plan = _read_shard(manifest_path, raw, index)
+    for record in _current_records(raw, records):
+        if (record["plano"], record["spool"]) == (entry["plano"], entry["spool"]):
+            apply_spool_delta(plan, record)
+    return plan
+
+
+def load_sale_note(manifest_path: str) -> SaleNote:
+    """
+    Carga la NV completa: todos los archivos de spool más las ediciones del diario.
+    También lee los JSON monolíticos guardados antes del formato por spool.
+
+    Args:
+        manifest_path: Ruta del manifiesto de la NV
+
+    Returns:
+        SaleNote: Nota de venta completa
+    """
+    records = read_journal(manifest_path)
+    raw = _read_raw_manifest(manifest_path)
+
+    if raw is None:
+        return _load_monolithic(manifest_path, records)
+
+    # Validar todos los spools en una sola llamada uniendo sus JSON en un arreglo
+    shard_dir = _shard_dir(manifest_path, raw)
+    shards: List[bytes] = []
+    for index in range(len(raw["plans"])):
+        with open(os.path.join(shard_dir, _shard_name(index)), "rb") as f:
+            shards.append(f.read())
+    data = b"[" + b",".join(shards) + b"]"
+    del shards
+
+    dictionaries = raw.get("dictionaries")
+    if dictionaries:
+        raw_plans = json.loads(data)
+        del data
+        for raw_plan in raw_plans:
+            decode_raw_plan(raw_plan, dictionaries)
+        plans = _PLANS_ADAPTER.validate_python(raw_plans)
+    else:
+        plans = _PLANS_ADAPTER.validate_json(data)
+    _apply_records(plans, _current_records(raw, records))
+    return SaleNote(nv=raw["nv"], plans=plans)
+
+
+def iter_plans(manifest_path: str) -> Iterator[Plan]:
+    """
+    Recorre los Plans de la NV en orden, leyendo un archivo de spool por vez
+    (o el JSON monolítico en modo streaming), con las ediciones del diario
+    aplicadas. La memoria queda acotada por el Plan más grande y se puede
+    dejar de iterar en cualquier momento.
+
+    Args:
+        manifest_path: Ruta del manifiesto de la NV
+
+    Yields:
+        Plan: Cada Plan de la NV
+    """
+    records = read_journal(manifest_path)
+    raw = _read_raw_manifest(manifest_path)
+    records_by_key: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for record in _current_records(raw, records):
+        records_by_key.setdefault((record["plano"], record["spool"]), []).append(record)
+
+    if raw is None:
+        plans: Iterator[Plan] = (Plan.model_validate(raw_plan) for raw_plan in iter_raw_plans_from_json(manifest_path))
+    else:
+        plans = (_read_shard(manifest_path, raw, index) for index in range(len(raw["plans"])))
+
+    # Igual que al cargar la NV completa, los registros aplican al primer Plan de cada (plano, spool)
+    for plan in plans:
+        for record in records_by_key.pop((plan.plano, plan.spool_data.spool), []):
+            apply_spool_delta(plan, record)
+        yield plan
+
+
+def save_spool(manifest_path: str, plano: str, spool: str, field: str, items: List[BaseModel],
+               expected_version: Optional[int] = None) -> int:
+    """
+    Registra en el diario el reemplazo de los materiales o uniones de un spool.
+    Al compactar solo se reescriben los archivos de los spools editados.
+
+    Args:
+        manifest_path: Ruta del manifiesto de la NV
+        plano: Plano del spool editado
+        spool: Nombre del spool editado
+        field: "materials" o "joints"
+        items: Lista completa de materiales o uniones del spool
+        expected_version: Versión del spool sobre la que se hizo la edición.
+            Si es None la edición se registra sin verificar.
+
+    Returns:
+        int: Versión nueva del spool (y de la NV)
+
+    Raises:
+        ValueError: Si el spool no existe en la NV
+        VersionConflictError: Si el spool cambió desde expected_version
+    """
+    with write_lock(manifest_path):
+        records = read_journal(manifest_path)
+        raw = _read_raw_manifest(manifest_path)
+        current = _current_records(raw, records)
+
+        spool_version = 0
+        if raw is not None:
+            index = _positions(manifest_path, raw).get((plano, spool))
+            if index is None:
+                raise ValueError(f"El spool '{spool}' del plano '{plano}' no existe en la NV {raw['nv']}")
+            spool_version = raw["plans"][index].get("version", 0)
+        for record in current:
+            if (record["plano"], record["spool"]) == (plano, spool):
+                spool_version = max(spool_version, _record_version(record))
+
+        if expected_version is not None and expected_version != spool_version:
+            raise VersionConflictError(
+                f"El spool '{spool}' del plano '{plano}' cambió desde la versión {expected_version} "
+                f"(versión actual: {spool_version})"
+            )
+
+        version = _nv_version(raw, current) + 1
+        append_spool_delta(
+            manifest_path, plano, spool, field, items,
+            generation=raw["generation"] if raw is not None else None,
+            fold=lambda records: fold_records(manifest_path, records),
+            version=version
+        )
+        return version
+
+
+def fold_records(manifest_path: str, records: List[Dict[str, Any]]) -> None:
+    """
+    Integra registros del diario: reescribe de forma atómica los archivos de
+    los spools editados y el manifiesto con sus cantidades y versiones.
+    Un JSON monolítico se convierte al formato por spool.
+
+    Args:
+        manifest_path: Ruta del manifiesto de la NV
+        records: Registros a integrar, en orden
+    """
+    with write_lock(manifest_path):
+        raw = _read_raw_manifest(manifest_path)
+
+        if raw is None:
+            # La migración descarta el diario completo: integrar también los registros posteriores
+            current = _current_records(None, read_journal(manifest_path))
+            sale_note = _load_monolithic(manifest_path, current)
+            _write_generation(manifest_path, sale_note, _nv_version(None, current), previous=None)
+            return
+
+        # Copia del manifiesto: el diccionario cacheado puede estar siendo leído
+        positions = _positions(manifest_path, raw)
+        raw = {**raw, "plans": list(raw["plans"])}
+        codes = dictionary_codes(raw.get("dictionaries", {}))
+        current = _current_records(raw, records)
+        records_by_index: Dict[int, List[Dict[str, Any]]] = {}
+        for record in current:
+            index = positions.get((record["plano"], record["spool"]))
+            if index is not None:
+                records_by_index.setdefault(index, []).append(record)
+
+        if not records_by_index:
+            return
+
+        for index, spool_records in records_by_index.items():
+            plan = _read_shard(manifest_path, raw, index)
+            for record in spool_records:
+                apply_spool_delta(plan, record)
+            if codes:
+                # Los valores que no están en el diccionario quedan como texto: el archivo
+                # se reemplaza antes que el manifiesto y debe servir con ambas versiones
+                data = _dump_json(encode_raw_plan(plan.model_dump(), codes))
+            else:
+                data = plan.model_dump_json(indent=JSON_STORAGE_INDENT).encode("utf-8")
+            write_file_atomic(os.path.join(_shard_dir(manifest_path, raw), _shard_name(index)), data)
+            spool_version = max([raw["plans"][index].get("version", 0)] + [_record_version(r) for r in spool_records])
+            raw["plans"][index] = _summary_entry(plan, spool_version)
+
+        raw["version"] = _nv_version(raw, current)
+        _write_manifest(manifest_path, raw)
+
+
+def delete_sale_note(manifest_path: str) -> None:
+    """
+    Elimina el manifiesto de una NV, sus archivos por spool y su diario.
+
+    El archivo de bloqueo (nv_X.lock) se conserva: otro proceso puede tenerlo
+    abierto esperando el bloqueo, y si se eliminara, ese proceso y uno que
+    creara un archivo nuevo bloquearían archivos distintos sin excluirse.
+    """
+    with write_lock(manifest_path):
+        raw = _read_raw_manifest(manifest_path)
+        discard_journal(manifest_path)
+        os.remove(manifest_path)
+        if raw is not None:
+            shutil.rmtree(os.path.join(os.path.dirname(manifest_path), raw["generation"]), ignore_errors=True)
+        with _manifest_lock:
+            _manifest_cache.pop(manifest_path, None)
+
+
+def _read_raw_manifest(manifest_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Lee el manifiesto de una NV como diccionario, reutilizando la versión ya
+    parseada mientras el archivo no cambie.
+
+    Returns:
+        Optional[Dict[str, Any]]: Manifiesto, o None si el archivo es un JSON
+        monolítico del formato anterior (solo se lee su comienzo)
+    """
+    stat = os.stat(manifest_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    with _manifest_lock:
+        cached = _manifest_cache.get(manifest_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with open(manifest_path, "rb") as f:
+        head = f.read(64)
+        if not _MANIFEST_PREFIX.match(head):
+            return None
+        raw = json.loads(head + f.read())
+    if "dictionaries" in raw:
+        raw["dictionaries"] = {field: intern_values(values) for field, values in raw["dictionaries"].items()}
+
+    with _manifest_lock:
+        _manifest_cache[manifest_path] = (version, raw, _index_positions(raw))
+    return raw
+
+
+def _write_manifest(manifest_path: str, raw: Dict[str, Any]) -> None:
+    """Reemplaza el manifiesto de forma atómica y actualiza el cache de este proceso"""
+    write_file_atomic(manifest_path, _dump_json(raw))
+
+    stat = os.stat(manifest_path)
+    with _manifest_lock:
+        _manifest_cache[manifest_path] = ((stat.st_mtime_ns, stat.st_size), raw, _index_positions(raw))
+
+
+def _dump_json(value: Any) -> bytes:
+    """Serializa un manifiesto o un Plan sin validar con la sangría de almacenamiento"""
+    indent = JSON_STORAGE_INDENT
+    separators = None if indent else (",", ":")
+    return json.dumps(value, ensure_ascii=False, indent=indent, separators=separators).encode("utf-8")
+
+
+def _load_monolithic(manifest_path: str, records: List[Dict[str, Any]]) -> SaleNote:
+    """NV guardada en un único JSON (formato anterior) con sus ediciones aplicadas"""
+    with open(manifest_path, "rb") as f:
+        sale_note = SaleNote.model_validate_json(f.read())
+    _apply_records(sale_note.plans, _current_records(None, records))
+    return sale_note
+
+
+def _read_monolithic_plan(manifest_path: str, index: int, current: List[Dict[str, Any]]) -> Plan:
+    """Un Plan de un JSON monolítico, leído en modo streaming hasta su posición"""
+    seen = set()
+    for position, raw_plan in enumerate(iter_raw_plans_from_json(manifest_path)):
+        key = (raw_plan["plano"], raw_plan["spool_data"]["spool"])
+        if position == index:
+            plan = Plan.model_validate(raw_plan)
+            if key not in seen:
+                for record in current:
+                    if (record["plano"], record["spool"]) == key:
+                        apply_spool_delta(plan, record)
+            return plan
+        seen.add(key)
+    raise IndexError(f"La NV {manifest_path} no tiene un plan en la posición {index}")
+
+
+def _read_shard(manifest_path: str, raw: Dict[str, Any], index: int) -> Plan:
+    """Lee y valida el archivo de un spool, decodificando los campos con diccionario"""
+    with open(os.path.join(_shard_dir(manifest_path, raw), _shard_name(index)), "rb") as f:
+        data = f.read()
+    dictionaries = raw.get("dictionaries")
+    if dictionaries:
+        return Plan.model_validate(decode_raw_plan(json.loads(data), dictionaries))
+    return Plan.model_validate_json(data)
+
+
+def _shard_dir(manifest_path: str, raw: Dict[str, Any]) -> str:
+    """Directorio de la generación actual de archivos por spool"""
+    return os.path.join(os.path.dirname(manifest_path), raw["generation"])
+
+
+def _shard_name(index: int) -> str:
+    """Nombre del archivo de un spool según su posición"""
+    return f"{index:05d}.json"
+
+
+def _summary_entry(plan: Plan, version: int) -> Dict[str, Any]:
+    """Entrada del manifiesto para un Plan"""
+    return {
+        "plano": plan.plano,
+        "spool": plan.spool_data.spool,
+        "total_materials": len(plan.spool_data.materials),
+        "total_joints": len(plan.spool_data.joints),
+        "version": version
+    }
+
+
+def _positions(manifest_path: str, raw: Dict[str, Any]) -> Dict[Tuple[str, str], int]:
+    """Posición del primer Plan de cada (plano, spool), ya calculada al cachear el manifiesto"""
+    with _manifest_lock:
+        cached = _manifest_cache.get(manifest_path)
+    if cached is not None and cached[1] is raw:
+        return cached[2]
+    return _index_positions(raw)
+
+
+def _index_positions(raw: Dict[str, Any]) -> Dict[Tuple[str, str], int]:
+    """Posición del primer Plan de cada (plano, spool) del manifiesto"""
+    positions: Dict[Tuple[str, str], int] = {}
+    for index, entry in enumerate(raw["plans"]):
+        positions.setdefault((entry["plano"], entry["spool"]), index)
+    return positions
+
+
+def _current_records(raw: Optional[Dict[str, Any]], records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Registros de la generación actual (los de generaciones anteriores ya no
+    aplican). Para un JSON monolítico (raw None) son los registros sin generación.
+    """
+    generation = raw.get("generation") if raw is not None else None
+    return [record for record in records if record.get("generation") == generation]
+
+
+def _record_version(record: Dict[str, Any]) -> int:
+    """Versión de la NV creada por un registro (0 en registros anteriores a las versiones)"""
+    return record.get("version") or 0
+
+
+def _nv_version(raw: Optional[Dict[str, Any]], current: List[Dict[str, Any]]) -> int:
+    """Versión actual de la NV: la del manifiesto o la del último registro de la generación"""
+    base = raw.get("version", 0) if raw is not None else 0
+    return max([base] + [_record_version(record) for record in current])
+
+
+def _apply_records(plans: List[Plan], records: List[Dict[str, Any]]) -> None:
+    """Aplica registros del diario sobre una lista de Plans"""
+    positions: Dict[Tuple[str, str], int] = {}
+    for index, plan in enumerate(plans):
+        positions.setdefault((plan.plano, plan.spool_data.spool), index)
+
+    for record in records:
+        index = positions.get((record["plano"], record["spool"]))
+        if index is None:
+            logger.warning(f"Registro del diario para un spool inexistente: {record['plano']}/{record['spool']}")
+            continue
+        apply_spool_delta(plans[index], record)
@@ -0,0 +1,258 @@
+# backend/app/services/etapa_2/spool_index.py
+
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from openpyxl import load_workbook  # type: ignore
+from backend.app.api.v1.schemas.nv_schemas import Plan
+from backend.app.core.config import OUTPUT_DIR_ETAPA_1_SALIDA
+from backend.app.core.logger import setup_logger
+from .workbook_loader import find_sheet_names, MissingSheetError, read_header
+from .workbook_catalog import open_catalog
+from .excel_stream_reader import (
+    REQUIRED_MATERIAL_COLUMNS,
+    REQUIRED_JOINT_COLUMNS,
+    build_plan,
+    cell_to_str,
+    cell_value,
+    row_dict
+)
+
+logger = setup_logger()
+
+# Rango de filas de una hoja (números de fila de Excel, inclusivos)
+RowRange = Tuple[int, int]
+# Registro del índice: (hoja, nv, plano, spool, fila inicial, fila final)
+IndexRecord = Tuple[str, Optional[str], str, str, int, int]
+
+
+def read_spool_from_excel(filename: str, spool_name: str,
+                          plano: Optional[str] = None) -> Optional[Tuple[str, Plan]]:
+    """
+    Lee un único spool de un archivo Excel usando el índice (plano, spool) ->
+    rangos de filas, sin parsear ni construir el resto del libro.
+
+    El índice se construye la primera vez que se consulta cada versión del
+    archivo (tamaño y mtime) y queda guardado en el catálogo de libros.
+
+    Args:
+        filename: Nombre del archivo Excel
+        spool_name: Nombre del spool a leer
+        plano: Plano del spool, para distinguir spools con el mismo nombre.
+            Si es None se usa el primer plano (en orden de la hoja de materiales)
+            que contiene el spool.
+
+    Returns:
+        Optional[Tuple[str, Plan]]: (nv, Plan del spool) o None si no existe
+
+    Raises:
+        FileNotFoundError: Si el archivo no existe
+        ValueError: Si faltan hojas o columnas en el archivo
+    """
+    file_path = os.path.join(OUTPUT_DIR_ETAPA_1_SALIDA, filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Archivo no encontrado: {file_path}")
+
+    materials_sheet, joints_sheet = _ensure_spool_index(filename, file_path)
+
+    query = ("SELECT sheet, nv, plano, start_row, end_row FROM spool_index_ranges "
+             "WHERE filename = ? AND spool = ?")
+    params: List[Any] = [filename, spool_name]
+    if plano is not None:
+        query += " AND plano = ?"
+        params.append(plano)
+
+    with open_catalog() as connection:
+        rows = connection.execute(query + " ORDER BY rowid", params).fetchall()
+
+    # El Plan existe solo si el spool tiene filas en la hoja de materiales
+    materials_rows = [row for row in rows if row["sheet"] == "materials"]
+    if not materials_rows:
+        return None
+
+    nv = materials_rows[0]["nv"]
+    plan_name = materials_rows[0]["plano"]
+    materials_ranges = [(row["start_row"], row["end_row"]) for row in materials_rows if row["plano"] == plan_name]
+    joints_ranges = [
+        (row["start_row"], row["end_row"]) for row in rows
+        if row["sheet"] == "joints" and row["plano"] == plan_name
+    ]
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        material_rows = _read_row_ranges(workbook[materials_sheet], materials_sheet,
+                                         REQUIRED_MATERIAL_COLUMNS, materials_ranges)
+        joint_rows = _read_row_ranges(workbook[joints_sheet], joints_sheet,
+                                      REQUIRED_JOINT_COLUMNS, joints_ranges)
+    finally:
+        workbook.close()
+
+    return nv, build_plan(plan_name, spool_name, material_rows, joint_rows)
+
+
+def _ensure_spool_index(filename: str, file_path: str) -> Tuple[str, str]:
+    """
+    Verifica que el índice guardado corresponda a la versión actual del archivo
+    y lo reconstruye si no existe o quedó desactualizado.
+
+    Args:
+        filename: Nombre del archivo Excel
+        file_path: Ruta completa del archivo Excel
+
+    Returns:
+        Tuple[str, str]: (hoja de materiales, hoja de uniones) del libro
+    """
+    stat = os.stat(file_path)
+
+    with open_catalog() as connection:
+        version = connection.execute(
+            "SELECT size, mtime_ns, materials_sheet, joints_sheet FROM spool_index_versions WHERE filename = ?",
+            (filename,)
+        ).fetchone()
+
+    if version is not None and version["size"] == stat.st_size and version["mtime_ns"] == stat.st_mtime_ns:
+        return version["materials_sheet"], version["joints_sheet"]
+
+    # El recorrido del libro se hace fuera de la transacción del catálogo
+    materials_sheet, joints_sheet, records = _scan_spool_ranges(file_path)
+
+    with open_catalog() as connection:
+        connection.execute("DELETE FROM spool_index_ranges WHERE filename = ?", (filename,))
+        connection.executemany(
+            "INSERT INTO spool_index_ranges (filename, sheet, nv, plano, spool, start_row, end_row) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(filename,) + record for record in records]
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO spool_index_versions "
+            "(filename, size, mtime_ns, materials_sheet, joints_sheet, built_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (filename, stat.st_size, stat.st_mtime_ns, materials_sheet, joints_sheet,
+             datetime.now().isoformat(timespec="seconds"))
+        )
+
+    logger.info(f"Índice de spools construido: {filename} ({len(records)} rangos)")
+    return materials_sheet, joints_sheet
+
+
+def _scan_spool_ranges(file_path: str) -> Tuple[str, str, List[IndexRecord]]:
+    """
+    Recorre solo las columnas nv/plano/spool de ambas hojas y registra los
+    rangos de filas contiguas de cada (plano, spool).
+
+    Args:
+        file_path: Ruta completa del archivo Excel
+
+    Returns:
+        Tuple[str, str, List[IndexRecord]]: Hojas de materiales y uniones, y los rangos
+
+    Raises:
+        MissingSheetError: Si falta alguna de las hojas requeridas
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+
+    try:
+        materials_sheet, joints_sheet = find_sheet_names(workbook.sheetnames)
+
+        if not materials_sheet:
+            raise MissingSheetError("No se encontró hoja de materiales (buscar: 'Materials' o 'materiales')")
+        if not joints_sheet:
+            raise MissingSheetError("No se encontró hoja de uniones (buscar: 'Joints' o 'uniones')")
+
+        records: List[IndexRecord] = []
+        for label, sheet_name in (("materials", materials_sheet), ("joints", joints_sheet)):
+            records.extend(
+                (label,) + spool_range
+                for spool_range in _iter_sheet_ranges(workbook[sheet_name], sheet_name)
+            )
+    finally:
+        workbook.close()
+
+    return materials_sheet, joints_sheet, records
+
+
+def _iter_sheet_ranges(worksheet: Any, sheet_name: str) -> Iterator[Tuple[Optional[str], str, str, int, int]]:
+    """
+    Agrupa las filas contiguas de una hoja por (nv, plano, spool).
+
+    Args:
+        worksheet: Hoja de openpyxl abierta en modo read_only
+        sheet_name: Nombre de la hoja (para los mensajes de error)
+
+    Yields:
+        Tuple: (nv, plano, spool, fila inicial, fila final) de cada rango
+    """
+    columns = read_header(worksheet)
+    missing_columns = [column for column in ('plano', 'spool') if column not in columns]
+    if missing_columns:
+        raise ValueError(f"Columnas faltantes en {sheet_name}: {missing_columns}")
+
+    # Leer solo el bloque de columnas que contiene las claves
+    key_columns = ['nv', 'plano', 'spool'] if 'nv' in columns else ['plano', 'spool']
+    key_indexes = [columns.index(column) for column in key_columns]
+    min_col = min(key_indexes) + 1
+    max_col = max(key_indexes) + 1
+    offsets = [index + 1 - min_col for index in key_indexes]
+
+    current_key: Optional[Tuple[Optional[str], str, str]] = None
+    start_row = end_row = 0
+
+    rows = worksheet.iter_rows(min_row=2, min_col=min_col, max_col=max_col, values_only=True)
+    for row_number, row in enumerate(rows, start=2):
+        values = [cell_value(row, offset) for offset in offsets]
+        nv = values[0] if len(values) == 3 else None
+        plano, spool = values[-2], values[-1]
+
+        # Las filas sin plano o spool no pertenecen a ningún Plan
+        if plano is None or spool is None:
+            key = None
+        else:
+            key = (cell_to_str(nv) if nv is not None else None, cell_to_str(plano), cell_to_str(spool))
+
+        if key is not None and key == current_key:
+            end_row = row_number
+            continue
+
+        if current_key is not None:
+            yield current_key + (start_row, end_row)
+        current_key = key
+        start_row = end_row = row_number
+
+    if current_key is not None:
+        yield current_key + (start_row, end_row)
+
+
+def _read_row_ranges(worksheet: Any, sheet_name: str, required_columns: Sequence[str],
+                     ranges: List[RowRange]) -> List[Dict[str, Any]]:
+    """
+    Lee solo las filas de los rangos indicados, deteniéndose después del último.
+
+    Args:
+        worksheet: Hoja de openpyxl abierta en modo read_only
+        sheet_name: Nombre de la hoja (para los mensajes de error)
+        required_columns: Columnas que deben existir en el encabezado
+        ranges: Rangos de filas a leer
+
+    Returns:
+        List[Dict[str, Any]]: Filas de los rangos como diccionarios, en orden de la hoja
+    """
+    columns = read_header(worksheet)
+    missing_columns = [column for column in required_columns if column not in columns]
+    if missing_columns:
+        raise ValueError(f"Columnas faltantes en {sheet_name}: {missing_columns}")
+
+    if not ranges:
+        return []
+
+    ranges = sorted(ranges)
+    selected: List[Dict[str, Any]] = []
+    range_position = 0
+
+    rows = worksheet.iter_rows(min_row=ranges[0][0], max_row=ranges[-1][1], values_only=True)
+    for row_number, row in enumerate(rows, start=ranges[0][0]):
+        while row_number > ranges[range_position][1]:
+            range_position += 1
+        if row_number >= ranges[range_position][0]:
+            selected.append(row_dict(columns, row, row_number))
+
+    return selected
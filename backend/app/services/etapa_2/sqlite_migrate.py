@@ -0,0 +1,32 @@
+# backend/app/services/etapa_2/sqlite_migrate.py
+
+import os
+import sys
+import argparse
+from typing import List, Optional
+from backend.app.core.config import SALE_NOTE_DB_PATH
+from .json_converter import JSON_DIR
+from .sqlite_repository import migrate_json_files
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Punto de entrada de línea de comandos para importar data/json_data a la base SQLite:
+
+        python -m backend.app.services.etapa_2.sqlite_migrate [--json-dir DIR]
+    """
+    parser = argparse.ArgumentParser(description="Importa los JSON de NV existentes a la base SQLite")
+    parser.add_argument("--json-dir", default=JSON_DIR, help="Directorio de los nv_X.json")
+    args = parser.parse_args(argv)
+
+    json_paths = sorted(
+        os.path.join(args.json_dir, name) for name in os.listdir(args.json_dir)
+        if name.startswith("nv_") and name.endswith(".json")
+    )
+    imported = migrate_json_files(json_paths)
+    print(f"{imported} NV(s) importadas en {SALE_NOTE_DB_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,459 @@
+# backend/app/services/etapa_2/sqlite_repository.py
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from pydantic import BaseModel, TypeAdapter
+from backend.app.api.v1.schemas.nv_schemas import (
+    SaleNote, Plan, Spool, Material, Joint, SaleNoteManifest
+)
+from backend.app.core.config import SALE_NOTE_DB_PATH
+from backend.app.core.logger import setup_logger
+from .json_journal import VersionConflictError
+from .interning import CATEGORICAL_FIELDS, intern_raw_items
+
+logger = setup_logger()
+
+# Validadores de listas completas (se construyen una sola vez por proceso)
+_MATERIALS_ADAPTER = TypeAdapter(List[Material])
+_JOINTS_ADAPTER = TypeAdapter(List[Joint])
+
+MATERIAL_FIELDS = ('mat_descripcion', 'mat_dn', 'mat_sch', 'mat_qty', 'mat_numero_interno')
+JOINT_FIELDS = ('union_numero', 'union_dn', 'union_tipo', 'union_armador',
+                'union_soldador_raiz', 'union_soldador_remate')
+
+# Tabla y columnas de cada campo editable de un spool
+_SPOOL_FIELDS = {
+    "materials": ("materials", MATERIAL_FIELDS),
+    "joints": ("joints", JOINT_FIELDS)
+}
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS sale_notes (
+        nv TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS plans (
+        id INTEGER PRIMARY KEY,
+        nv TEXT NOT NULL REFERENCES sale_notes (nv) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        plano TEXT NOT NULL,
+        spool TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (nv, position)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS materials (
+        id INTEGER PRIMARY KEY,
+        plan_id INTEGER NOT NULL REFERENCES plans (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        mat_descripcion TEXT NOT NULL,
+        mat_dn TEXT NOT NULL,
+        mat_sch TEXT NOT NULL,
+        mat_qty INTEGER NOT NULL,
+        mat_numero_interno TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS joints (
+        id INTEGER PRIMARY KEY,
+        plan_id INTEGER NOT NULL REFERENCES plans (id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        union_numero TEXT NOT NULL,
+        union_dn TEXT NOT NULL,
+        union_tipo TEXT NOT NULL,
+        union_armador TEXT,
+        union_soldador_raiz TEXT,
+        union_soldador_remate TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_plans_plano ON plans (plano)",
+    "CREATE INDEX IF NOT EXISTS idx_plans_spool ON plans (spool)",
+    "CREATE INDEX IF NOT EXISTS idx_materials_plan ON materials (plan_id, position)",
+    "CREATE INDEX IF NOT EXISTS idx_joints_plan ON joints (plan_id, position)",
+    "CREATE INDEX IF NOT EXISTS idx_joints_armador ON joints (union_armador)",
+    "CREATE INDEX IF NOT EXISTS idx_joints_soldador_raiz ON joints (union_soldador_raiz)",
+    "CREATE INDEX IF NOT EXISTS idx_joints_soldador_remate ON joints (union_soldador_remate)"
+)
+
+
+@contextmanager
+def _open_repository(write: bool = False) -> Iterator[sqlite3.Connection]:
+    """
+    Abre la base de notas de venta (creando el esquema si no existe) dentro de
+    una transacción. La base usa WAL para que las lecturas no bloqueen a las
+    escrituras entre procesos (Streamlit, API y conversión masiva).
+
+    Con write=True la transacción toma el bloqueo de escritura desde el inicio,
+    así la verificación de versión y la escritura no se intercalan con otra.
+    """
+    db_dir = os.path.dirname(SALE_NOTE_DB_PATH)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    connection = sqlite3.connect(SALE_NOTE_DB_PATH, timeout=30)
+    connection.row_factory = sqlite3.Row
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+        with connection:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            if write:
+                connection.execute("BEGIN IMMEDIATE")
+            yield connection
+    finally:
+        connection.close()
+
+
+def save_sale_notes(sale_notes: Iterable[SaleNote]) -> int:
+    """
+    Guarda (o reemplaza) varias notas de venta completas en una sola transacción,
+    con inserciones masivas por tabla.
+
+    Args:
+        sale_notes: Notas de venta a guardar
+
+    Returns:
+        int: Cantidad de notas guardadas
+    """
+    saved = 0
+    with _open_repository(write=True) as connection:
+        for sale_note in sale_notes:
+            _insert_sale_note(connection, sale_note)
+            saved += 1
+    return saved
+
+
+def save_sale_note(sale_note: SaleNote, expected_version: Optional[int] = None) -> int:
+    """
+    Guarda (o reemplaza) una nota de venta completa.
+
+    Args:
+        sale_note: Nota de venta a guardar
+        expected_version: Versión de la NV sobre la que se hicieron los cambios.
+            Si es None se reemplaza sin verificar.
+
+    Returns:
+        int: Versión nueva de la NV
+
+    Raises:
+        VersionConflictError: Si la NV cambió desde expected_version
+    """
+    with _open_repository(write=True) as connection:
+        return _insert_sale_note(connection, sale_note, expected_version)
+
+
+def _insert_sale_note(connection: sqlite3.Connection, sale_note: SaleNote,
+                      expected_version: Optional[int] = None) -> int:
+    """Reemplaza todas las filas de una NV dentro de la transacción abierta"""
+    row = connection.execute("SELECT version FROM sale_notes WHERE nv = ?", (sale_note.nv,)).fetchone()
+    current_version = row["version"] if row is not None else 0
+    if expected_version is not None and expected_version != current_version:
+        raise VersionConflictError(
+            f"La NV {sale_note.nv} cambió desde la versión {expected_version} (versión actual: {current_version})"
+        )
+    version = current_version + 1
+
+    connection.execute("DELETE FROM sale_notes WHERE nv = ?", (sale_note.nv,))
+    connection.execute(
+        "INSERT INTO sale_notes (nv, version, updated_at) VALUES (?, ?, ?)",
+        (sale_note.nv, version, datetime.now().isoformat(timespec="seconds"))
+    )
+
+    # Los ids de los planes se asignan aquí para insertar materiales y uniones sin releerlos
+    next_id = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM plans").fetchone()[0]
+
+    plan_rows: List[Tuple[Any, ...]] = []
+    material_rows: List[Tuple[Any, ...]] = []
+    joint_rows: List[Tuple[Any, ...]] = []
+
+    for position, plan in enumerate(sale_note.plans):
+        plan_id = next_id + position
+        plan_rows.append((plan_id, sale_note.nv, position, plan.plano, plan.spool_data.spool, version))
+        material_rows.extend(_item_rows(plan_id, plan.spool_data.materials, MATERIAL_FIELDS))
+        joint_rows.extend(_item_rows(plan_id, plan.spool_data.joints, JOINT_FIELDS))
+
+    connection.executemany(
+        "INSERT INTO plans (id, nv, position, plano, spool, version) VALUES (?, ?, ?, ?, ?, ?)", plan_rows
+    )
+    connection.executemany(_insert_statement("materials", MATERIAL_FIELDS), material_rows)
+    connection.executemany(_insert_statement("joints", JOINT_FIELDS), joint_rows)
+    return version
+
+
+def load_sale_note(nv: str) -> SaleNote:
+    """
+    Carga una nota de venta completa.
+
+    Args:
+        nv: Número de NV
+
+    Returns:
+        SaleNote: Nota de venta con sus planes en el orden original
+
+    Raises:
+        FileNotFoundError: Si la NV no existe en la base
+    """
+    with _open_repository() as connection:
+        plan_rows = _plan_rows(connection, nv)
+        materials = _items_by_plan(connection, "materials", MATERIAL_FIELDS, "p.nv = ?", (nv,))
+        joints = _items_by_plan(connection, "joints", JOINT_FIELDS, "p.nv = ?", (nv,))
+
+    return SaleNote(nv=nv, plans=[_build_plan(row, materials, joints) for row in plan_rows])
+
+
+def load_manifest(nv: str) -> SaleNoteManifest:
+    """
+    Carga la lista de planos/spools de una NV con sus cantidades, sin leer
+    materiales ni uniones.
+
+    Args:
+        nv: Número de NV
+
+    Returns:
+        SaleNoteManifest: NV con el resumen de cada Plan, en orden
+    """
+    with _open_repository() as connection:
+        _plan_rows(connection, nv)
+        version = connection.execute("SELECT version FROM sale_notes WHERE nv = ?", (nv,)).fetchone()["version"]
+        rows = connection.execute(
+            """
+            SELECT p.plano, p.spool, p.version,
+                   (SELECT COUNT(*) FROM materials m WHERE m.plan_id = p.id) AS total_materials,
+                   (SELECT COUNT(*) FROM joints j WHERE j.plan_id = p.id) AS total_joints
+            FROM plans p WHERE p.nv = ? ORDER BY p.position
+            """,
+            (nv,)
+        ).fetchall()
+
+    return SaleNoteManifest.model_validate({"nv": nv, "version": version, "plans": [dict(row) for row in rows]})
+
+
+def load_plan(nv: str, index: int) -> Plan:
+    """
+    Carga un único Plan de una NV.
+
+    Args:
+        nv: Número de NV
+        index: Posición del Plan en la NV
+
+    Returns:
+        Plan: Plan con sus materiales y uniones
+    """
+    with _open_repository() as connection:
+        row = connection.execute(
+            "SELECT id, plano, spool FROM plans WHERE nv = ? AND position = ?", (nv, index)
+        ).fetchone()
+        if row is None:
+            raise IndexError(f"La NV {nv} no tiene un plan en la posición {index}")
+        materials = _items_by_plan(connection, "materials", MATERIAL_FIELDS, "p.id = ?", (row["id"],))
+        joints = _items_by_plan(connection, "joints", JOINT_FIELDS, "p.id = ?", (row["id"],))
+
+    return _build_plan(row, materials, joints)
+
+
+def iter_plans(nv: str) -> Iterator[Plan]:
+    """
+    Recorre los Plans de una NV en orden, consultando los materiales y uniones
+    de un Plan por vez.
+
+    Args:
+        nv: Número de NV
+
+    Yields:
+        Plan: Cada Plan de la NV
+    """
+    with _open_repository() as connection:
+        for row in _plan_rows(connection, nv):
+            materials = _items_by_plan(connection, "materials", MATERIAL_FIELDS, "p.id = ?", (row["id"],))
+            joints = _items_by_plan(connection, "joints", JOINT_FIELDS, "p.id = ?", (row["id"],))
+            yield _build_plan(row, materials, joints)
+
+
+def save_spool(nv: str, plano: str, spool: str, field: str, items: List[BaseModel],
+               expected_version: Optional[int] = None) -> int:
+    """
+    Reemplaza los materiales o uniones de un spool en una transacción.
+
+    Args:
+        nv: Número de NV
+        plano: Plano del spool editado
+        spool: Nombre del spool editado
+        field: "materials" o "joints"
+        items: Lista completa de materiales o uniones del spool
+        expected_version: Versión del spool sobre la que se hizo la edición.
+            Si es None se guarda sin verificar.
+
+    Returns:
+        int: Versión nueva del spool (y de la NV)
+
+    Raises:
+        ValueError: Si el campo no es editable o el spool no existe en la NV
+        VersionConflictError: Si el spool cambió desde expected_version
+    """
+    if field not in _SPOOL_FIELDS:
+        raise ValueError(f"Campo de spool no editable: {field}")
+    table, fields = _SPOOL_FIELDS[field]
+
+    with _open_repository(write=True) as connection:
+        row = connection.execute(
+            "SELECT id, version FROM plans WHERE nv = ? AND plano = ? AND spool = ? ORDER BY position LIMIT 1",
+            (nv, plano, spool)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"El spool '{spool}' del plano '{plano}' no existe en la NV {nv}")
+        if expected_version is not None and expected_version != row["version"]:
+            raise VersionConflictError(
+                f"El spool '{spool}' del plano '{plano}' cambió desde la versión {expected_version} "
+                f"(versión actual: {row['version']})"
+            )
+
+        connection.execute(
+            "UPDATE sale_notes SET version = version + 1, updated_at = ? WHERE nv = ?",
+            (datetime.now().isoformat(timespec="seconds"), nv)
+        )
+        version = connection.execute("SELECT version FROM sale_notes WHERE nv = ?", (nv,)).fetchone()["version"]
+        connection.execute("UPDATE plans SET version = ? WHERE id = ?", (version, row["id"]))
+        connection.execute(f"DELETE FROM {table} WHERE plan_id = ?", (row["id"],))
+        connection.executemany(_insert_statement(table, fields), _item_rows(row["id"], items, fields))
+        return version
+
+
+def delete_sale_note(nv: str) -> None:
+    """Elimina una NV con todos sus planes, materiales y uniones"""
+    with _open_repository(write=True) as connection:
+        connection.execute("DELETE FROM sale_notes WHERE nv = ?", (nv,))
+
+
+def list_nvs() -> List[str]:
+    """Lista las NVs guardadas, ordenadas"""
+    with _open_repository() as connection:
+        return [row["nv"] for row in connection.execute("SELECT nv FROM sale_notes ORDER BY nv")]
+
+
+def find_joints_by_welder(welder: str) -> List[Dict[str, Any]]:
+    """
+    Busca todas las uniones soldadas (en raíz o remate) por un soldador.
+
+    Args:
+        welder: Nombre del soldador
+
+    Returns:
+        List[Dict[str, Any]]: Uniones con su nv, plano y spool
+    """
+    with _open_repository() as connection:
+        rows = connection.execute(
+            f"""
+            SELECT p.nv, p.plano, p.spool, {', '.join('j.' + field for field in JOINT_FIELDS)}
+            FROM joints j JOIN plans p ON p.id = j.plan_id
+            WHERE j.union_soldador_raiz = ? OR j.union_soldador_remate = ?
+            ORDER BY p.nv, p.position, j.position
+            """,
+            (welder, welder)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def find_spools_by_plano(plano: str) -> List[Dict[str, Any]]:
+    """
+    Busca todos los spools de un plano en todas las NVs.
+
+    Args:
+        plano: Nombre del plano
+
+    Returns:
+        List[Dict[str, Any]]: nv, plano, spool y cantidades de cada spool
+    """
+    with _open_repository() as connection:
+        rows = connection.execute(
+            """
+            SELECT p.nv, p.plano, p.spool,
+                   (SELECT COUNT(*) FROM materials m WHERE m.plan_id = p.id) AS total_materials,
+                   (SELECT COUNT(*) FROM joints j WHERE j.plan_id = p.id) AS total_joints
+            FROM plans p WHERE p.plano = ?
+            ORDER BY p.nv, p.position
+            """,
+            (plano,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _plan_rows(connection: sqlite3.Connection, nv: str) -> List[sqlite3.Row]:
+    """Planes de una NV en orden, verificando que la NV exista"""
+    if connection.execute("SELECT 1 FROM sale_notes WHERE nv = ?", (nv,)).fetchone() is None:
+        raise FileNotFoundError(f"NV no encontrada en la base: {nv}")
+    return connection.execute(
+        "SELECT id, plano, spool FROM plans WHERE nv = ? ORDER BY position", (nv,)
+    ).fetchall()
+
+
+def _items_by_plan(connection: sqlite3.Connection, table: str, fields: Tuple[str, ...],
+                   where: str, params: Tuple[Any, ...]) -> Dict[int, List[Dict[str, Any]]]:
+    """Materiales o uniones agrupados por plan, en su orden original (con los textos categóricos compartidos)"""
+    rows = connection.execute(
+        f"""
+        SELECT t.plan_id, {', '.join('t.' + field for field in fields)}
+        FROM {table} t JOIN plans p ON p.id = t.plan_id
+        WHERE {where}
+        ORDER BY t.plan_id, t.position
+        """,
+        params
+    )
+    items: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        items.setdefault(row[0], []).append(dict(zip(fields, tuple(row)[1:])))
+    for plan_items in items.values():
+        intern_raw_items(plan_items, CATEGORICAL_FIELDS[table])
+    return items
+
+
+def _build_plan(row: sqlite3.Row, materials: Dict[int, List[Dict[str, Any]]],
+                joints: Dict[int, List[Dict[str, Any]]]) -> Plan:
+    """Construye un Plan validando en bloque sus materiales y uniones"""
+    spool = Spool(
+        spool=row["spool"],
+        materials=_MATERIALS_ADAPTER.validate_python(materials.get(row["id"], [])),
+        joints=_JOINTS_ADAPTER.validate_python(joints.get(row["id"], []))
+    )
+    return Plan(plano=row["plano"], spool_data=spool)
+
+
+def _item_rows(plan_id: int, items: List[BaseModel], fields: Tuple[str, ...]) -> List[Tuple[Any, ...]]:
+    """Filas a insertar para los materiales o uniones de un plan"""
+    return [
+        (plan_id, position) + tuple(getattr(item, field) for field in fields)
+        for position, item in enumerate(items)
+    ]
+
+
+def _insert_statement(table: str, fields: Tuple[str, ...]) -> str:
+    """INSERT de materiales o uniones con sus columnas"""
+    columns = ("plan_id", "position") + fields
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+
+def migrate_json_files(json_paths: List[str]) -> int:
+    """
+    Importa a la base las NVs guardadas como JSON (por spool o monolíticos),
+    incluidas sus ediciones pendientes del diario, en una sola transacción.
+
+    Args:
+        json_paths: Rutas de los nv_X.json a importar
+
+    Returns:
+        int: Cantidad de NVs importadas
+    """
+    from .sharded_store import load_sale_note as load_json_sale_note
+
+    imported = save_sale_notes(load_json_sale_note(path) for path in json_paths)
+    logger.info(f"Migración a SQLite: {imported} NV(s) importadas en {SALE_NOTE_DB_PATH}")
+    return imported
@@ -0,0 +1,137 @@
+# backend/app/services/etapa_2/workbook_cache.py
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, TypeVar
+from backend.app.core.config import PARSED_WORKBOOK_CACHE_MAX_ENTRIES, SALE_NOTE_CACHE_MAX_ENTRIES
+
+T = TypeVar("T")
+
+# (namespace, ruta absoluta, mtime en ns, tamaño en bytes, (mtime, tamaño) de los archivos asociados)
+CacheKey = Tuple[str, str, int, int, Tuple[Optional[Tuple[int, int]], ...]]
+
+
+class ParsedWorkbookCache:
+    """
+    Cache LRU en memoria del proceso para resultados de parsear archivos
+    (libros Excel y NVs guardadas en JSON).
+
+    Cada entrada se indexa por (namespace, ruta, mtime, tamaño): si el archivo
+    cambia en disco la clave deja de coincidir y se vuelve a parsear. El
+    namespace separa resultados distintos de un mismo archivo (por ejemplo,
+    los de cada módulo lector). Los archivos asociados (por ejemplo, el diario
+    de ediciones de una NV) también forman parte de la versión.
+
+    Los objetos cacheados se comparten entre llamadas y no deben modificarse.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(0, max_entries)
+        self._entries: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _make_key(file_path: str, namespace: str, companions: Sequence[str]) -> CacheKey:
+        stat = os.stat(file_path)
+        companion_versions = []
+        for companion in companions:
+            try:
+                companion_stat = os.stat(companion)
+                companion_versions.append((companion_stat.st_mtime_ns, companion_stat.st_size))
+            except FileNotFoundError:
+                companion_versions.append(None)
+        return (namespace, os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, tuple(companion_versions))
+
+    def get_or_load(self, file_path: str, loader: Callable[[], T], namespace: str = "",
+                    companions: Sequence[str] = ()) -> T:
+        """
+        Retorna el resultado cacheado para la versión actual del archivo o lo
+        calcula con `loader` y lo guarda.
+
+        Args:
+            file_path: Ruta del archivo Excel
+            loader: Función que parsea el archivo cuando no está en cache
+            namespace: Identificador del tipo de resultado cacheado
+            companions: Archivos (pueden no existir) cuyo contenido también
+                afecta al resultado
+
+        Returns:
+            T: Resultado de `loader` para la versión actual del archivo
+        """
+        key = self._make_key(file_path, namespace, companions)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Parsear fuera del lock para no bloquear otras lecturas
+        value = loader()
+
+        if self.max_entries == 0:
+            return value
+
+        with self._lock:
+            # Descartar versiones anteriores del mismo archivo
+            stale_keys = [k for k in self._entries if k[:2] == key[:2] and k != key]
+            for stale_key in stale_keys:
+                del self._entries[stale_key]
+                self.invalidations += 1
+
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return value
+
+    def invalidate(self, file_path: Optional[str] = None) -> int:
+        """
+        Elimina entradas del cache.
+
+        Args:
+            file_path: Ruta del archivo a invalidar. Si es None se vacía todo el cache.
+
+        Returns:
+            int: Cantidad de entradas eliminadas
+        """
+        with self._lock:
+            if file_path is None:
+                keys = list(self._entries)
+            else:
+                abs_path = os.path.abspath(file_path)
+                keys = [k for k in self._entries if k[1] == abs_path]
+
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna los contadores y el tamaño actual del cache"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "files": sorted({k[1] for k in self._entries})
+            }
+
+
+# Cache compartido por los lectores de Excel y los endpoints de etapa 2
+parsed_workbook_cache = ParsedWorkbookCache(max_entries=PARSED_WORKBOOK_CACHE_MAX_ENTRIES)
+
+# Cache de NVs completas ya validadas, cargadas desde data/json_data
+sale_note_cache = ParsedWorkbookCache(max_entries=SALE_NOTE_CACHE_MAX_ENTRIES)
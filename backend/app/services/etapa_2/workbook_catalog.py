@@ -0,0 +1,247 @@
+# backend/app/services/etapa_2/workbook_catalog.py
+
+import os
+import json
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from backend.app.core.config import OUTPUT_DIR_ETAPA_1_SALIDA, WORKBOOK_CATALOG_PATH
+from backend.app.core.logger import setup_logger
+from .excel_reader_clean import validate_excel_structure
+
+logger = setup_logger()
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+# Versión del cálculo de las filas de workbooks: al incrementarla, los libros
+# registrados con una versión anterior se vuelven a escanear
+_CATALOG_VERSION = 1
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS workbooks (
+        filename TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        nv TEXT,
+        total_materials INTEGER,
+        total_joints INTEGER,
+        unique_nvs INTEGER,
+        unique_plans INTEGER,
+        unique_spools INTEGER,
+        valid INTEGER NOT NULL,
+        errors TEXT NOT NULL,
+        warnings TEXT NOT NULL,
+        scanned_at TEXT NOT NULL
+    )
+    """,
+    # Índice (plano, spool) -> rangos de filas de cada hoja, por versión del libro
+    """
+    CREATE TABLE IF NOT EXISTS spool_index_versions (
+        filename TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        materials_sheet TEXT NOT NULL,
+        joints_sheet TEXT NOT NULL,
+        built_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS spool_index_ranges (
+        filename TEXT NOT NULL,
+        sheet TEXT NOT NULL,
+        nv TEXT,
+        plano TEXT NOT NULL,
+        spool TEXT NOT NULL,
+        start_row INTEGER NOT NULL,
+        end_row INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_spool_index_ranges_spool
+    ON spool_index_ranges (filename, spool, plano)
+    """
+)
+
+
+@contextmanager
+def open_catalog() -> Iterator[sqlite3.Connection]:
+    """Abre el catálogo (creando la tabla si no existe) dentro de una transacción"""
+    catalog_dir = os.path.dirname(WORKBOOK_CATALOG_PATH)
+    if catalog_dir:
+        os.makedirs(catalog_dir, exist_ok=True)
+
+    connection = sqlite3.connect(WORKBOOK_CATALOG_PATH, timeout=30)
+    connection.row_factory = sqlite3.Row
+    try:
+        with connection:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            if connection.execute("PRAGMA user_version").fetchone()[0] < _CATALOG_VERSION:
+                connection.execute("DELETE FROM workbooks")
+                connection.execute(f"PRAGMA user_version = {_CATALOG_VERSION}")
+            yield connection
+    finally:
+        connection.close()
+
+
+def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Calcula el hash SHA-256 del contenido de un archivo leyéndolo por bloques.
+
+    Args:
+        file_path: Ruta del archivo
+        chunk_size: Tamaño de cada bloque leído
+
+    Returns:
+        str: Hash hexadecimal del contenido
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def refresh_catalog() -> Dict[str, int]:
+    """
+    Sincroniza el catálogo con el directorio de etapa 1. Solo se vuelven a
+    validar los archivos cuyo tamaño o mtime cambió; si el contenido (hash) es
+    el mismo, únicamente se actualiza la fecha de modificación.
+
+    El hash y la validación de los archivos se calculan sin ninguna transacción
+    abierta; los cambios se aplican al final en una única transacción corta,
+    para que las lecturas de otros procesos no esperen al recorrido completo.
+
+    Returns:
+        Dict[str, int]: Cantidad de archivos agregados, actualizados, eliminados y sin cambios
+    """
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+    current_files: Dict[str, os.stat_result] = {}
+    if os.path.exists(OUTPUT_DIR_ETAPA_1_SALIDA):
+        with os.scandir(OUTPUT_DIR_ETAPA_1_SALIDA) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(EXCEL_EXTENSIONS):
+                    current_files[entry.name] = entry.stat()
+
+    with open_catalog() as connection:
+        known = {
+            row["filename"]: row
+            for row in connection.execute("SELECT filename, size, mtime_ns, content_hash FROM workbooks")
+        }
+
+    removed = [(filename,) for filename in set(known) - set(current_files)]
+    counts["removed"] = len(removed)
+    touched: List[Tuple[int, int, str]] = []
+    upserts: List[Tuple[Any, ...]] = []
+
+    for filename, stat in current_files.items():
+        row = known.get(filename)
+        if row is not None and row["size"] == stat.st_size and row["mtime_ns"] == stat.st_mtime_ns:
+            counts["unchanged"] += 1
+            continue
+
+        file_path = os.path.join(OUTPUT_DIR_ETAPA_1_SALIDA, filename)
+        content_hash = compute_file_hash(file_path)
+
+        if row is not None and row["content_hash"] == content_hash:
+            # El archivo se tocó pero su contenido es el mismo
+            touched.append((stat.st_size, stat.st_mtime_ns, filename))
+            counts["unchanged"] += 1
+            continue
+
+        upserts.append(_catalog_row(filename, file_path, stat, content_hash))
+        counts["updated" if row is not None else "added"] += 1
+
+    if removed or touched or upserts:
+        with open_catalog() as connection:
+            connection.executemany("DELETE FROM workbooks WHERE filename = ?", removed)
+            connection.executemany("DELETE FROM spool_index_versions WHERE filename = ?", removed)
+            connection.executemany("DELETE FROM spool_index_ranges WHERE filename = ?", removed)
+            connection.executemany("UPDATE workbooks SET size = ?, mtime_ns = ? WHERE filename = ?", touched)
+            connection.executemany(
+                """
+                INSERT OR REPLACE INTO workbooks (
+                    filename, path, size, mtime_ns, content_hash, nv,
+                    total_materials, total_joints, unique_nvs, unique_plans, unique_spools,
+                    valid, errors, warnings, scanned_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                upserts
+            )
+
+    if counts["added"] or counts["updated"] or counts["removed"]:
+        logger.info(f"Catálogo de libros actualizado: {counts}")
+    return counts
+
+
+def _catalog_row(filename: str, file_path: str, stat: os.stat_result, content_hash: str) -> Tuple[Any, ...]:
+    """Valida un libro y arma su fila del catálogo (sin escribirla)"""
+    validation = validate_excel_structure(filename)
+    info = validation["info"]
+
+    return (
+        filename,
+        os.path.abspath(file_path),
+        stat.st_size,
+        stat.st_mtime_ns,
+        content_hash,
+        ", ".join(info.get("nvs", [])) or None,
+        info.get("total_materials"),
+        info.get("total_joints"),
+        info.get("unique_nvs"),
+        info.get("unique_plans"),
+        info.get("unique_spools"),
+        int(validation["valid"]),
+        json.dumps(validation["errors"], ensure_ascii=False),
+        json.dumps(validation["warnings"], ensure_ascii=False),
+        datetime.now().isoformat(timespec="seconds")
+    )
+
+
+def list_catalog_entries(refresh: bool = True) -> List[Dict[str, Any]]:
+    """
+    Lista los libros Excel registrados en el catálogo.
+
+    Args:
+        refresh: Si se debe sincronizar el catálogo con el directorio antes de listar
+
+    Returns:
+        List[Dict[str, Any]]: Una entrada por libro, ordenadas por nombre de archivo
+    """
+    if refresh:
+        refresh_catalog()
+
+    with open_catalog() as connection:
+        rows = connection.execute("SELECT * FROM workbooks ORDER BY filename").fetchall()
+
+    return [_row_to_entry(row) for row in rows]
+
+
+def get_catalog_entry(filename: str) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene la entrada del catálogo de un libro (sin sincronizar el directorio).
+
+    Args:
+        filename: Nombre del archivo Excel
+
+    Returns:
+        Optional[Dict[str, Any]]: Entrada del libro o None si no está registrado
+    """
+    with open_catalog() as connection:
+        row = connection.execute("SELECT * FROM workbooks WHERE filename = ?", (filename,)).fetchone()
+    return _row_to_entry(row) if row is not None else None
+
+
+def _row_to_entry(row: sqlite3.Row) -> Dict[str, Any]:
+    """Convierte una fila del catálogo a diccionario"""
+    entry = dict(row)
+    entry["valid"] = bool(entry["valid"])
+    entry["errors"] = json.loads(entry["errors"])
+    entry["warnings"] = json.loads(entry["warnings"])
+    return entry
@@ -0,0 +1,297 @@
+# backend/app/services/etapa_2/workbook_loader.py
+
+import math
+import time
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from openpyxl import load_workbook  # type: ignore
+from backend.app.core.logger import setup_logger
+from backend.app.services.etapa_1.excel_generator import MATERIALS_COLUMNS, JOINTS_COLUMNS
+
+logger = setup_logger()
+
+# Nombres aceptados para cada hoja (en español o inglés, sin distinguir mayúsculas)
+MATERIALS_SHEET_NAMES = ('materials', 'materiales')
+JOINTS_SHEET_NAMES = ('joints', 'uniones')
+
+# Esquema de lectura: solo se cargan las columnas que genera etapa 1, con tipos
+# fijos para que pandas no infiera el tipo de cada columna. Los identificadores
+# se leen como texto y la cantidad con el valor de la celda tal cual, para
+# convertirla con cell_to_int igual que la lectura en streaming.
+MATERIALS_DTYPES: Dict[str, Any] = {column: str for column in MATERIALS_COLUMNS}
+MATERIALS_DTYPES['mat_qty'] = object
+JOINTS_DTYPES: Dict[str, Any] = {column: str for column in JOINTS_COLUMNS}
+
+
+# Columnas que identifican el spool de cada fila
+KEY_COLUMNS = ('nv', 'plano', 'spool')
+
+
+class MissingSheetError(ValueError):
+    """El libro no contiene alguna de las hojas requeridas"""
+
+
+@dataclass
+class LoadedWorkbook:
+    """Hojas de un libro Excel leídas desde un único manejador de archivo"""
+    file_path: str
+    materials_sheet: str
+    joints_sheet: Optional[str]
+    df_materials: pd.DataFrame
+    df_joints: Optional[pd.DataFrame]
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class WorkbookSummary:
+    """Encabezados, cantidad de filas y claves únicas de un libro, sin cargar las hojas"""
+    file_path: str
+    materials_sheet: str
+    joints_sheet: str
+    materials_columns: List[str]
+    joints_columns: List[str]
+    total_materials: int
+    total_joints: int
+    nvs: Set[Any] = field(default_factory=set)
+    plans: Set[Any] = field(default_factory=set)
+    spools: Set[Any] = field(default_factory=set)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def find_sheet_names(sheet_names: Iterable[object]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Identifica las hojas de materiales y uniones entre los nombres del libro.
+
+    Args:
+        sheet_names: Nombres de hojas del libro Excel
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: (hoja de materiales, hoja de uniones)
+    """
+    materials_sheet = None
+    joints_sheet = None
+
+    for sheet in sheet_names:
+        if isinstance(sheet, str) and sheet.lower() in MATERIALS_SHEET_NAMES:
+            materials_sheet = sheet
+        elif isinstance(sheet, str) and sheet.lower() in JOINTS_SHEET_NAMES:
+            joints_sheet = sheet
+
+    return materials_sheet, joints_sheet
+
+
+def cell_to_int(value: Any) -> int:
+    """
+    Convierte una celda de cantidad a entero igual que int() (los decimales se
+    truncan).
+
+    Raises:
+        ValueError: Si la celda está vacía o no es un número
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        raise ValueError("celda vacía")
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"no es un número entero: {value!r}") from None
+
+
+def load_workbook_sheets(file_path: str, read_joints: bool = True) -> LoadedWorkbook:
+    """
+    Abre un libro Excel una sola vez, resuelve los alias de las hojas y lee
+    materiales (y opcionalmente uniones) desde el mismo manejador.
+    
+    Cada hoja se lee con su esquema (MATERIALS_DTYPES / JOINTS_DTYPES): las
+    columnas que no genera etapa 1 se descartan sin convertirse y las columnas
+    opcionales ausentes simplemente no aparecen en el DataFrame.
+
+    Los tiempos de cada etapa quedan en `timings` (en segundos):
+    - open: descompresión del zip y lectura de la lista de hojas
+    - read_materials / read_joints: parseo del XML de cada hoja a DataFrame
+    - total: tiempo completo de la carga
+
+    Args:
+        file_path: Ruta completa del archivo Excel
+        read_joints: Si se debe exigir y leer la hoja de uniones
+
+    Returns:
+        LoadedWorkbook: Hojas leídas junto con los tiempos por etapa
+
+    Raises:
+        MissingSheetError: Si falta alguna de las hojas requeridas
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    with pd.ExcelFile(file_path) as xl:
+        timings["open"] = time.perf_counter() - start
+
+        materials_sheet, joints_sheet = find_sheet_names(xl.sheet_names)
+
+        if not materials_sheet:
+            raise MissingSheetError("No se encontró hoja de materiales (buscar: 'Materials' o 'materiales')")
+        if read_joints and not joints_sheet:
+            raise MissingSheetError("No se encontró hoja de uniones (buscar: 'Joints' o 'uniones')")
+
+        stage_start = time.perf_counter()
+        df_materials: pd.DataFrame = _parse_sheet(xl, materials_sheet, MATERIALS_DTYPES)
+        timings["read_materials"] = time.perf_counter() - stage_start
+
+        df_joints: Optional[pd.DataFrame] = None
+        if read_joints:
+            stage_start = time.perf_counter()
+            df_joints = _parse_sheet(xl, joints_sheet, JOINTS_DTYPES)
+            timings["read_joints"] = time.perf_counter() - stage_start
+
+    timings["total"] = time.perf_counter() - start
+    logger.info(
+        f"Libro leído: {file_path} "
+        + ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in timings.items())
+    )
+
+    return LoadedWorkbook(
+        file_path=file_path,
+        materials_sheet=materials_sheet,
+        joints_sheet=joints_sheet if read_joints else None,
+        df_materials=df_materials,
+        df_joints=df_joints,
+        timings=timings
+    )
+
+
+def _parse_sheet(xl: pd.ExcelFile, sheet_name: str, dtypes: Dict[str, Any]) -> pd.DataFrame:
+    """Lee una hoja cargando solo las columnas del esquema, con sus tipos fijos"""
+    return xl.parse(  # type: ignore
+        sheet_name=sheet_name,
+        usecols=lambda column: column in dtypes,
+        dtype=dtypes
+    )
+
+
+def scan_workbook_summary(file_path: str) -> WorkbookSummary:
+    """
+    Obtiene un resumen del libro leyendo solo el encabezado de cada hoja y
+    recorriendo únicamente sus columnas nv/plano/spool, para contar las filas
+    y los valores únicos (de la hoja de materiales).
+
+    Args:
+        file_path: Ruta completa del archivo Excel
+
+    Returns:
+        WorkbookSummary: Columnas, cantidad de filas y claves únicas del libro
+
+    Raises:
+        MissingSheetError: Si falta alguna de las hojas requeridas
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+
+    try:
+        timings["open"] = time.perf_counter() - start
+
+        materials_sheet, joints_sheet = find_sheet_names(workbook.sheetnames)
+
+        if not materials_sheet:
+            raise MissingSheetError("No se encontró hoja de materiales (buscar: 'Materials' o 'materiales')")
+        if not joints_sheet:
+            raise MissingSheetError("No se encontró hoja de uniones (buscar: 'Joints' o 'uniones')")
+
+        materials_ws = workbook[materials_sheet]
+        joints_ws = workbook[joints_sheet]
+
+        stage_start = time.perf_counter()
+        materials_columns = read_header(materials_ws)
+        joints_columns = read_header(joints_ws)
+        timings["headers"] = time.perf_counter() - stage_start
+
+        summary = WorkbookSummary(
+            file_path=file_path,
+            materials_sheet=materials_sheet,
+            joints_sheet=joints_sheet,
+            materials_columns=materials_columns,
+            joints_columns=joints_columns,
+            total_materials=0,
+            total_joints=0,
+            timings=timings
+        )
+
+        # Recorrer solo las columnas clave: los valores únicos salen de la hoja
+        # de materiales y la cantidad de filas de ambas hojas llega hasta la
+        # última fila con alguna clave (igual que la lectura completa, que
+        # descarta las filas vacías del final aunque tengan formato)
+        stage_start = time.perf_counter()
+        key_rows = _iter_key_rows(materials_ws, materials_columns)
+        if key_rows is None:
+            summary.total_materials = _data_row_count(materials_ws)
+        else:
+            for row_number, (nv, plano, spool) in enumerate(key_rows, start=1):
+                if nv is None and plano is None and spool is None:
+                    continue
+                summary.total_materials = row_number
+                if nv is not None:
+                    summary.nvs.add(nv)
+                if plano is not None:
+                    summary.plans.add(plano)
+                if spool is not None:
+                    summary.spools.add(spool)
+
+        key_rows = _iter_key_rows(joints_ws, joints_columns)
+        if key_rows is None:
+            summary.total_joints = _data_row_count(joints_ws)
+        else:
+            for row_number, keys in enumerate(key_rows, start=1):
+                if keys != (None, None, None):
+                    summary.total_joints = row_number
+        timings["key_columns"] = time.perf_counter() - stage_start
+    finally:
+        workbook.close()
+
+    timings["total"] = time.perf_counter() - start
+    return summary
+
+
+def read_header(worksheet: Any) -> List[str]:
+    """Lee solo la primera fila de una hoja como nombres de columna"""
+    for row in worksheet.iter_rows(min_row=1, max_row=1, values_only=True):
+        return [str(column) if column is not None else "" for column in row]
+    return []
+
+
+def _iter_key_rows(worksheet: Any, columns: List[str]) -> Optional[Iterator[Tuple[Any, Any, Any]]]:
+    """
+    Recorre solo el bloque de columnas nv/plano/spool de las filas de datos.
+
+    Returns:
+        Optional[Iterator[Tuple[Any, Any, Any]]]: (nv, plano, spool) de cada fila,
+        con None en las columnas ausentes, o None si la hoja no tiene ninguna
+    """
+    key_indexes = [columns.index(column) if column in columns else None for column in KEY_COLUMNS]
+    present = [index for index in key_indexes if index is not None]
+    if not present:
+        return None
+
+    min_col = min(present) + 1
+    max_col = max(present) + 1
+    offsets = [index + 1 - min_col if index is not None else None for index in key_indexes]
+
+    def key_values(row: Tuple[Any, ...]) -> Tuple[Any, Any, Any]:
+        nv, plano, spool = (
+            row[offset] if offset is not None and offset < len(row) else None for offset in offsets
+        )
+        return nv, plano, spool
+
+    rows = worksheet.iter_rows(min_row=2, min_col=min_col, max_col=max_col, values_only=True)
+    return (key_values(row) for row in rows)
+
+
+def _data_row_count(worksheet: Any) -> int:
+    """
+    Cantidad de filas de datos (sin encabezado) según las dimensiones de la hoja.
+    Si el archivo no declara dimensiones se cuentan recorriendo la primera columna.
+    """
+    if worksheet.max_row is not None:
+        return max(worksheet.max_row - 1, 0)
+    return sum(1 for _ in worksheet.iter_rows(min_row=2, max_col=1, values_only=True))
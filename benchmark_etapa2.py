@@ -0,0 +1,573 @@
+# benchmark_etapa2.py - Benchmarks de rendimiento para los servicios de etapa 2
+
+import io
+import sys
+import os
+import time
+import json
+import tempfile
+import tracemalloc
+from itertools import islice
+from typing import Any, Callable, Dict, List
+
+# Agregar el directorio backend al path para importar los módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+# Los libros generados por los benchmarks se escriben en un directorio temporal
+BENCH_DIR = tempfile.mkdtemp(prefix="benchmark_etapa2_")
+os.environ["OUTPUT_DIR_ETAPA_1"] = BENCH_DIR
+
+import pandas as pd  # type: ignore
+from datetime import datetime, timedelta
+
+from backend.app.api.v1.schemas.nv_schemas import SaleNote, Plan, Spool, Material, Joint
+from backend.app.services.etapa_2.json_converter import sale_note_to_json_bytes, export_sale_note_json
+from backend.app.services.etapa_2 import sharded_store
+from backend.app.services.etapa_2.json_journal import pending_journal_paths
+from backend.app.services.etapa_2.workbook_cache import sale_note_cache
+from backend.app.services.etapa_2.json_stream_reader import iter_plans_from_json, find_spool_in_json
+from backend.app.services.etapa_2.excel_exporter import sale_note_to_excel, sale_note_to_excel_file
+from backend.app.services.etapa_2.excel_stream_reader import iter_plans_from_excel
+from backend.app.services.etapa_2.workbook_loader import load_workbook_sheets
+from backend.app.services.etapa_2.excel_reader_clean import (
+    read_excel_to_sale_note,
+    validate_excel_structure
+)
+from backend.app.services.etapa_2.flat_tables import frames_to_plans, items_from_frame, iter_plan_rows
+
+
+def build_sample_dataframes(num_spools: int, materials_per_spool: int = 5,
+                            joints_per_spool: int = 4, spools_per_plan: int = 10) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Genera DataFrames sintéticos de materiales y uniones con el formato de etapa 1.
+
+    Args:
+        num_spools: Cantidad total de spools a generar
+        materials_per_spool: Materiales por spool
+        joints_per_spool: Uniones por spool
+        spools_per_plan: Spools por plano
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: (df_materials, df_joints)
+    """
+    materials: List[Dict[str, Any]] = []
+    joints: List[Dict[str, Any]] = []
+
+    for i in range(num_spools):
+        plano = f"PLANO-{i // spools_per_plan}"
+        spool = f"SPOOL-{i}"
+        for j in range(materials_per_spool):
+            materials.append({
+                "nv": "193",
+                "plano": plano,
+                "spool": spool,
+                "mat_descripcion": f"CODO 90 LR {j}",
+                "mat_dn": "4",
+                "mat_sch": "40",
+                "mat_qty": j + 1,
+                "mat_numero_interno": f"MI-{i}-{j}",
+            })
+        for j in range(joints_per_spool):
+            joints.append({
+                "nv": "193",
+                "plano": plano,
+                "spool": spool,
+                "union_numero": str(j + 1),
+                "union_dn": "4",
+                "union_tipo": "BW",
+                "union_armador": "ARMADOR 1",
+                "union_soldador_raiz": "SOLDADOR 1",
+                "union_soldador_remate": None,
+            })
+
+    return pd.DataFrame(materials), pd.DataFrame(joints)
+
+
+def write_sample_workbook(num_spools: int, **kwargs: Any) -> str:
+    """
+    Escribe un libro Excel sintético en BENCH_DIR.
+
+    Args:
+        num_spools: Cantidad total de spools a generar
+        **kwargs: Parámetros adicionales para build_sample_dataframes
+
+    Returns:
+        str: Nombre del archivo generado (relativo a BENCH_DIR)
+    """
+    df_materials, df_joints = build_sample_dataframes(num_spools, **kwargs)
+    filename = f"bench_{num_spools}_{len(df_materials.columns)}.xlsx"
+    with pd.ExcelWriter(os.path.join(BENCH_DIR, filename)) as writer:
+        df_materials.to_excel(writer, sheet_name="materiales", index=False)  # type: ignore
+        df_joints.to_excel(writer, sheet_name="uniones", index=False)  # type: ignore
+    return filename
+
+
+def write_messy_workbook(num_spools: int, extra_columns: int = 30) -> str:
+    """
+    Escribe un libro como los que editan los planificadores: las columnas de
+    etapa 1 con tipos mezclados (DN en fracciones y números) más columnas
+    adicionales de notas, fechas y números que el lector debe ignorar.
+
+    Args:
+        num_spools: Cantidad total de spools a generar
+        extra_columns: Cantidad de columnas adicionales por hoja
+
+    Returns:
+        str: Nombre del archivo generado (relativo a BENCH_DIR)
+    """
+    df_materials, df_joints = build_sample_dataframes(num_spools)
+    df_materials['mat_dn'] = ['1/2' if i % 3 == 0 else 4.5 if i % 3 == 1 else 4 for i in range(len(df_materials))]
+    df_joints['union_numero'] = [j % 50 + 1 for j in range(len(df_joints))]
+
+    base_date = datetime(2024, 1, 1)
+    for df in (df_materials, df_joints):
+        rows = len(df)
+        for k in range(extra_columns):
+            if k % 3 == 0:
+                df[f"nota_{k}"] = [f"revisar con terreno {i}" if i % 7 else None for i in range(rows)]
+            elif k % 3 == 1:
+                df[f"fecha_{k}"] = [base_date + timedelta(days=i % 365) for i in range(rows)]
+            else:
+                df[f"valor_{k}"] = [i * 0.25 if i % 5 else "N/A" for i in range(rows)]
+
+    filename = f"bench_messy_{num_spools}_{extra_columns}.xlsx"
+    with pd.ExcelWriter(os.path.join(BENCH_DIR, filename)) as writer:
+        df_materials.to_excel(writer, sheet_name="materiales", index=False)  # type: ignore
+        df_joints.to_excel(writer, sheet_name="uniones", index=False)  # type: ignore
+    return filename
+
+
+def _inferred_read(file_path: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Lectura anterior: todas las columnas con tipos inferidos por pandas, usada como referencia"""
+    with pd.ExcelFile(file_path) as xl:
+        return xl.parse(sheet_name="materiales"), xl.parse(sheet_name="uniones")  # type: ignore
+
+
+def _create_spool_from_dataframes(spool_name: str, df_materials: pd.DataFrame, df_joints: pd.DataFrame) -> Spool:
+    """Construcción anterior de un Spool desde los DataFrames ya filtrados, usada como referencia"""
+    return Spool(
+        spool=spool_name,
+        materials=items_from_frame(df_materials, "materials"),
+        joints=items_from_frame(df_joints, "joints")
+    )
+
+
+def _mask_based_create_plans(df_materials: pd.DataFrame, df_joints: pd.DataFrame) -> List[Plan]:
+    """Implementación anterior basada en máscaras booleanas, usada como referencia"""
+    plans: List[Plan] = []
+    for plan_name in df_materials['plano'].unique():  # type: ignore
+        plan_materials = df_materials[df_materials['plano'] == plan_name]  # type: ignore
+        plan_joints = df_joints[df_joints['plano'] == plan_name]  # type: ignore
+        for spool_name in plan_materials['spool'].unique():  # type: ignore
+            spool_materials = plan_materials[plan_materials['spool'] == spool_name]  # type: ignore
+            spool_joints = plan_joints[plan_joints['spool'] == spool_name]  # type: ignore
+            spool = _create_spool_from_dataframes(str(spool_name), spool_materials, spool_joints)
+            plans.append(Plan(plano=str(plan_name), spool_data=spool))
+    return plans
+
+
+def _iterrows_build_models(df_materials: pd.DataFrame, df_joints: pd.DataFrame) -> tuple[List[Material], List[Joint]]:
+    """Construcción anterior fila por fila con iterrows, usada como referencia"""
+    materials: List[Material] = []
+    for _, row in df_materials.iterrows():  # type: ignore
+        mat_numero_interno = None
+        if 'mat_numero_interno' in df_materials.columns:
+            mat_numero_interno = str(row['mat_numero_interno']) if pd.notna(row['mat_numero_interno']) else None
+        materials.append(Material(
+            mat_descripcion=str(row['mat_descripcion']),
+            mat_dn=str(row['mat_dn']),
+            mat_sch=str(row['mat_sch']),
+            mat_qty=int(row['mat_qty']),
+            mat_numero_interno=mat_numero_interno
+        ))
+
+    joints: List[Joint] = []
+    for _, row in df_joints.iterrows():  # type: ignore
+        optional: Dict[str, Any] = {}
+        for column in ('union_armador', 'union_soldador_raiz', 'union_soldador_remate'):
+            if column in df_joints.columns:
+                optional[column] = str(row[column]) if pd.notna(row[column]) else None
+        joints.append(Joint(
+            union_numero=str(row['union_numero']),
+            union_dn=str(row['union_dn']),
+            union_tipo=str(row['union_tipo']),
+            **optional
+        ))
+    return materials, joints
+
+
+def _peak_memory(func: Callable[[], Any]) -> float:
+    """Retorna el pico de memoria asignada (en MB) durante la llamada"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def _time_call(func: Callable[[], Any], repeat: int = 3) -> float:
+    """Retorna el mejor tiempo (en segundos) de varias ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_plan_builder(spool_counts: List[int]) -> None:
+    """Compara el constructor de jerarquía por groupby contra el basado en máscaras"""
+    print("=== Constructor de jerarquía: groupby vs máscaras ===\n")
+    print(f"{'spools':>8} {'groupby (s)':>12} {'máscaras (s)':>13} {'µs/spool':>9}")
+
+    for num_spools in spool_counts:
+        df_materials, df_joints = build_sample_dataframes(num_spools)
+
+        grouped = _time_call(lambda: frames_to_plans(df_materials, df_joints))
+        masked = _time_call(lambda: _mask_based_create_plans(df_materials, df_joints), repeat=1)
+        per_spool = grouped / num_spools * 1_000_000
+
+        print(f"{num_spools:>8} {grouped:>12.3f} {masked:>13.3f} {per_spool:>9.1f}")
+    print()
+
+
+def benchmark_row_construction(spool_counts: List[int]) -> None:
+    """Compara la construcción por columnas (TypeAdapter) contra iterrows"""
+    print("=== Construcción de Material/Joint: columnas vs iterrows ===\n")
+    print(f"{'filas':>8} {'columnas (s)':>13} {'iterrows (s)':>13} {'speedup':>8}")
+
+    for num_spools in spool_counts:
+        df_materials, df_joints = build_sample_dataframes(num_spools)
+        rows = len(df_materials) + len(df_joints)
+
+        batched = _time_call(lambda: (items_from_frame(df_materials, "materials"), items_from_frame(df_joints, "joints")))
+        row_wise = _time_call(lambda: _iterrows_build_models(df_materials, df_joints), repeat=1)
+
+        print(f"{rows:>8} {batched:>13.3f} {row_wise:>13.3f} {row_wise / batched:>7.1f}x")
+    print()
+
+
+def benchmark_streaming_reader(spool_counts: List[int]) -> None:
+    """Compara el pico de memoria del lector streaming contra la lectura completa"""
+    print("=== Lector streaming vs lectura completa (pico de memoria) ===\n")
+    print(f"{'spools':>8} {'streaming (MB)':>15} {'completa (MB)':>14}")
+
+    for num_spools in spool_counts:
+        filename = write_sample_workbook(num_spools)
+
+        def consume_stream() -> None:
+            for _plan in iter_plans_from_excel(filename):
+                pass
+
+        streamed = _peak_memory(consume_stream)
+        full = _peak_memory(lambda: read_excel_to_sale_note(filename, use_cache=False))
+
+        print(f"{num_spools:>8} {streamed:>15.1f} {full:>14.1f}")
+    print()
+
+
+def benchmark_validation(spool_counts: List[int]) -> None:
+    """Compara la validación rápida (encabezados) contra la validación profunda"""
+    print("=== validate_excel_structure: rápida vs profunda ===\n")
+    print(f"{'spools':>8} {'rápida (s)':>11} {'profunda (s)':>13}")
+
+    for num_spools in spool_counts:
+        filename = write_sample_workbook(num_spools)
+
+        fast = _time_call(lambda: validate_excel_structure(filename))
+        deep = _time_call(lambda: validate_excel_structure(filename, deep=True))
+
+        print(f"{num_spools:>8} {fast:>11.3f} {deep:>13.3f}")
+    print()
+
+
+def benchmark_read_schema(spool_counts: List[int], extra_columns: int = 30) -> None:
+    """Compara la lectura con esquema (usecols + dtype) contra la inferencia de tipos"""
+    print(f"=== Lectura con esquema vs inferencia ({extra_columns} columnas extra por hoja) ===\n")
+    print(f"{'spools':>8} {'esquema (s)':>12} {'inferencia (s)':>15} {'esquema (MB)':>13} {'inferencia (MB)':>16}")
+
+    for num_spools in spool_counts:
+        file_path = os.path.join(BENCH_DIR, write_messy_workbook(num_spools, extra_columns))
+
+        typed = _time_call(lambda: load_workbook_sheets(file_path))
+        inferred = _time_call(lambda: _inferred_read(file_path))
+        typed_memory = _peak_memory(lambda: load_workbook_sheets(file_path))
+        inferred_memory = _peak_memory(lambda: _inferred_read(file_path))
+
+        print(f"{num_spools:>8} {typed:>12.3f} {inferred:>15.3f} {typed_memory:>13.1f} {inferred_memory:>16.1f}")
+    print()
+
+
+def benchmark_json_roundtrip(spool_counts: List[int]) -> None:
+    """Compara guardar/cargar JSON con pydantic nativo contra model_dump + json"""
+    print("=== JSON de NV: pydantic nativo vs model_dump + json (pretty) ===\n")
+    print(f"{'spools':>8} {'MB json':>8} {'MB compacto':>12} {'save ant.':>10} {'save comp.':>11} "
+          f"{'save pretty':>12} {'load ant.':>10} {'load nativo':>12}")
+
+    for num_spools in spool_counts:
+        df_materials, df_joints = build_sample_dataframes(num_spools)
+        sale_note = SaleNote(nv="193", plans=frames_to_plans(df_materials, df_joints))
+
+        previous_bytes = json.dumps(sale_note.model_dump(), indent=2, ensure_ascii=False).encode("utf-8")
+        compact_bytes = sale_note_to_json_bytes(sale_note, indent=None)
+
+        save_previous = _time_call(lambda: json.dumps(sale_note.model_dump(), indent=2, ensure_ascii=False).encode("utf-8"))
+        save_compact = _time_call(lambda: sale_note_to_json_bytes(sale_note, indent=None))
+        save_pretty = _time_call(lambda: export_sale_note_json(sale_note))
+        load_previous = _time_call(lambda: SaleNote(**json.loads(previous_bytes)))
+        load_native = _time_call(lambda: SaleNote.model_validate_json(compact_bytes))
+
+        print(f"{num_spools:>8} {len(previous_bytes) / 1e6:>8.1f} {len(compact_bytes) / 1e6:>12.1f} "
+              f"{save_previous:>10.3f} {save_compact:>11.3f} {save_pretty:>12.3f} "
+              f"{load_previous:>10.3f} {load_native:>12.3f}")
+    print()
+
+
+def _construct_plans(raw_plans: List[Dict[str, Any]]) -> List[Plan]:
+    """Construye los Plans sin validar (model_construct no recorre los modelos anidados)"""
+    return [
+        Plan.model_construct(plano=raw["plano"], spool_data=Spool.model_construct(
+            spool=raw["spool_data"]["spool"],
+            materials=[Material.model_construct(**item) for item in raw["spool_data"]["materials"]],
+            joints=[Joint.model_construct(**item) for item in raw["spool_data"]["joints"]]
+        ))
+        for raw in raw_plans
+    ]
+
+
+def benchmark_sale_note_load(spool_counts: List[int]) -> None:
+    """Carga completa de una NV: validación nativa, model_construct y cache por versión"""
+    print("=== Carga de NV: validación vs model_construct vs cache ===\n")
+    print(f"{'spools':>8} {'validar':>8} {'constr.':>8} {'load frío':>10} {'load cache':>11}")
+
+    for num_spools in spool_counts:
+        df_materials, df_joints = build_sample_dataframes(num_spools)
+        sale_note = SaleNote(nv="193", plans=frames_to_plans(df_materials, df_joints))
+        plans_bytes = b"[" + b",".join(plan.model_dump_json().encode("utf-8") for plan in sale_note.plans) + b"]"
+
+        manifest_path = os.path.join(BENCH_DIR, f"nv_load_{num_spools}.json")
+        sharded_store.write_sale_note(manifest_path, sale_note)
+
+        def cached_load() -> SaleNote:
+            return sale_note_cache.get_or_load(
+                manifest_path,
+                lambda: sharded_store.load_sale_note(manifest_path),
+                namespace="sale_note",
+                companions=pending_journal_paths(manifest_path)
+            )
+
+        validate = _time_call(lambda: sharded_store._PLANS_ADAPTER.validate_json(plans_bytes))
+        construct = _time_call(lambda: _construct_plans(json.loads(plans_bytes)))
+        cold = _time_call(lambda: sharded_store.load_sale_note(manifest_path))
+        cached_load()
+        hit = _time_call(cached_load)
+
+        print(f"{num_spools:>8} {validate:>8.3f} {construct:>8.3f} {cold:>10.3f} {hit:>11.6f}")
+    print()
+
+
+def benchmark_json_stream(spool_counts: List[int]) -> None:
+    """Compara cargar un JSON de NV completo contra recorrerlo en modo streaming"""
+    print("=== JSON de NV: documento completo vs streaming ===\n")
+    print(f"{'spools':>8} {'MB':>6} {'load':>7} {'MB pico':>8} {'stream':>7} {'MB pico':>8} "
+          f"{'10 planes':>10} {'buscar medio':>13}")
+
+    for num_spools in spool_counts:
+        df_materials, df_joints = build_sample_dataframes(num_spools)
+        sale_note = SaleNote(nv="193", plans=frames_to_plans(df_materials, df_joints))
+        file_path = os.path.join(BENCH_DIR, f"nv_stream_{num_spools}.json")
+        with open(file_path, "wb") as f:
+            f.write(export_sale_note_json(sale_note))
+        middle = sale_note.plans[num_spools // 2]
+        del sale_note
+
+        def full_load() -> int:
+            with open(file_path, "rb") as f:
+                return len(SaleNote.model_validate_json(f.read()).plans)
+
+        def stream_all() -> int:
+            return sum(1 for _ in iter_plans_from_json(file_path))
+
+        load_time = _time_call(full_load)
+        stream_time = _time_call(stream_all)
+        first_plans = _time_call(lambda: list(islice(iter_plans_from_json(file_path), 10)))
+        find_middle = _time_call(lambda: find_spool_in_json(file_path, middle.spool_data.spool, middle.plano))
+
+        print(f"{num_spools:>8} {os.path.getsize(file_path) / 1e6:>6.1f} {load_time:>7.3f} "
+              f"{_peak_memory(full_load):>8.1f} {stream_time:>7.3f} {_peak_memory(stream_all):>8.1f} "
+              f"{first_plans:>10.4f} {find_middle:>13.3f}")
+    print()
+
+
+def _pandas_sale_note_to_excel(sale_note: SaleNote) -> io.BytesIO:
+    """Exportación anterior: DataFrames completos + to_excel + autofit"""
+    materials_data = []
+    joints_data = []
+    for plan in sale_note.plans:
+        spool = plan.spool_data
+        for mat in spool.materials:
+            materials_data.append({
+                "nv": sale_note.nv, "plano": plan.plano, "spool": spool.spool,
+                "mat_descripcion": mat.mat_descripcion, "mat_dn": mat.mat_dn, "mat_sch": mat.mat_sch,
+                "mat_qty": mat.mat_qty, "mat_numero_interno": mat.mat_numero_interno or ""
+            })
+        for joint in spool.joints:
+            joints_data.append({
+                "nv": sale_note.nv, "plano": plan.plano, "spool": spool.spool,
+                "union_numero": joint.union_numero, "union_dn": joint.union_dn, "union_tipo": joint.union_tipo,
+                "union_armador": joint.union_armador or "",
+                "union_soldador_raiz": joint.union_soldador_raiz or "",
+                "union_soldador_remate": joint.union_soldador_remate or ""
+            })
+
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        for sheet_name, rows in (("materiales", materials_data), ("uniones", joints_data)):
+            pd.DataFrame(rows).to_excel(writer, sheet_name=sheet_name, index=False)
+            writer.sheets[sheet_name].autofit()
+    output.seek(0)
+    return output
+
+
+def benchmark_excel_export(spool_counts: List[int]) -> None:
+    """Compara la exportación a Excel con pandas contra la escritura directa en constant_memory"""
+    print("=== Exportación a Excel: pandas + autofit vs constant_memory ===\n")
+    print(f"{'spools':>8} {'pandas (s)':>11} {'MB pico':>8} {'directo (s)':>12} {'MB pico':>8} "
+          f"{'stream (s)':>11} {'MB pico':>8}")
+
+    for num_spools in spool_counts:
+        df_materials, df_joints = build_sample_dataframes(num_spools)
+        sale_note = SaleNote(nv="193", plans=frames_to_plans(df_materials, df_joints))
+        manifest_path = os.path.join(BENCH_DIR, f"nv_export_{num_spools}.json")
+        sharded_store.write_sale_note(manifest_path, sale_note)
+
+        def stream_export() -> None:
+            # Los Plans se leen de a uno desde el almacenamiento y se escriben a un temporal
+            sale_note_to_excel_file(sale_note.nv, sharded_store.iter_plans(manifest_path)).close()
+
+        pandas_time = _time_call(lambda: _pandas_sale_note_to_excel(sale_note), repeat=1)
+        direct_time = _time_call(lambda: sale_note_to_excel(sale_note), repeat=1)
+        stream_time = _time_call(stream_export, repeat=1)
+
+        print(f"{num_spools:>8} {pandas_time:>11.3f} {_peak_memory(lambda: _pandas_sale_note_to_excel(sale_note)):>8.1f} "
+              f"{direct_time:>12.3f} {_peak_memory(lambda: sale_note_to_excel(sale_note)):>8.1f} "
+              f"{stream_time:>11.3f} {_peak_memory(stream_export):>8.1f}")
+    print()
+
+
+def _retained_memory(build: Callable[[], Any]) -> float:
+    """Memoria (en MB) que sigue ocupando el objeto construido por build()"""
+    tracemalloc.start()
+    try:
+        result = build()
+        retained = tracemalloc.get_traced_memory()[0]
+        del result
+        return retained / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def _sharded_size(manifest_path: str) -> int:
+    """Bytes en disco del manifiesto y los archivos por spool de una NV"""
+    raw = sharded_store._read_raw_manifest(manifest_path)
+    shard_dir = sharded_store._shard_dir(manifest_path, raw)
+    return os.path.getsize(manifest_path) + sum(
+        os.path.getsize(os.path.join(shard_dir, name)) for name in os.listdir(shard_dir)
+    )
+
+
+def benchmark_dictionaries(spool_counts: List[int]) -> None:
+    """Compara guardar la NV con texto en cada fila contra los campos categóricos codificados con diccionario"""
+    print("=== JSON por spool: texto vs diccionario de campos categóricos ===\n")
+    print(f"{'spools':>8} {'MB texto':>9} {'MB dicc.':>9} {'save texto':>11} {'save dicc.':>11} "
+          f"{'load texto':>11} {'load dicc.':>11} {'MB RAM texto':>13} {'MB RAM dicc.':>13}")
+
+    enabled = sharded_store.JSON_STORAGE_DICTIONARIES
+    try:
+        for num_spools in spool_counts:
+            df_materials, df_joints = build_sample_dataframes(num_spools)
+            # Descripciones del largo de las reales (validate_json solo comparte textos de hasta 64 caracteres)
+            df_materials["mat_descripcion"] = (
+                "ACERO AL CARBONO ASTM A234 GRADO WPB, EXTREMOS BISELADOS, SIN COSTURA, " + df_materials["mat_descripcion"]
+            )
+            sale_note = SaleNote(nv="193", plans=frames_to_plans(df_materials, df_joints))
+            results = []
+            for use_dictionaries in (False, True):
+                sharded_store.JSON_STORAGE_DICTIONARIES = use_dictionaries
+                manifest_path = os.path.join(BENCH_DIR, f"nv_dict_{num_spools}_{int(use_dictionaries)}.json")
+                save = _time_call(lambda: sharded_store.write_sale_note(manifest_path, sale_note), repeat=1)
+                load = _time_call(lambda: sharded_store.load_sale_note(manifest_path))
+                memory = _retained_memory(lambda: sharded_store.load_sale_note(manifest_path))
+                results.append((_sharded_size(manifest_path) / 1e6, save, load, memory))
+
+            (size_text, save_text, load_text, mem_text), (size_dict, save_dict, load_dict, mem_dict) = results
+            print(f"{num_spools:>8} {size_text:>9.1f} {size_dict:>9.1f} {save_text:>11.3f} {save_dict:>11.3f} "
+                  f"{load_text:>11.3f} {load_dict:>11.3f} {mem_text:>13.1f} {mem_dict:>13.1f}")
+    finally:
+        sharded_store.JSON_STORAGE_DICTIONARIES = enabled
+    print()
+
+
+def _dict_rows_to_frames(sale_note: SaleNote) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Aplanado anterior: un diccionario por fila armado a mano, usado como referencia"""
+    materials_data = []
+    joints_data = []
+    for plan in sale_note.plans:
+        spool = plan.spool_data
+        for mat in spool.materials:
+            materials_data.append({
+                "nv": sale_note.nv, "plano": plan.plano, "spool": spool.spool,
+                "mat_descripcion": mat.mat_descripcion, "mat_dn": mat.mat_dn, "mat_sch": mat.mat_sch,
+                "mat_qty": mat.mat_qty, "mat_numero_interno": mat.mat_numero_interno
+            })
+        for joint in spool.joints:
+            joints_data.append({
+                "nv": sale_note.nv, "plano": plan.plano, "spool": spool.spool,
+                "union_numero": joint.union_numero, "union_dn": joint.union_dn, "union_tipo": joint.union_tipo,
+                "union_armador": joint.union_armador,
+                "union_soldador_raiz": joint.union_soldador_raiz,
+                "union_soldador_remate": joint.union_soldador_remate
+            })
+    return pd.DataFrame(materials_data), pd.DataFrame(joints_data)
+
+
+def _flat_table_rows(sale_note: SaleNote) -> int:
+    """Aplanado de flat_tables (el que usa la exportación): tuplas por fila"""
+    rows = 0
+    for material_rows, joint_rows in iter_plan_rows(sale_note.nv, sale_note.plans):
+        rows += len(material_rows) + len(joint_rows)
+    return rows
+
+
+def benchmark_flat_tables(spool_counts: List[int]) -> None:
+    """Aplanado de una NV: diccionarios por fila vs flat_tables, y el camino inverso desde DataFrames"""
+    print("=== NV ↔ tablas planas: diccionarios por fila vs flat_tables ===\n")
+    print(f"{'spools':>8} {'dicts+DataFrame':>16} {'tuplas flat':>12} {'reconstruir':>12}")
+
+    for num_spools in spool_counts:
+        df_materials, df_joints = build_sample_dataframes(num_spools)
+        sale_note = SaleNote(nv="193", plans=frames_to_plans(df_materials, df_joints))
+        frames = _dict_rows_to_frames(sale_note)
+        assert frames_to_plans(*frames) == sale_note.plans
+
+        dict_rows = _time_call(lambda: _dict_rows_to_frames(sale_note))
+        flat = _time_call(lambda: _flat_table_rows(sale_note))
+        rebuild = _time_call(lambda: frames_to_plans(*frames))
+
+        print(f"{num_spools:>8} {dict_rows:>16.3f} {flat:>12.3f} {rebuild:>12.3f}")
+    print()
+
+
+if __name__ == "__main__":
+    benchmark_plan_builder([100, 500, 1000, 2000])
+    benchmark_row_construction([100, 1000, 5000])
+    benchmark_streaming_reader([500, 2000, 5000])
+    benchmark_validation([500, 2000, 5000])
+    benchmark_read_schema([500, 2000])
+    benchmark_json_roundtrip([1000, 5000, 20000])
+    benchmark_sale_note_load([1000, 5000, 20000])
+    benchmark_json_stream([1000, 5000, 20000])
+    benchmark_excel_export([1000, 5000])
+    benchmark_dictionaries([1000, 5000])
+    benchmark_flat_tables([1000, 5000, 20000])
@@ -11,27 +11,17 @@ from pathlib import Path
 # Importar módulos del backend
 sys.path.append(str(Path(__file__).parent.parent / "backend"))
 
-from backend.app.services.etapa_2.excel_reader_clean import (
-    get_available_excel_files,
-    read_excel_to_sale_note,
-    validate_excel_structure
-)
-from backend.app.services.etapa_2.json_converter import convert_excel_to_json
+from backend.app.services.etapa_2.workbook_catalog import list_catalog_entries
+from backend.app.services.etapa_2.json_converter import convert_excel_to_json, list_available_nvs
+from backend.app.services.etapa_2.batch_converter import convert_excel_files
+from backend.app.services.etapa_2.bulk_exporter import iter_bulk_export_zip, generate_bulk_export_filename
 from backend.app.core.config import OUTPUT_DIR_ETAPA_1_SALIDA
 
 JSON_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "json_data")
 
 def get_available_json_files() -> List[str]:
-    """Obtiene lista de archivos JSON disponibles"""
-    if not os.path.exists(JSON_DIR):
-        return []
-    
-    json_files = []
-    for file in os.listdir(JSON_DIR):
-        if file.endswith('.json') and file.startswith('nv_'):
-            json_files.append(file)
-    
-    return sorted(json_files)
+    """Obtiene lista de NVs convertidas disponibles (en JSON o en la base SQLite)"""
+    return [f"nv_{nv}.json" for nv in list_available_nvs()]
 
 def show():
     """Muestra la página principal"""
@@ -42,17 +32,30 @@ def show():
     with col1:
         st.markdown('<h2 class="section-header">📁 Archivos Excel</h2>', unsafe_allow_html=True)
         
-        # Obtener archivos Excel disponibles
-        excel_files = get_available_excel_files()
+        # Obtener archivos Excel disponibles desde el catálogo
+        # (solo se revalidan los archivos que cambiaron desde la última visita)
+        excel_entries = list_catalog_entries()
         
-        if not excel_files:
+        if not excel_entries:
             st.warning("No se encontraron archivos Excel en el directorio.")
             st.info(f"Directorio: `{OUTPUT_DIR_ETAPA_1_SALIDA}`")
         else:
-            st.success(f"Se encontraron {len(excel_files)} archivo(s) Excel")
+            st.success(f"Se encontraron {len(excel_entries)} archivo(s) Excel")
+            
+            # Conversión masiva en paralelo (omite los archivos ya convertidos)
+            if st.button("⚡ Convertir todos", key="convert_all_excel"):
+                with st.spinner("Convirtiendo archivos Excel a JSON en paralelo..."):
+                    results = convert_excel_files()
+                converted = sum(1 for result in results if result["status"] == "converted")
+                skipped = sum(1 for result in results if result["status"] == "skipped")
+                st.success(f"✅ {converted} convertido(s), {skipped} ya actualizado(s)")
+                for result in results:
+                    if result["status"] == "error":
+                        st.error(f"❌ {result['filename']}: {result['error']}")
             
             # Mostrar cada archivo Excel como una tarjeta clickeable
-            for excel_file in excel_files:
+            for entry in excel_entries:
+                excel_file = entry["filename"]
                 with st.container():
                     st.markdown(f'<div class="file-card">', unsafe_allow_html=True)
                     
@@ -62,23 +65,18 @@ def show():
                         st.write(f"**{excel_file}**")
                         
                         # Mostrar información básica del archivo
-                        try:
-                            validation = validate_excel_structure(excel_file)
-                            if validation["valid"]:
-                                info = validation["info"]
-                                st.write(f"📊 {info['total_materials']} materiales, {info['total_joints']} uniones")
-                                st.write(f"🏗️ {info['unique_plans']} plano(s), {info['unique_spools']} spool(s)")
-                            else:
-                                st.error("⚠️ Archivo con errores de estructura")
-                        except:
-                            st.write("📄 Archivo Excel")
+                        if entry["valid"]:
+                            st.write(f"📊 {entry['total_materials']} materiales, {entry['total_joints']} uniones")
+                            st.write(f"🏗️ {entry['unique_plans']} plano(s), {entry['unique_spools']} spool(s)")
+                        else:
+                            st.error("⚠️ Archivo con errores de estructura")
                     
                     with col_action:
                         if st.button(f"Convertir", key=f"convert_{excel_file}"):
                             with st.spinner("Convirtiendo Excel a JSON..."):
                                 try:
-                                    json_path = convert_excel_to_json(excel_file)
-                                    st.success("✅ Conversión exitosa!")
+                                    json_paths = convert_excel_to_json(excel_file)
+                                    st.success(f"✅ Conversión exitosa! ({len(json_paths)} NV)")
                                     st.rerun()
                                 except Exception as e:
                                     st.error(f"❌ Error: {str(e)}")
@@ -97,6 +95,31 @@ def show():
         else:
             st.success(f"Se encontraron {len(json_files)} archivo(s) JSON")
             
+            # Exportación masiva: un Excel actualizado por NV, en paralelo, dentro de un ZIP
+            with st.expander("📦 Exportar varias NVs a Excel"):
+                all_nvs = list_available_nvs()
+                selected_nvs = st.multiselect("NVs a exportar", all_nvs, default=all_nvs, key="bulk_export_nvs")
+                if st.button("📦 Generar ZIP", key="bulk_export_zip", disabled=not selected_nvs):
+                    progress = st.progress(0.0, text="Exportando NVs...")
+                    results = []
+                    
+                    def on_result(result):
+                        results.append(result)
+                        progress.progress(len(results) / len(selected_nvs),
+                                          text=f"NV {result['nv']} ({len(results)}/{len(selected_nvs)})")
+                    
+                    zip_bytes = b"".join(iter_bulk_export_zip(selected_nvs, on_result=on_result))
+                    failed = [result for result in results if result["status"] == "error"]
+                    st.download_button(
+                        label="📄 Descargar ZIP",
+                        data=zip_bytes,
+                        file_name=generate_bulk_export_filename(),
+                        mime="application/zip"
+                    )
+                    st.success(f"✅ {len(selected_nvs) - len(failed)} NV(s) exportada(s)")
+                    for result in failed:
+                        st.error(f"❌ NV {result['nv']}: {result['error']}")
+            
             # Mostrar cada archivo JSON como una tarjeta clickeable
             for json_file in json_files:
                 with st.container():
@@ -4,8 +4,6 @@ Página de edición de JSON - Visualiza y permite editar archivos JSON
 
 import streamlit as st
 import os
-import json
-import pandas as pd
 from typing import List, Dict, Any
 import sys
 from pathlib import Path
@@ -14,22 +12,36 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent / "backend"))
 
 from backend.app.api.v1.schemas.nv_schemas import SaleNote, Plan, Spool, Material, Joint
-from backend.app.services.etapa_2.json_converter import save_sale_note_to_json
-from backend.app.services.etapa_2.excel_exporter import sale_note_to_excel, generate_excel_filename
+from backend.app.services.etapa_2.json_converter import (
+    save_spool_edit,
+    load_json_as_sale_note,
+    load_nv_manifest,
+    load_spool,
+    delete_sale_note_json,
+    export_sale_note_json,
+    list_available_nvs,
+    VersionConflictError
+)
+from backend.app.services.etapa_2.excel_exporter import generate_excel_filename
+from backend.app.services.etapa_2.export_cache import excel_export_cache
+from backend.app.services.etapa_2.flat_tables import items_to_frame, items_from_frame
 
-JSON_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "json_data")
-
-def load_json_file(filename: str) -> Dict[str, Any]:
-    """Carga un archivo JSON"""
-    file_path = os.path.join(JSON_DIR, filename)
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def save_json_file(filename: str, data: Dict[str, Any]) -> None:
-    """Guarda un archivo JSON"""
-    file_path = os.path.join(JSON_DIR, filename)
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+# Encabezados de las tablas editables (campo del modelo → columna visible)
+MATERIAL_LABELS = {
+    "mat_descripcion": "Descripción",
+    "mat_dn": "Diámetro",
+    "mat_sch": "SCH",
+    "mat_qty": "Cantidad",
+    "mat_numero_interno": "Número Interno"
+}
+JOINT_LABELS = {
+    "union_numero": "Número de Unión",
+    "union_dn": "Diámetro",
+    "union_tipo": "Tipo",
+    "union_armador": "Armador",
+    "union_soldador_raiz": "Soldador Raíz",
+    "union_soldador_remate": "Soldador Remate"
+}
 
 def show():
     """Muestra la página de edición de JSON"""
@@ -43,9 +55,7 @@ def show():
         st.markdown("---")
         st.markdown("### O selecciona un archivo JSON manualmente:")
         
-        json_files = []
-        if os.path.exists(JSON_DIR):
-            json_files = [f for f in os.listdir(JSON_DIR) if f.endswith('.json') and f.startswith('nv_')]
+        json_files = [f"nv_{nv}.json" for nv in list_available_nvs()]
         
         if json_files:
             selected_file = st.selectbox("Seleccionar archivo JSON:", [""] + json_files)
@@ -65,19 +75,19 @@ def show():
         
         st.markdown(f'<h1 class="main-header">📄 Editor JSON - NV {nv}</h1>', unsafe_allow_html=True)
         
-        # Cargar datos
-        json_data = load_json_file(filename)
-        sale_note = SaleNote(**json_data)
+        # Cargar solo el manifiesto (planos, spools y cantidades); los datos de
+        # cada spool se cargan al seleccionarlo
+        manifest = load_nv_manifest(nv)
         
         # Sidebar con información del archivo
         with st.sidebar:
             st.markdown("### 📋 Información del Archivo")
             st.write(f"**Archivo:** {filename}")
-            st.write(f"**NV:** {sale_note.nv}")
-            st.write(f"**Total de Planes:** {len(sale_note.plans)}")
+            st.write(f"**NV:** {manifest.nv}")
+            st.write(f"**Total de Planes:** {len(manifest.plans)}")
             
-            total_materials = sum(len(plan.spool_data.materials) for plan in sale_note.plans)
-            total_joints = sum(len(plan.spool_data.joints) for plan in sale_note.plans)
+            total_materials = sum(entry.total_materials for entry in manifest.plans)
+            total_joints = sum(entry.total_joints for entry in manifest.plans)
             st.write(f"**Total de Materiales:** {total_materials}")
             st.write(f"**Total de Uniones:** {total_joints}")
             
@@ -95,30 +105,51 @@ def show():
         
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("NV", sale_note.nv)
+            st.metric("NV", manifest.nv)
         with col2:
-            unique_planos = list(set(plan.plano for plan in sale_note.plans))
+            unique_planos = list(set(entry.plano for entry in manifest.plans))
             st.metric("Planos", len(unique_planos))
         with col3:
-            unique_spools = list(set(plan.spool_data.spool for plan in sale_note.plans))
+            unique_spools = list(set(entry.spool for entry in manifest.plans))
             st.metric("Spools", len(unique_spools))
         
         # Mostrar detalles por plan
         st.markdown('<h2 class="section-header">📊 Datos por Plan/Spool</h2>', unsafe_allow_html=True)
         
         # Crear tabs para cada plan
-        if len(sale_note.plans) > 1:
-            plan_names = [f"Plan {plan.plano} - Spool {plan.spool_data.spool}" for plan in sale_note.plans]
+        if len(manifest.plans) > 1:
+            plan_names = [f"Plan {entry.plano} - Spool {entry.spool}" for entry in manifest.plans]
             selected_tab = st.selectbox("Seleccionar Plan/Spool:", plan_names)
             plan_index = plan_names.index(selected_tab)
         else:
             plan_index = 0
         
-        current_plan = sale_note.plans[plan_index]
+        current_plan = load_spool(nv, plan_index)
+        
+        # Versión del spool que vio este usuario al empezar a editarlo: los
+        # guardados se rechazan si otro usuario guardó el mismo spool después
+        version_key = f"spool_version_{nv}_{plan_index}"
+        current_version = manifest.plans[plan_index].version
+        if version_key not in st.session_state:
+            st.session_state[version_key] = current_version
+        base_version = st.session_state[version_key]
+        
+        def save_current_spool(**changes) -> None:
+            st.session_state[version_key] = save_spool_edit(
+                manifest.nv, current_plan.plano, current_plan.spool_data.spool,
+                expected_version=base_version, **changes
+            )
         
         # Mostrar información del plan actual
         st.markdown(f"**Plan:** {current_plan.plano} | **Spool:** {current_plan.spool_data.spool}")
         
+        if base_version != current_version:
+            st.warning("⚠️ Otro usuario guardó cambios en este spool desde que lo abriste. "
+                       "Revisa los datos actuales antes de guardar.")
+            if st.button("🔄 Usar la versión actual", key=f"accept_version_{plan_index}"):
+                st.session_state[version_key] = current_version
+                st.rerun()
+        
         # Crear dos columnas para materiales y uniones
         col_materials, col_joints = st.columns([1, 1])
         
@@ -126,21 +157,12 @@ def show():
             st.markdown("#### 📦 Materiales (Editable)")
             
             # Convertir materiales a DataFrame editable incluyendo nuevos campos
-            materials_data = []
-            for i, material in enumerate(current_plan.spool_data.materials):
-                materials_data.append({
-                    "index": i,
-                    "Descripción": material.mat_descripcion,
-                    "Diámetro": material.mat_dn,
-                    "SCH": material.mat_sch,
-                    "Cantidad": material.mat_qty,
-                    "Número Interno": material.mat_numero_interno or ""
-                })
+            materials_frame = items_to_frame(current_plan.spool_data.materials, "materials")
             
-            if materials_data:
+            if not materials_frame.empty:
                 # Editor de datos para materiales
                 edited_materials = st.data_editor(
-                    pd.DataFrame(materials_data).drop('index', axis=1),
+                    materials_frame.rename(columns=MATERIAL_LABELS).fillna(""),
                     use_container_width=True,
                     hide_index=True,
                     num_rows="dynamic",
@@ -150,27 +172,20 @@ def show():
                 # Botón para guardar cambios en materiales
                 if st.button("💾 Guardar cambios en materiales", key=f"save_materials_{plan_index}"):
                     try:
-                        # Actualizar los materiales en el objeto SaleNote
-                        new_materials = []
-                        for _, row in edited_materials.iterrows():
-                            material = Material(
-                                mat_descripcion=str(row["Descripción"]),
-                                mat_dn=str(row["Diámetro"]),
-                                mat_sch=str(row["SCH"]),
-                                mat_qty=int(row["Cantidad"]),
-                                mat_numero_interno=str(row["Número Interno"]) if row["Número Interno"] else None
-                            )
-                            new_materials.append(material)
+                        # Convertir la tabla editada de vuelta a materiales (vacíos → None)
+                        new_materials = items_from_frame(
+                            edited_materials.rename(columns={label: field for field, label in MATERIAL_LABELS.items()}),
+                            "materials"
+                        )
                         
-                        # Actualizar el plan actual
-                        sale_note.plans[plan_index].spool_data.materials = new_materials
-                        
-                        # Guardar el archivo JSON actualizado
-                        save_sale_note_to_json(sale_note)
+                        # Guardar solo los materiales del spool actual en el diario de la NV
+                        save_current_spool(materials=new_materials)
                         
                         st.success("✅ Cambios en materiales guardados exitosamente!")
                         st.rerun()
                         
+                    except VersionConflictError:
+                        st.error("❌ Otro usuario guardó cambios en este spool. Revisa los datos actuales y vuelve a guardar.")
                     except Exception as e:
                         st.error(f"❌ Error al guardar cambios en materiales: {str(e)}")
             else:
@@ -185,30 +200,22 @@ def show():
                         mat_qty=1,
                         mat_numero_interno=None
                     )
-                    sale_note.plans[plan_index].spool_data.materials.append(new_material)
-                    save_sale_note_to_json(sale_note)
-                    st.rerun()
+                    try:
+                        save_current_spool(materials=current_plan.spool_data.materials + [new_material])
+                        st.rerun()
+                    except VersionConflictError:
+                        st.error("❌ Otro usuario guardó cambios en este spool. Revisa los datos actuales y vuelve a intentar.")
         
         with col_joints:
             st.markdown("#### 🔗 Uniones (Editable)")
             
             # Convertir uniones a DataFrame editable incluyendo nuevos campos
-            joints_data = []
-            for i, joint in enumerate(current_plan.spool_data.joints):
-                joints_data.append({
-                    "index": i,
-                    "Número de Unión": joint.union_numero,
-                    "Diámetro": joint.union_dn,
-                    "Tipo": joint.union_tipo,
-                    "Armador": joint.union_armador or "",
-                    "Soldador Raíz": joint.union_soldador_raiz or "",
-                    "Soldador Remate": joint.union_soldador_remate or ""
-                })
+            joints_frame = items_to_frame(current_plan.spool_data.joints, "joints")
             
-            if joints_data:
+            if not joints_frame.empty:
                 # Editor de datos para uniones
                 edited_joints = st.data_editor(
-                    pd.DataFrame(joints_data).drop('index', axis=1),
+                    joints_frame.rename(columns=JOINT_LABELS).fillna(""),
                     use_container_width=True,
                     hide_index=True,
                     num_rows="dynamic",
@@ -218,28 +225,20 @@ def show():
                 # Botón para guardar cambios
                 if st.button("💾 Guardar cambios en uniones", key=f"save_joints_{plan_index}"):
                     try:
-                        # Actualizar las uniones en el objeto SaleNote
-                        new_joints = []
-                        for _, row in edited_joints.iterrows():
-                            joint = Joint(
-                                union_numero=str(row["Número de Unión"]),
-                                union_dn=str(row["Diámetro"]),
-                                union_tipo=str(row["Tipo"]),
-                                union_armador=str(row["Armador"]) if row["Armador"] else None,
-                                union_soldador_raiz=str(row["Soldador Raíz"]) if row["Soldador Raíz"] else None,
-                                union_soldador_remate=str(row["Soldador Remate"]) if row["Soldador Remate"] else None
-                            )
-                            new_joints.append(joint)
+                        # Convertir la tabla editada de vuelta a uniones (vacíos → None)
+                        new_joints = items_from_frame(
+                            edited_joints.rename(columns={label: field for field, label in JOINT_LABELS.items()}),
+                            "joints"
+                        )
                         
-                        # Actualizar el plan actual
-                        sale_note.plans[plan_index].spool_data.joints = new_joints
-                        
-                        # Guardar el archivo JSON actualizado
-                        save_sale_note_to_json(sale_note)
+                        # Guardar solo las uniones del spool actual en el diario de la NV
+                        save_current_spool(joints=new_joints)
                         
                         st.success("✅ Cambios guardados exitosamente!")
                         st.rerun()
                         
+                    except VersionConflictError:
+                        st.error("❌ Otro usuario guardó cambios en este spool. Revisa los datos actuales y vuelve a guardar.")
                     except Exception as e:
                         st.error(f"❌ Error al guardar cambios: {str(e)}")
             else:
@@ -255,11 +254,11 @@ def show():
                         union_soldador_raiz=None,
                         union_soldador_remate=None
                     )
-                    sale_note.plans[plan_index].spool_data.joints.append(new_joint)
-                    save_sale_note_to_json(sale_note)
-                    st.rerun()
-                    save_sale_note_to_json(sale_note)
-                    st.rerun()
+                    try:
+                        save_current_spool(joints=current_plan.spool_data.joints + [new_joint])
+                        st.rerun()
+                    except VersionConflictError:
+                        st.error("❌ Otro usuario guardó cambios en este spool. Revisa los datos actuales y vuelve a intentar.")
         
         # Sección de acciones globales
         st.markdown("---")
@@ -269,11 +268,11 @@ def show():
         
         with col_actions1:
             if st.button("📥 Descargar JSON"):
-                # Generar descarga del JSON
-                json_str = json.dumps(sale_note.model_dump(), indent=2, ensure_ascii=False)
+                # Generar descarga del JSON con la NV completa
+                sale_note = load_json_as_sale_note(nv)
                 st.download_button(
                     label="Descargar archivo JSON",
-                    data=json_str.encode('utf-8'),
+                    data=export_sale_note_json(sale_note),
                     file_name=f"nv_{sale_note.nv}_editado.json",
                     mime="application/json"
                 )
@@ -281,13 +280,14 @@ def show():
         with col_actions2:
             if st.button("📊 Descargar Excel actualizado"):
                 try:
-                    # Generar el archivo Excel con todas las variables
-                    excel_bytes = sale_note_to_excel(sale_note)
+                    # Excel con todas las variables de la NV completa (se reutiliza si la NV no cambió)
+                    sale_note = load_json_as_sale_note(nv)
+                    excel_bytes = excel_export_cache.read(sale_note)
                     filename = generate_excel_filename(sale_note, include_timestamp=True)
                     
                     st.download_button(
                         label="📄 Descargar Excel",
-                        data=excel_bytes.getvalue(),
+                        data=excel_bytes,
                         file_name=filename,
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         help="Descarga un archivo Excel con todas las columnas originales más las nuevas variables editables"
@@ -305,8 +305,7 @@ def show():
             if st.button("🗑️ Eliminar JSON", type="secondary"):
                 if st.checkbox("Confirmar eliminación"):
                     try:
-                        file_path = os.path.join(JSON_DIR, filename)
-                        os.remove(file_path)
+                        delete_sale_note_json(nv)
                         st.success("Archivo eliminado.")
                         del st.session_state.selected_json_file
                         del st.session_state.selected_nv
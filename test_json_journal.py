@@ -0,0 +1,61 @@
+# test_json_journal.py - Pruebas del diario de ediciones de las NVs
+
+import sys
+import os
+import multiprocessing
+
+import pytest
+
+# Agregar el directorio backend al path para importar los módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from backend.app.api.v1.schemas.nv_schemas import Material
+from backend.app.services.etapa_2 import json_journal
+from backend.app.services.etapa_2.json_journal import (
+    append_spool_delta,
+    compact_journal,
+    read_journal,
+    write_lock
+)
+
+
+def _material(descripcion: str) -> Material:
+    return Material(mat_descripcion=descripcion, mat_dn="2", mat_sch="40", mat_qty=1)
+
+
+def _append_edit(snapshot_path: str, descripcion: str, started=None) -> None:
+    """Edición de otro proceso, hecha como en sharded_store.save_spool"""
+    if started is not None:
+        started.set()
+    with write_lock(snapshot_path):
+        append_spool_delta(snapshot_path, "P1", "S1", "materials", [_material(descripcion)],
+                           generation=None, fold=lambda records: None)
+
+
+@pytest.mark.skipif(json_journal.fcntl is None, reason="El bloqueo entre procesos requiere fcntl")
+def test_edit_during_compaction_is_not_lost(tmp_path):
+    """Una edición de otro proceso durante la compactación espera y queda en el diario nuevo"""
+    snapshot_path = str(tmp_path / "nv_1.json")
+    _append_edit(snapshot_path, "antes")
+
+    context = multiprocessing.get_context("spawn")
+    folded = []
+    writer = None
+
+    def fold(records):
+        nonlocal writer
+        folded.extend(records)
+        started = context.Event()
+        writer = context.Process(target=_append_edit, args=(snapshot_path, "durante", started))
+        writer.start()
+        assert started.wait(timeout=30)
+        # El otro proceso no puede escribir mientras se integra el diario
+        writer.join(timeout=0.5)
+        assert writer.is_alive()
+
+    assert compact_journal(snapshot_path, fold)
+    writer.join(timeout=10)
+    assert writer.exitcode == 0
+
+    assert [r["items"][0]["mat_descripcion"] for r in folded] == ["antes"]
+    assert [r["items"][0]["mat_descripcion"] for r in read_journal(snapshot_path)] == ["durante"]
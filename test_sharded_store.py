@@ -0,0 +1,94 @@
+# test_sharded_store.py - Pruebas de versiones y del diario del almacenamiento por spool
+
+import sys
+import os
+import threading
+
+import pytest
+
+# Agregar el directorio backend al path para importar los módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from backend.app.api.v1.schemas.nv_schemas import SaleNote, Plan, Spool, Material, Joint
+from backend.app.services.etapa_2 import json_journal, sharded_store
+from backend.app.services.etapa_2.json_journal import VersionConflictError, compact_journal, lock_path
+
+
+def _material(descripcion: str) -> Material:
+    return Material(mat_descripcion=descripcion, mat_dn="2", mat_sch="40", mat_qty=1)
+
+
+def _sale_note() -> SaleNote:
+    return SaleNote(nv="1", plans=[
+        Plan(plano=f"P{i}", spool_data=Spool(
+            spool=f"S{i}",
+            materials=[_material(f"material {i}")],
+            joints=[Joint(union_numero=f"U{i}", union_dn="2", union_tipo="BW")]
+        ))
+        for i in range(2)
+    ])
+
+
+def test_stale_versions_raise_conflict(tmp_path):
+    """Una edición sobre una versión anterior de la NV o del spool se rechaza"""
+    manifest_path = str(tmp_path / "nv_1.json")
+    version = sharded_store.write_sale_note(manifest_path, _sale_note())
+
+    edited = sharded_store.save_spool(manifest_path, "P0", "S0", "materials", [_material("nuevo")],
+                                      expected_version=version)
+    with pytest.raises(VersionConflictError):
+        sharded_store.save_spool(manifest_path, "P0", "S0", "materials", [_material("viejo")],
+                                 expected_version=version)
+    with pytest.raises(VersionConflictError):
+        sharded_store.write_sale_note(manifest_path, _sale_note(), expected_version=version)
+
+    # Las ediciones de otro spool no entran en conflicto
+    sharded_store.save_spool(manifest_path, "P1", "S1", "materials", [_material("otro")],
+                             expected_version=version)
+
+    sale_note = sharded_store.load_sale_note(manifest_path)
+    assert sale_note.plans[0].spool_data.materials[0].mat_descripcion == "nuevo"
+    assert sale_note.plans[1].spool_data.materials[0].mat_descripcion == "otro"
+    assert sharded_store.load_manifest(manifest_path).plans[0].version == edited
+
+
+def test_edit_during_compaction_survives(tmp_path):
+    """Una edición que llega mientras se compacta el diario espera y no se pierde"""
+    manifest_path = str(tmp_path / "nv_1.json")
+    sharded_store.write_sale_note(manifest_path, _sale_note())
+    sharded_store.save_spool(manifest_path, "P0", "S0", "materials", [_material("antes")])
+
+    started = threading.Event()
+
+    def edit():
+        started.set()
+        sharded_store.save_spool(manifest_path, "P1", "S1", "materials", [_material("durante")])
+
+    writer = threading.Thread(target=edit)
+
+    def fold(records):
+        writer.start()
+        assert started.wait(timeout=10)
+        # La edición no puede escribirse mientras se integra el diario
+        writer.join(timeout=0.5)
+        assert writer.is_alive()
+        sharded_store.fold_records(manifest_path, records)
+
+    assert compact_journal(manifest_path, fold)
+    writer.join(timeout=10)
+    assert not writer.is_alive()
+
+    sale_note = sharded_store.load_sale_note(manifest_path)
+    assert sale_note.plans[0].spool_data.materials[0].mat_descripcion == "antes"
+    assert sale_note.plans[1].spool_data.materials[0].mat_descripcion == "durante"
+
+
+@pytest.mark.skipif(json_journal.fcntl is None, reason="El archivo de bloqueo requiere fcntl")
+def test_delete_keeps_lock_file(tmp_path):
+    """Eliminar una NV conserva su archivo de bloqueo para no separar a quienes lo esperan"""
+    manifest_path = str(tmp_path / "nv_1.json")
+    sharded_store.write_sale_note(manifest_path, _sale_note())
+    sharded_store.delete_sale_note(manifest_path)
+
+    assert not os.path.exists(manifest_path)
+    assert os.path.exists(lock_path(manifest_path))
@@ -0,0 +1,46 @@
+# test_workbook_loader.py - Pruebas de la lectura rápida de libros Excel
+
+import sys
+import os
+
+from openpyxl import Workbook  # type: ignore
+from openpyxl.styles import Font  # type: ignore
+
+# Agregar el directorio backend al path para importar los módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+from backend.app.services.etapa_1.excel_generator import MATERIALS_COLUMNS, JOINTS_COLUMNS
+from backend.app.services.etapa_2.workbook_loader import load_workbook_sheets, scan_workbook_summary
+
+
+def _write_workbook(file_path: str, materials: int, joints: int) -> None:
+    """Libro de etapa 1 con una celda vacía con formato muy por debajo de los datos"""
+    workbook = Workbook()
+    materials_sheet = workbook.active
+    materials_sheet.title = "materiales"
+    materials_sheet.append(MATERIALS_COLUMNS)
+    for i in range(materials):
+        materials_sheet.append(["193", "P1", f"S{i % 2}", "TUBO", "4", "40", 1, None])
+
+    joints_sheet = workbook.create_sheet("uniones")
+    joints_sheet.append(JOINTS_COLUMNS)
+    for i in range(joints):
+        joints_sheet.append(["193", "P1", f"S{i % 2}", f"U{i}", "4", "BW", None, None, None])
+
+    for sheet in (materials_sheet, joints_sheet):
+        sheet.cell(row=50, column=4).font = Font(bold=True)
+    workbook.save(file_path)
+
+
+def test_summary_ignores_formatted_empty_rows(tmp_path):
+    """Las filas vacías con formato no cuentan, igual que en la lectura completa"""
+    file_path = str(tmp_path / "nv_193.xlsx")
+    _write_workbook(file_path, materials=5, joints=3)
+
+    summary = scan_workbook_summary(file_path)
+    loaded = load_workbook_sheets(file_path)
+
+    assert (summary.total_materials, summary.total_joints) == (5, 3)
+    assert (len(loaded.df_materials), len(loaded.df_joints)) == (5, 3)  # type: ignore
+    assert summary.nvs == {"193"}
+    assert summary.spools == {"S0", "S1"}